@@ -1,6 +1,7 @@
 import toga
 from toga.style import Pack
 from toga.style.pack import COLUMN, ROW
+import asyncio
 import os
 import json
 import time
@@ -8,6 +9,30 @@ from datetime import datetime
 import uuid
 import functools
 import math
+from AppEnsaios.backup import Backup, BackupError
+from AppEnsaios.cache import LRUCache
+from AppEnsaios.history import EditHistory
+from AppEnsaios.instrumentation import instrumentacao
+from AppEnsaios.log_store import LogStore, StaleIndexError, resumir_sessao
+from AppEnsaios.query import QueryError, QueryIndexes, compile_query, parece_estruturada
+from AppEnsaios.retention import MODOS as RETENTION_MODES, Compactador, RetentionPolicy
+from AppEnsaios.search import SearchCache, buscar_aproximado, normalizar, proximo_lote, sob_demanda
+from AppEnsaios.sessions import SessionManager, TickScheduler
+from AppEnsaios.stages import MAX_ETAPAS, StageCatalog, StageImportError, etapa_padrao, ler_csv, pagina
+from AppEnsaios.sync import Outbox, SyncClient, SyncWorker
+
+DETAIL_CHUNK_SIZE = 50  # 🔹 Linhas por bloco ao montar detalhes de sessões longas
+SEARCH_DEBOUNCE = 0.15  # 🔹 Segundos sem digitar antes de disparar a busca
+SEARCH_BATCH_SIZE = 50  # 🔹 Resultados por lote entregue à interface
+SEARCH_PAGE_SIZE = 200  # 🔹 Resultados montados antes do botão "Mostrar mais"
+STAGE_PICKER_THRESHOLD = 20  # 🔹 Acima disso o quadro de botões vira um seletor com filtro
+STAGE_PAGE_SIZE = 24  # 🔹 Botões de etapa montados por vez no seletor
+SORT_OPTIONS = {
+    "Ordem do arquivo": None,
+    "Maior duração": True,
+    "Menor duração": False,
+}
+
 
 class TimeTrackerApp(toga.App):
     def startup(self):
@@ -17,23 +42,47 @@ class TimeTrackerApp(toga.App):
         os.makedirs(self.log_folder, exist_ok=True)
         self.settings_file = os.path.join(self.log_folder, "settings.json")
         self.log_file = os.path.join(self.log_folder, "tracking_logs.json")
+        self.store = LogStore(self.log_file)
+        # 🔹 Instância própria das threads de busca: a leitura delas não troca o `last_damage` da interface
+        self.search_store = LogStore(self.log_file)
+        self.history = EditHistory(self.log_file + ".history.jsonl")
 
-        # Resetar todos os tempos na inicialização
-        self.current_stage = None
-        self.start_time = None
+        # Resetar todos os tempos na inicialização: cada card acompanhado é uma sessão
+        self.sessions = SessionManager()
+        self.sessions.create()
+        # 🔹 Com a janela escondida os tempos não são redesenhados; na volta o próximo tick põe tudo em dia
+        self.scheduler = TickScheduler(interval=1.0, paused=lambda: not self.main_window.visible)
 
         # Criar um arquivo de logs vazio se ele não existir
         if not os.path.exists(self.log_file):
-            with open(self.log_file, "w") as f:
-                json.dump([], f, indent=4)
+            self.store.write_all([])
 
         # Resetar tempos e horários das etapas
-        self.load_stages()
-        for stage in self.stages.values():
-            stage["tempos"] = []
-            stage["hora_inicio"] = None
-            stage["hora_fim"] = None
-            stage["horarios"] = []
+        self.reset_stages()
+        self.stage_filter = ""
+        self.stage_page_start = 0
+        self.recent_buttons = {}
+
+        # 🔹 Sessões completas decodificadas sob demanda pelo visualizador de logs
+        self.logs = []
+        self.logs_by_token = {}
+        self.query_indexes = None
+        self.search_task = None
+        self.search_generation = 0
+        self.record_cache = LRUCache(self.settings.get("cache_registros", 64))
+        self.panel_cache = LRUCache(self.settings.get("cache_paineis", 16))
+        # 🔹 Resultados por consulta, válidos enquanto a geração do arquivo de logs não mudar
+        self.search_cache = SearchCache(self.settings.get("cache_buscas", 32))
+        self.shown_search = None
+
+        self.sync_worker = None
+        self.start_sync()
+        self.compaction_task = None
+        self.last_compaction = None
+        self.integrity_task = None
+        self.last_integrity = None
+        self.last_backup = None
+        self.backup_select = None
 
         self.main_content_top = self.create_static_layout_top()
         self.dynamic_content = self.create_dynamic_buttons()
@@ -47,8 +96,14 @@ class TimeTrackerApp(toga.App):
         self.main_window.toolbar.add(
             toga.Command(self.open_settings, text="Configurações", group=toga.Group.APP)
         )
+        self.main_window.toolbar.add(
+            toga.Command(self.open_diagnostics, text="Diagnóstico", group=toga.Group.APP)
+        )
 
         self.main_window.show()
+        self.scheduler.start(self.loop)
+        self.integrity_task = self.loop.create_task(self.check_integrity())
+        self.start_compaction()
 
 
     def load_stages(self):
@@ -56,25 +111,245 @@ class TimeTrackerApp(toga.App):
         if os.path.exists(self.settings_file):
             with open(self.settings_file, "r") as f:
                 settings = json.load(f)
+                self.settings = settings
                 self.num_buttons = settings.get("num_buttons", 8)  # 🔹 Valor padrão: 8 botões
                 self.stages = settings.get("stages", {})
         else:
+            self.settings = {}
             self.num_buttons = 8  # 🔹 Valor padrão inicial
             self.stages = {
                 f"Etapa {i+1}": {"nome": f"Etapa {i+1}", "codigo": f"{i+1:04}", "tempos": []}
                 for i in range(self.num_buttons)
             }
-            self.save_settings()
+            # 🔹 Grava direto: save_settings lê a tela de configurações, que ainda não foi montada
+            self.settings = {"num_buttons": self.num_buttons, "stages": self.stages}
+            with open(self.settings_file, "w") as f:
+                json.dump(self.settings, f, indent=4)
+
+        if self.settings.get("instrumentacao"):
+            instrumentacao.enabled = True
+
+    def reset_stages(self):
+        """Lê as etapas da configuração com os tempos e horários zerados."""
+        self.load_stages()
+        for stage in self.stages.values():
+            stage["tempos"] = []
+            stage["hora_inicio"] = None
+            stage["hora_fim"] = None
+            stage["horarios"] = []
+        self.stage_catalog = StageCatalog(self.stages, self.settings.get("etapas_recentes", []))
+
+
+    def start_sync(self):
+        """Liga a sincronização em segundo plano se houver um servidor configurado."""
+        if self.sync_worker is not None:
+            self.sync_worker.stop(timeout=1)
+            self.sync_worker = None
+
+        url = self.settings.get("sync_url", "").strip()
+        if not url:
+            return
 
+        outbox = Outbox(os.path.join(self.log_folder, "sync_outbox.jsonl"))
+        self.sync_worker = SyncWorker(outbox, SyncClient(url), batch_size=self.settings.get("sync_lote", 50))
+        self.sync_worker.start()
+
+    def start_compaction(self, force=False):
+        """Aplica a retenção em segundo plano (também termina uma compactação interrompida)."""
+        if self.compaction_task is not None and not self.compaction_task.done():
+            return self.compaction_task
+        politica = RetentionPolicy.from_settings(self.settings)
+        compactador = Compactador(LogStore(self.log_file), self.log_folder)
+        if not (force or politica.ativa or compactador.checkpoint() is not None):
+            return None
+        self.compaction_task = self.loop.create_task(self.run_compaction(compactador, politica))
+        return self.compaction_task
+
+    async def run_compaction(self, compactador, politica):
+        # 🔹 Instância própria do LogStore: o lock de escrita da thread não se mistura com o da interface
+        try:
+            self.last_compaction = await self.loop.run_in_executor(None, compactador.executar, politica)
+        except (OSError, ValueError) as exc:
+            self.last_compaction = {"erro": str(exc)}
+            return
+        if self.store.is_stale():
+            self.record_cache.clear()
+            self.panel_cache.clear()
+
+    async def check_integrity(self):
+        """Confere só o que foi gravado desde a última verificação e recupera o arquivo se houver dano."""
+        store = LogStore(self.log_file)
+        try:
+            self.last_integrity = await self.loop.run_in_executor(None, store.verify)
+            if self.last_integrity["danos"] or store.is_legacy():
+                # 🔹 Regrava sem os trechos danificados (e converte o formato antigo);
+                # o salvage confere de novo sob lock
+                relatorio = await self.loop.run_in_executor(None, store.salvage)
+                self.record_cache.clear()
+                self.panel_cache.clear()
+                self.show_recovery_report(relatorio)
+        except OSError as exc:
+            self.last_integrity = {"erro": str(exc)}
+
+    def show_recovery_report(self, relatorio):
+        """Avisa quais sessões se perderam e onde ficaram os trechos danificados."""
+        if not relatorio["perdidos"]:
+            return
+        linhas = [
+            f"{relatorio['recuperados']} sessão(ões) recuperada(s); "
+            f"{len(relatorio['perdidos'])} trecho(s) danificado(s) movido(s) para a quarentena:"
+        ]
+        for dano in relatorio["perdidos"][:10]:
+            sessao = dano["card_jira"] or dano["token"] or f"posição {dano['offset']}"
+            linhas.append(f"• {sessao}: {dano['motivo']} ({dano['bytes']} bytes)")
+        if len(relatorio["perdidos"]) > 10:
+            linhas.append(f"… e mais {len(relatorio['perdidos']) - 10}")
+        linhas.append(f"\nRelatório e trechos em:\n{relatorio['quarentena']}")
+        self.main_window.info_dialog("Recuperação dos logs", "\n".join(linhas))
+
+    def queue_sync(self, tipo, registro):
+        """Coloca a sessão na fila de envio; a rede fica por conta da thread de sincronização."""
+        if self.sync_worker is not None:
+            self.sync_worker.submit(tipo, registro)
 
     def create_static_layout_top(self):
+        session_label = toga.Label("Sessão:", style=Pack(padding=5))
+        self.session_names_shown = self.sessions.names()
+        self.updating_session_select = False
+        self.session_select = toga.Selection(
+            items=self.sessions.names(),
+            on_change=self.switch_session,
+            style=Pack(flex=1, padding=5)
+        )
+        new_session_button = toga.Button("Nova sessão", on_press=self.new_session, style=Pack(padding=5))
+        session_box = toga.Box(
+            children=[session_label, self.session_select, new_session_button],
+            style=Pack(direction=ROW, padding=10)
+        )
+        self.session_status = toga.Label("", style=Pack(padding=(0, 15), font_size=10, color="gray"))
+
         jira_label = toga.Label("Card JIRA:", style=Pack(padding=5))
-        self.jira_input = toga.TextInput(placeholder="Digite o card JIRA", style=Pack(flex=1, padding=5))
+        self.jira_input = toga.TextInput(
+            placeholder="Digite o card JIRA",
+            on_change=self.update_session_card,
+            style=Pack(flex=1, padding=5)
+        )
         jira_box = toga.Box(children=[jira_label, self.jira_input], style=Pack(direction=ROW, padding=10))
         return toga.Box(
-            children=[jira_box],
+            children=[session_box, self.session_status, jira_box],
             style=Pack(direction=COLUMN, padding=10)
         )
+
+    def new_session(self, widget):
+        """Abre uma nova sessão em primeiro plano; as demais continuam contando."""
+        self.sessions.create()
+        self.show_foreground_session()
+
+    def switch_session(self, widget):
+        """Traz para o primeiro plano a sessão escolhida na lista."""
+        nome = widget.value
+        if self.updating_session_select or nome == self.sessions.foreground_name or nome not in self.sessions.sessions:
+            return
+        self.sessions.switch(nome)
+        self.show_foreground_session()
+
+    def update_session_card(self, widget):
+        self.sessions.foreground.card_jira = widget.value.strip()
+
+    def show_foreground_session(self):
+        """Atualiza o card, o destaque dos botões e a lista de sessões para a sessão em primeiro plano."""
+        session = self.sessions.foreground
+
+        # 🔹 Alterações feitas pelo código não devem disparar a troca de sessão
+        self.updating_session_select = True
+        try:
+            names = self.sessions.names()
+            if names != self.session_names_shown:
+                self.session_names_shown = names
+                self.session_select.items = names
+            self.session_select.value = session.nome
+        finally:
+            self.updating_session_select = False
+        self.jira_input.value = session.card_jira
+
+        self.refresh_stage_highlight()
+
+        self.finish_button.enabled = session.active
+        self.update_tracking_controls()
+        self.refresh_session_status()
+
+    def refresh_stage_highlight(self):
+        """Destaca a etapa em andamento da sessão em primeiro plano entre os botões montados."""
+        current = self.sessions.foreground.current_stage
+        for buttons in (self.buttons, self.recent_buttons):
+            for stage_name, button in buttons.items():
+                if stage_name == current:
+                    button.style.background_color = "lightblue"
+                elif button.style.background_color is not None:
+                    del button.style.background_color
+
+    def update_tracking_controls(self):
+        """Bloqueia logs e configurações enquanto alguma sessão tiver etapa em andamento."""
+        ativo = self.sessions.any_active
+        self.logs_button.enabled = not ativo
+        for command in self.main_window.toolbar:
+            command.enabled = not ativo
+
+        # 🔹 Um único agendador atualiza o status de todas as sessões
+        if ativo:
+            self.scheduler.subscribe("session_status", self.tick_elapsed)
+        else:
+            self.scheduler.unsubscribe("session_status")
+
+    def stage_button_text(self, stage_name, now=None):
+        """Nome da etapa seguido do tempo acumulado nela pela sessão em primeiro plano."""
+        now = time.time() if now is None else now
+        nome = self.stages[stage_name]["nome"]
+        session = self.sessions.foreground
+        tempo = session.stage_total(stage_name, now)
+        if not tempo and stage_name != session.current_stage:
+            return nome
+        return f"{nome} · {self.format_duration(tempo)}"
+
+    def refresh_session_status(self, now=None, todas=True):
+        """Atualiza o status e o tempo nos botões de etapa; retorna quantos textos mudaram.
+
+        Só os textos diferentes do que está na tela são regravados. No tick
+        (`todas=False`) apenas a etapa em andamento pode ter mudado.
+        """
+        now = time.time() if now is None else now
+        ativas = sum(1 for session in self.sessions if session.active)
+        session = self.sessions.foreground
+        status = f"Sessões em andamento: {ativas}"
+        if session.active:
+            etapa = self.stages.get(session.current_stage, {}).get("nome", session.current_stage)
+            status += f" | {etapa}: {self.format_duration(session.stage_elapsed(now))}"
+            status += f" | Total: {self.format_duration(session.elapsed(now))}"
+        atualizados = 0
+        if self.session_status.text != status:
+            self.session_status.text = status
+            atualizados += 1
+
+        for buttons in (self.buttons, self.recent_buttons):
+            stage_names = list(buttons) if todas else [session.current_stage]
+            for stage_name in stage_names:
+                button = buttons.get(stage_name)
+                if button is None:
+                    continue
+                texto = self.stage_button_text(stage_name, now)
+                if button.text != texto:
+                    button.text = texto
+                    atualizados += 1
+        return atualizados
+
+    def tick_elapsed(self, now):
+        """Assinante do agendador: redesenha só os tempos que mudaram desde o último tick."""
+        return self.refresh_session_status(now, todas=False)
+
+    def format_duration(self, seconds):
+        """Formata segundos como HH:MM:SS."""
+        seconds = int(seconds)
+        return f"{seconds // 3600:02}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
     
     def create_static_layout_bot(self):
         """Cria o layout inferior da interface"""
@@ -90,6 +365,11 @@ class TimeTrackerApp(toga.App):
         """Cria dinamicamente os botões de etapa conforme o número configurado."""
         button_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
         self.buttons = {}
+        self.recent_buttons = {}
+
+        if self.num_buttons > STAGE_PICKER_THRESHOLD:
+            self.update_button_list()
+            return self.create_stage_picker(button_box)
 
         for i in range(self.num_buttons):  # 🔹 Usa o número de botões configurado
             stage_name = f"Etapa {i+1}"
@@ -97,7 +377,7 @@ class TimeTrackerApp(toga.App):
                 self.stages[stage_name] = {"nome": stage_name, "codigo": f"{i+1:04}", "tempos": []}
 
             button = toga.Button(
-                self.stages[stage_name]["nome"],
+                self.stage_button_text(stage_name),
                 on_press=self.handle_stage,
                 id=stage_name,
                 style=Pack(flex=1, padding=5)
@@ -109,8 +389,97 @@ class TimeTrackerApp(toga.App):
                 button_box.add(row)
             row.add(button)
 
+        session = self.sessions.foreground
+        if session.current_stage in self.buttons:
+            self.buttons[session.current_stage].style.background_color = "lightblue"
+
         return button_box
-    
+
+    def create_stage_picker(self, button_box):
+        """Seletor para muitas etapas: recentes fixadas, filtro e só uma página de botões montada."""
+        self.recent_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        self.stage_filter_input = toga.TextInput(
+            value=self.stage_filter,
+            placeholder="Filtrar por nome ou código (Enter inicia a etapa do código)",
+            on_change=self.filter_stages,
+            on_confirm=self.start_stage_by_code,
+            style=Pack(flex=1, padding=5)
+        )
+        self.stage_page_box = toga.Box(style=Pack(direction=COLUMN))
+
+        nav_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        self.stage_page_label = toga.Label("", style=Pack(flex=1, padding=5, text_align="center"))
+        nav_box.add(toga.Button("◀", on_press=lambda widget: self.move_stage_page(-1), style=Pack(padding=5)))
+        nav_box.add(self.stage_page_label)
+        nav_box.add(toga.Button("▶", on_press=lambda widget: self.move_stage_page(1), style=Pack(padding=5)))
+
+        button_box.add(toga.Label("Recentes:", style=Pack(padding=(5, 5, 0, 5), font_size=10, color="gray")))
+        button_box.add(self.recent_box)
+        button_box.add(self.stage_filter_input)
+        button_box.add(self.stage_page_box)
+        button_box.add(nav_box)
+
+        self.render_recent_stages()
+        self.render_stage_page()
+        return button_box
+
+    def build_stage_button(self, stage_name):
+        return toga.Button(
+            self.stage_button_text(stage_name),
+            on_press=functools.partial(self.select_stage, stage_name),
+            style=Pack(flex=1, padding=5)
+        )
+
+    def render_recent_stages(self):
+        for child in self.recent_box.children[:]:
+            self.recent_box.remove(child)
+        self.recent_buttons = {}
+        for stage_name in self.stage_catalog.recentes:
+            button = self.build_stage_button(stage_name)
+            self.recent_buttons[stage_name] = button
+            self.recent_box.add(button)
+        self.refresh_stage_highlight()
+
+    def render_stage_page(self):
+        """Monta só os botões da página atual do filtro."""
+        chaves = self.stage_catalog.filter(self.stage_filter)
+        visiveis, self.stage_page_start = pagina(chaves, self.stage_page_start, STAGE_PAGE_SIZE)
+
+        for child in self.stage_page_box.children[:]:
+            self.stage_page_box.remove(child)
+        self.buttons = {}
+        for i, stage_name in enumerate(visiveis):
+            button = self.build_stage_button(stage_name)
+            self.buttons[stage_name] = button
+            if i % 2 == 0:
+                row = toga.Box(style=Pack(direction=ROW, padding=5))
+                self.stage_page_box.add(row)
+            row.add(button)
+
+        if chaves:
+            self.stage_page_label.text = (
+                f"{self.stage_page_start + 1}-{self.stage_page_start + len(visiveis)} de {len(chaves)}"
+            )
+        else:
+            self.stage_page_label.text = "Nenhuma etapa encontrada"
+        self.refresh_stage_highlight()
+
+    def filter_stages(self, widget):
+        self.stage_filter = widget.value
+        self.stage_page_start = 0
+        self.render_stage_page()
+
+    def move_stage_page(self, direcao):
+        self.stage_page_start = max(0, self.stage_page_start + direcao * STAGE_PAGE_SIZE)
+        self.render_stage_page()
+
+    def start_stage_by_code(self, widget):
+        """Enter no filtro: inicia a etapa com exatamente esse código, se houver."""
+        stage_name = self.stage_catalog.by_code(widget.value)
+        if stage_name is not None:
+            self.select_stage(stage_name)
+            widget.value = ""
+
     def update_button_list(self):
         """Atualiza a lista de etapas conforme o número de botões escolhido."""
         new_stages = {}
@@ -120,9 +489,10 @@ class TimeTrackerApp(toga.App):
             if stage_name in self.stages:
                 new_stages[stage_name] = self.stages[stage_name]  # Mantém configurações antigas
             else:
-                new_stages[stage_name] = {"nome": stage_name, "codigo": f"{i+1:04}", "tempos": []}  # Cria novas etapas
+                new_stages[stage_name] = etapa_padrao(i)  # Cria novas etapas
 
         self.stages = new_stages  # Atualiza o dicionário de etapas
+        self.stage_catalog = StageCatalog(self.stages, self.stage_catalog.recentes)
 
 
     def open_settings(self, widget):
@@ -139,7 +509,7 @@ class TimeTrackerApp(toga.App):
                 button_count_label.text = f"Quantidade de botões: {self.num_buttons}"
 
         def increase_buttons(widget):
-            if self.num_buttons < 20:
+            if self.num_buttons < MAX_ETAPAS:
                 self.num_buttons += 1
                 button_count_label.text = f"Quantidade de botões: {self.num_buttons}"
 
@@ -156,6 +526,7 @@ class TimeTrackerApp(toga.App):
         button_count_box.add(button_count_label)
         button_count_box.add(plus_button)
         button_count_box.add(generate_button)
+        button_count_box.add(toga.Button("Importar CSV", on_press=self.import_stages_csv, style=Pack(padding=5)))
         
         scroll_content.add(button_count_box)
 
@@ -165,8 +536,9 @@ class TimeTrackerApp(toga.App):
         for i in range(self.num_buttons):
             stage_name = f"Etapa {i+1}"
             if stage_name not in self.stages:
-                self.stages[stage_name] = {"nome": stage_name, "codigo": f"{i+1:04}", "tempos": []}
+                self.stages[stage_name] = etapa_padrao(i)
 
+        def build_row(stage_name):
             row = toga.Box(style=Pack(direction=ROW, padding=5))
 
             name_input = toga.TextInput(value=self.stages[stage_name]["nome"], style=Pack(flex=1, padding=5))
@@ -177,7 +549,49 @@ class TimeTrackerApp(toga.App):
             row.add(toga.Label(stage_name, style=Pack(padding=5)))
             row.add(name_input)
             row.add(code_input)
-            scroll_content.add(row)
+            return row
+
+        # 🔹 Com centenas de etapas, as linhas são montadas em blocos
+        stages_box = toga.Box(style=Pack(direction=COLUMN))
+        scroll_content.add(stages_box)
+        self.render_rows(stages_box, [f"Etapa {i+1}" for i in range(self.num_buttons)], build_row)
+
+        # 🔹 Servidor para onde as sessões são enviadas (vazio desativa a sincronização)
+        sync_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        self.sync_url_input = toga.TextInput(
+            value=self.settings.get("sync_url", ""),
+            placeholder="https://servidor/api/sessoes",
+            style=Pack(flex=1, padding=5)
+        )
+        sync_box.add(toga.Label("Servidor de sincronização:", style=Pack(padding=5)))
+        sync_box.add(self.sync_url_input)
+        scroll_content.add(sync_box)
+
+        # 🔹 Retenção: sessões além destes limites saem do arquivo ativo (vazio = sem limite)
+        retention_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        self.retention_inputs = {}
+        for chave, rotulo in (("retencao_dias", "Dias"), ("retencao_sessoes", "Sessões"), ("retencao_mb", "MB")):
+            valor = self.settings.get(chave)
+            self.retention_inputs[chave] = toga.TextInput(
+                value="" if valor is None else str(valor), placeholder=rotulo, style=Pack(flex=1, padding=5)
+            )
+            retention_box.add(toga.Label(f"{rotulo}:", style=Pack(padding=5)))
+            retention_box.add(self.retention_inputs[chave])
+        self.retention_mode_select = toga.Selection(items=list(RETENTION_MODES), style=Pack(padding=5))
+        self.retention_mode_select.value = self.settings.get("retencao_modo", RETENTION_MODES[0])
+        retention_box.add(self.retention_mode_select)
+        scroll_content.add(toga.Label("Retenção dos logs:", style=Pack(padding=5)))
+        scroll_content.add(retention_box)
+
+        # 🔹 Backup incremental da pasta de logs: cada snapshot grava só as partes que mudaram
+        backup_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        self.backup_select = toga.Selection(accessor="rotulo", style=Pack(flex=1, padding=5))
+        self.refresh_backup_list()
+        backup_box.add(self.backup_select)
+        backup_box.add(toga.Button("Fazer backup", on_press=self.create_backup, style=Pack(padding=5)))
+        backup_box.add(toga.Button("Restaurar", on_press=self.restore_backup, style=Pack(padding=5)))
+        scroll_content.add(toga.Label("Backup:", style=Pack(padding=5)))
+        scroll_content.add(backup_box)
 
         # 🔹 Botões para salvar ou voltar
         save_button = toga.Button("Salvar", on_press=self.save_settings, style=Pack(padding=10))
@@ -192,20 +606,136 @@ class TimeTrackerApp(toga.App):
         self.main_window.content = toga.ScrollContainer(content=scroll_content)
 
 
+    async def import_stages_csv(self, widget):
+        """Substitui as etapas pelas de um CSV com as colunas nome e código."""
+        caminho = await self.main_window.open_file_dialog("Importar etapas (CSV)", file_types=["csv"])
+        if not caminho:
+            return
+        try:
+            with open(caminho, "r", encoding="utf-8-sig") as f:
+                stages = ler_csv(f.read())
+        except (OSError, UnicodeDecodeError, StageImportError) as exc:
+            self.main_window.info_dialog("Importar etapas", f"Não foi possível importar: {exc}")
+            return
+
+        self.stages = stages
+        self.num_buttons = len(stages)
+        self.settings_inputs = {}  # 🔹 Os campos na tela ainda mostram as etapas antigas
+        self.save_settings(widget)
+        self.main_window.info_dialog("Importar etapas", f"{len(stages)} etapa(s) importada(s).")
+
+    def backup_manager(self):
+        """Backups da pasta de logs, por padrão em <dados>/backups."""
+        destino = self.settings.get("backup_pasta") or os.path.join(self.paths.data, "backups")
+        # 🔹 Instância própria do LogStore: o backup roda fora da thread da interface
+        return Backup(
+            self.log_folder,
+            destino,
+            store=LogStore(self.log_file),
+            compactar=self.settings.get("backup_compactar", True),
+        )
+
+    def refresh_backup_list(self):
+        """Preenche o seletor com os snapshots, do mais novo para o mais antigo."""
+        if self.backup_select is None:
+            return
+        self.backup_select.items = [
+            {"rotulo": f"{snapshot['data']} · {snapshot['motivo']}", "snapshot": snapshot["id"]}
+            for snapshot in self.backup_manager().snapshots()
+        ] or [{"rotulo": "Nenhum backup", "snapshot": None}]
+
+    async def create_backup(self, widget=None):
+        """Grava um snapshot em segundo plano e descarta os mais antigos que o limite."""
+        backup = self.backup_manager()
+        try:
+            snapshot = await self.loop.run_in_executor(None, backup.create)
+            await self.loop.run_in_executor(None, backup.prune, self.settings.get("backup_manter", 30))
+        except (OSError, BackupError) as exc:
+            self.main_window.info_dialog("Backup", f"Não foi possível fazer o backup: {exc}")
+            return
+        instrumentacao.registrar("backup", snapshot["duracao_ms"])
+        self.last_backup = snapshot
+        self.refresh_backup_list()
+        self.main_window.info_dialog(
+            "Backup",
+            f"Backup de {snapshot['data']} concluído: {snapshot['objetos_novos']} objeto(s) novo(s), "
+            f"{snapshot['bytes_gravados'] / 1024:.1f} KB gravados em {snapshot['duracao_ms']:.0f} ms.\n\n"
+            f"Destino:\n{backup.destino}"
+        )
+
+    async def restore_backup(self, widget=None):
+        """Restaura o snapshot escolhido; o estado atual é guardado antes em um novo snapshot."""
+        escolhido = self.backup_select.value if self.backup_select is not None else None
+        if escolhido is None or escolhido.snapshot is None:
+            return
+        confirm = await self.main_window.dialog(toga.ConfirmDialog(
+            title="Restaurar backup",
+            message=f"Substituir os logs e as configurações pelo backup de {escolhido.rotulo}? "
+                    "O estado atual será guardado em um novo backup antes."
+        ))
+        if not confirm:
+            return
+
+        try:
+            relatorio = await self.loop.run_in_executor(None, self.backup_manager().restore, escolhido.snapshot)
+        except (OSError, BackupError) as exc:
+            self.main_window.info_dialog("Restaurar backup", f"Não foi possível restaurar: {exc}")
+            return
+
+        # 🔹 Tudo o que foi lido dos arquivos antigos deixa de valer
+        self.logs = []
+        self.logs_by_token = {}
+        self.record_cache.clear()
+        self.panel_cache.clear()
+        self.search_cache.clear()
+        self.shown_search = None
+        self.reset_stages()
+        self.return_to_main(widget)
+        self.main_window.info_dialog(
+            "Restaurar backup",
+            f"{relatorio['arquivos']} arquivo(s) restaurado(s) e conferido(s). "
+            "O estado anterior está no backup mais recente."
+        )
+
     def save_settings(self, widget=None):
         """Salva as configurações, incluindo o número de botões e nomes das etapas."""
         for stage, inputs in self.settings_inputs.items():
             self.stages[stage]['nome'] = inputs['nome'].value
             self.stages[stage]['codigo'] = inputs['codigo'].value
 
+        recentes = self.stage_catalog.recentes if hasattr(self, "stage_catalog") else []
+        self.stage_catalog = StageCatalog(self.stages, recentes)
+
         settings_data = {
+            **self.settings,  # 🔹 Preserva as demais opções (ex.: instrumentação)
             "num_buttons": self.num_buttons,  # 🔹 Salva o número de botões
-            "stages": self.stages
+            "stages": self.stages,
+            "etapas_recentes": self.stage_catalog.recentes
         }
+        sync_url_input = getattr(self, "sync_url_input", None)
+        sync_changed = sync_url_input is not None and sync_url_input.value.strip() != settings_data.get("sync_url", "")
+        if sync_changed:
+            settings_data["sync_url"] = sync_url_input.value.strip()
+        for chave, retention_input in getattr(self, "retention_inputs", {}).items():
+            try:
+                valor = float(retention_input.value.strip().replace(",", "."))
+            except ValueError:
+                valor = None
+            if valor is not None and valor > 0:
+                settings_data[chave] = int(valor) if valor.is_integer() else valor
+            else:
+                settings_data.pop(chave, None)
+        if getattr(self, "retention_mode_select", None) is not None:
+            settings_data["retencao_modo"] = self.retention_mode_select.value
+        self.settings = settings_data
 
         with open(self.settings_file, "w") as f:
             json.dump(settings_data, f, indent=4)
 
+        if sync_changed:
+            self.start_sync()
+        self.start_compaction()
+
         self.return_to_main(widget)
 
 
@@ -217,24 +747,158 @@ class TimeTrackerApp(toga.App):
             style=Pack(direction=COLUMN)
         )
 
+    def open_diagnostics(self, widget):
+        """Exibe o tamanho do arquivo de logs, o número de sessões e as latências recentes."""
+        diagnostics_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
+
+        tamanho = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+        try:
+            sessoes = len(self.store.load_index())
+        except OSError:
+            sessoes = 0
+
+        diagnostics_box.add(toga.Label(f"Arquivo de logs: {tamanho / 1024:.1f} KB", style=Pack(padding=5)))
+        diagnostics_box.add(toga.Label(f"Sessões salvas: {sessoes}", style=Pack(padding=5)))
+        if self.last_integrity is None:
+            integrity_text = "Integridade: verificação em andamento"
+        elif "erro" in self.last_integrity:
+            integrity_text = f"Integridade: verificação falhou: {self.last_integrity['erro']}"
+        else:
+            integrity_text = (
+                f"Integridade: {self.last_integrity['verificados']} registro(s) conferido(s) na abertura, "
+                f"{len(self.last_integrity['danos'])} danificado(s)"
+            )
+        diagnostics_box.add(toga.Label(integrity_text, style=Pack(padding=5)))
+
+        tick_stats = self.scheduler.stats()
+        diagnostics_box.add(toga.Label(
+            f"Atualização dos tempos: {tick_stats['ticks']} tick(s), {tick_stats['media_ms']} ms por tick, "
+            f"{tick_stats['pausados']} pausado(s) com a janela escondida",
+            style=Pack(padding=5)
+        ))
+        diagnostics_box.add(
+            toga.Label(f"Histórico de edições: {self.history.size() / 1024:.1f} KB", style=Pack(padding=5))
+        )
+        backup_text = f"Backups: {len(self.backup_manager().ids())} snapshot(s)"
+        if self.last_backup is not None:
+            backup_text += (
+                f" | último nesta execução: {self.last_backup['bytes_gravados'] / 1024:.1f} KB "
+                f"em {self.last_backup['duracao_ms']:.0f} ms"
+            )
+        diagnostics_box.add(toga.Label(backup_text, style=Pack(padding=5)))
+
+        cache_stats = self.record_cache.stats()
+        diagnostics_box.add(toga.Label(
+            f"Cache de sessões: {cache_stats['itens']}/{cache_stats['capacidade']} | "
+            f"acertos: {cache_stats['acertos']} | falhas: {cache_stats['falhas']}",
+            style=Pack(padding=5)
+        ))
+
+        search_stats = self.search_cache.stats()
+        diagnostics_box.add(toga.Label(
+            f"Cache de buscas: {search_stats['itens']}/{search_stats['capacidade']} | "
+            f"acertos: {search_stats['acertos']} | falhas: {search_stats['falhas']} | "
+            f"refinamentos: {search_stats['refinamentos']}",
+            style=Pack(padding=5)
+        ))
+
+        if self.sync_worker is not None:
+            sync_text = (
+                f"Sincronização: {self.sync_worker.pending_count} pendente(s) | "
+                f"enviadas: {self.sync_worker.sent}"
+            )
+            if self.sync_worker.last_error:
+                sync_text += f" | último erro: {self.sync_worker.last_error}"
+        else:
+            sync_text = "Sincronização: desativada"
+        diagnostics_box.add(toga.Label(sync_text, style=Pack(padding=5)))
+
+        agregados = Compactador(self.store, self.log_folder).agregados()
+        retention_text = f"Retidas fora do arquivo: {agregados['sessoes']} sessão(ões)"
+        if self.compaction_task is not None and not self.compaction_task.done():
+            retention_text += " | compactação em andamento"
+        elif self.last_compaction and "erro" in self.last_compaction:
+            retention_text += f" | última compactação falhou: {self.last_compaction['erro']}"
+        elif self.last_compaction:
+            retention_text += (
+                f" | última compactação: {self.last_compaction['expirados']} removida(s), "
+                f"{self.last_compaction['duplicadas']} duplicada(s)"
+            )
+        diagnostics_box.add(toga.Label(retention_text, style=Pack(padding=5)))
+        diagnostics_box.add(toga.Button(
+            "Compactar agora", on_press=lambda widget: self.start_compaction(force=True), style=Pack(padding=10)
+        ))
+
+        def toggle_instrumentation(widget):
+            instrumentacao.enabled = widget.value
+            self.settings["instrumentacao"] = widget.value
+            with open(self.settings_file, "w") as f:
+                json.dump(self.settings, f, indent=4)
+
+        diagnostics_box.add(toga.Switch(
+            "Instrumentação ativa",
+            value=instrumentacao.enabled,
+            on_change=toggle_instrumentation,
+            style=Pack(padding=5)
+        ))
+
+        # 🔹 Tabela com as latências recentes por operação
+        header = toga.Box(style=Pack(direction=ROW, padding=5, background_color="#dcdcdc"))
+        for titulo in ("Operação", "Chamadas", "p50 (ms)", "p95 (ms)", "Lidos (B)", "Gravados (B)"):
+            header.add(toga.Label(titulo, style=Pack(flex=1, padding=5, font_weight="bold")))
+        diagnostics_box.add(header)
+
+        resumo = instrumentacao.resumo()
+        if not resumo:
+            diagnostics_box.add(toga.Label("Nenhuma medição registrada.", style=Pack(padding=10, color="gray")))
+
+        for operacao, dados in resumo.items():
+            row = toga.Box(style=Pack(direction=ROW, padding=5))
+            for valor in (operacao, dados["chamadas"], dados["p50_ms"], dados["p95_ms"],
+                          dados["bytes_lidos"], dados["bytes_escritos"]):
+                row.add(toga.Label(str(valor), style=Pack(flex=1, padding=5)))
+            diagnostics_box.add(row)
+
+        def export(widget, formato):
+            caminho = os.path.join(self.log_folder, f"diagnostico.{formato}")
+            if formato == "json":
+                instrumentacao.exportar_json(caminho)
+            else:
+                instrumentacao.exportar_csv(caminho)
+            self.main_window.info_dialog("Diagnóstico", f"Medições exportadas para:\n{caminho}")
+
+        for formato in ("json", "csv"):
+            diagnostics_box.add(toga.Button(
+                f"Exportar {formato.upper()}",
+                on_press=functools.partial(export, formato=formato),
+                style=Pack(padding=10),
+            ))
+        diagnostics_box.add(toga.Button("Voltar", on_press=self.return_to_main, style=Pack(padding=10)))
+
+        self.main_window.content = toga.ScrollContainer(content=diagnostics_box)
+
+    @instrumentacao.medir("view_logs")
     def view_logs(self, widget):
         """Exibe a interface de consulta de logs, garantindo que os detalhes apareçam logo abaixo do item selecionado."""
         if not os.path.exists(self.log_file):
             self.main_window.info_dialog("Logs", "Nenhum log encontrado.")
             return
 
-        try:
-            with open(self.log_file, "r") as f:
-                self.logs = json.load(f)
-
-            if not isinstance(self.logs, list):
-                self.logs = []
-        except (json.JSONDecodeError, ValueError):
-            with open(self.log_file, "w") as f:
-                json.dump([], f, indent=4)
-
-            self.logs = []
-            self.main_window.info_dialog("Erro nos Logs", "O arquivo de logs estava corrompido e foi resetado.")
+        # 🔹 Mantém só o resumo de cada sessão; as etapas são lidas ao abrir os detalhes
+        self.logs = self.store.load_index()
+        if self.store.last_damage:
+            # 🔹 Trechos danificados são pulados na leitura; o arquivo é regravado só com as sessões íntegras
+            self.show_recovery_report(self.store.salvage())
+            self.logs = self.store.load_index()
+
+        self.logs_by_token = {log["token"]: log for log in self.logs}
+        self.record_cache.clear()
+        self.panel_cache.clear()
+        if self.search_task is not None:
+            self.search_task.cancel()
+        self.search_generation += 1
+        self.shown_search = None
+        instrumentacao.contar(registros=len(self.logs))
 
         # 🔹 Container principal
         main_container = toga.Box(style=Pack(direction=COLUMN, flex=1, padding=10))
@@ -242,16 +906,29 @@ class TimeTrackerApp(toga.App):
         # 🔹 Campo de busca
         search_box = toga.Box(style=Pack(direction=ROW, padding=10))
         self.search_input = toga.TextInput(
-            placeholder="Buscar por data, token ou card JIRA",
+            placeholder="Buscar por data, token ou card JIRA (ou card:, code:, date:, dur>, stage:)",
+            on_change=self.on_search_change,
             style=Pack(flex=1, padding=5)
         )
         search_button = toga.Button("Buscar", on_press=lambda widget: self.search_logs(widget) or self.prevent_scroll_on_click(), style=Pack(padding=5))
         search_box.add(self.search_input)
         search_box.add(search_button)
 
+        # 🔹 Busca aproximada: ignora maiúsculas/pontuação e ordena pelos mais parecidos
+        self.fuzzy_switch = toga.Switch(
+            "Busca aproximada", on_change=self.on_search_change, style=Pack(padding=(0, 15))
+        )
+
         back_button = toga.Button("Voltar", on_press=lambda widget: self.return_to_main(widget) or self.prevent_scroll_on_click(), style=Pack(padding=10))
 
+        # 🔹 Ordenação pelo tempo total gravado no resumo de cada sessão
+        self.sort_select = toga.Selection(
+            items=list(SORT_OPTIONS), on_change=self.on_search_change, style=Pack(padding=(0, 15))
+        )
+
         main_container.add(search_box)
+        main_container.add(self.fuzzy_switch)
+        main_container.add(self.sort_select)
         main_container.add(back_button)
 
         # 🔹 Container para resultados e detalhes
@@ -263,37 +940,187 @@ class TimeTrackerApp(toga.App):
         # 🔹 Envolve os resultados e detalhes dentro de um ScrollContainer
         self.main_window.content = toga.ScrollContainer(content=main_container)
 
+    def on_search_change(self, widget):
+        """Busca enquanto o usuário digita, esperando uma pausa curta entre as teclas."""
+        self.start_search(delay=SEARCH_DEBOUNCE)
+
     def search_logs(self, widget):
         """Filtra os logs e exibe os resultados na tela, garantindo que os detalhes apareçam logo abaixo."""
-        query = self.search_input.value.strip()
-        if not query:
-            return
+        self.start_search()
+
+    def start_search(self, delay=0):
+        """Cancela a busca em andamento e agenda uma nova com o texto atual."""
+        if self.search_task is not None and not self.search_task.done():
+            self.search_task.cancel()
+        self.search_generation += 1
+        self.search_task = self.loop.create_task(
+            self.run_search(self.search_input.value.strip(), self.search_generation, delay)
+        )
+        return self.search_task
 
-        filtered_logs = [
-            log for log in self.logs
-            if query in log["data_finalizacao"] or query in log["token"] or query in log["card_jira"]
-        ]
+    def clear_results(self):
+        self.results_box.clear()  # 🔹 Um único recálculo de layout, em vez de um por linha removida
 
-        for child in self.results_box.children[:]:
-            self.results_box.remove(child)
+    async def run_search(self, query, generation, delay=0):
+        """Executa a busca fora da thread da interface e mostra os resultados à medida que aparecem."""
+        if delay:
+            await asyncio.sleep(delay)  # 🔹 Cancelada aqui se outra tecla chegar antes
+        inicio = time.perf_counter()
 
-        if not filtered_logs:
-            self.results_box.add(toga.Label("Nenhum resultado encontrado.", style=Pack(padding=10, color="red")))
+        try:
+            chave, plan = self.search_key(query) if query else (None, None)
+        except QueryError as exc:
+            self.shown_search = None
+            self.clear_results()
+            self.results_box.add(toga.Label(f"Consulta inválida: {exc}", style=Pack(padding=10, color="red")))
             return
 
-        for log in filtered_logs:
-            log_box = toga.Box(style=Pack(direction=COLUMN, padding=8, background_color="#f5f5f5"))
+        if plan is not None and self.store.is_stale():
+            self.refresh_log_index()
+        exibida = (chave, self.sort_select.value, self.store.index_generation)
+        if chave is not None and exibida == self.shown_search:
+            return  # 🔹 A mesma busca já está na tela: mantém os widgets montados
+
+        self.shown_search = None
+        self.clear_results()
+        if not query:
+            return
+
+        matches = self.sorted_matches(self.search_matches(query, chave, plan))
+        exibidos = await self.stream_results(matches, generation)
+        if generation != self.search_generation:
+            return
+        if exibidos == 0:
+            self.results_box.add(toga.Label("Nenhum resultado encontrado.", style=Pack(padding=10, color="red")))
+        self.shown_search = exibida
+        instrumentacao.registrar("search_logs", (time.perf_counter() - inicio) * 1000, registros=exibidos)
+
+    async def stream_results(self, matches, generation, limite=SEARCH_PAGE_SIZE):
+        """Puxa os resultados em lotes numa thread e adiciona as linhas entre um lote e outro."""
+        exibidos = 0
+        while exibidos < limite:
+            lote = await self.loop.run_in_executor(
+                None, proximo_lote, matches, min(SEARCH_BATCH_SIZE, limite - exibidos)
+            )
+            # 🔹 A thread não pode ser interrompida: uma busca já substituída só descarta o lote
+            if generation != self.search_generation:
+                return exibidos
+            # 🔹 O lote entra de uma vez: cada add recalcula o layout da janela inteira
+            self.results_box.add(*(self.build_result_row(log, score) for score, log in lote))
+            exibidos += len(lote)
+            if len(lote) < SEARCH_BATCH_SIZE:
+                return exibidos
+
+        # 🔹 Muitos resultados: o restante só é montado se o usuário pedir
+        mais_button = toga.Button("Mostrar mais resultados", style=Pack(padding=10))
+
+        def mostrar_mais(widget):
+            if generation != self.search_generation:
+                return
+            self.results_box.remove(mais_button)
+            self.search_task = self.loop.create_task(self.stream_results(matches, generation))
+
+        mais_button.on_press = mostrar_mais
+        self.results_box.add(mais_button)
+        return exibidos
+
+    def search_key(self, query):
+        """Chave normalizada da busca no cache e o plano, se for uma consulta campo:valor."""
+        if parece_estruturada(query):
+            plan = compile_query(query)  # 🔹 Erros de sintaxe aparecem já aqui, na thread da interface
+            return ("consulta", tuple(sorted(repr(termo) for termo in plan.termos))), plan
+        if self.fuzzy_switch.value:
+            return ("aproximada", normalizar(query)), None
+        return ("texto", query), None
+
+    def search_matches(self, query, chave, plan=None):
+        """Iterador de pares (score, resumo) avaliado sob demanda, próprio para rodar em outra thread.
+
+        Passa pelo cache de buscas: a mesma consulta repete os resultados já
+        calculados e uma consulta que estende a anterior só filtra os dela.
+        """
+        geracao = self.store.index_generation
+        if plan is not None:
+            return self.search_cache.results(
+                chave, geracao, lambda: ((None, log) for log in self.run_structured_query(plan))
+            )
 
-            log_button = toga.Button(
-                f"DATA: {log['data_finalizacao']} | CARD: {log['card_jira']}",
-                on_press=functools.partial(self.display_log_details, log, log_box),
-                style=Pack(padding=5, font_weight="bold", color="blue", text_align="left")
+        resumos = self.logs
+        if chave[0] == "aproximada":
+            # 🔹 Só os k mais parecidos, já ordenados pelo score: o heap precisa varrer tudo antes
+            return self.search_cache.results(
+                chave, geracao, lambda: sob_demanda(lambda: buscar_aproximado(resumos, query))
             )
 
-            log_box.add(log_button)
-            log_box.add(toga.Label("Clique para mais detalhes", style=Pack(padding=2, font_size=10, color="gray")))
+        def contem(item):
+            log = item[1]
+            return query in log["data_finalizacao"] or query in log["token"] or query in log["card_jira"]
+
+        def refinar(anterior):
+            # 🔹 Quem contém o texto novo contém qualquer trecho dele: basta filtrar os resultados do trecho
+            if anterior[0] == "texto" and anterior[1] in query:
+                return contem
+            return None
+
+        return self.search_cache.results(
+            chave, geracao, lambda: filter(contem, ((None, log) for log in resumos)), refinar
+        )
+
+    def sorted_matches(self, matches):
+        """Aplica a ordenação escolhida; ordenar exige todos os resultados, então roda na thread de busca."""
+        decrescente = SORT_OPTIONS.get(self.sort_select.value)
+        if decrescente is None:
+            return matches
+        return sob_demanda(lambda: sorted(
+            matches, key=lambda item: item[1].get("tempo_total", 0), reverse=decrescente
+        ))
+
+    def run_structured_query(self, plan):
+        """Executa uma consulta campo:valor usando os índices dos resumos."""
+        resumos = self.logs
+        # 🔹 Os índices são refeitos só quando a lista de resumos muda
+        if self.query_indexes is None or self.query_indexes.resumos is not resumos:
+            self.query_indexes = QueryIndexes(resumos, self.store.index_generation)
+        yield from plan.execute(
+            self.query_indexes, carregar=self.read_record_quiet, varrer=self.search_store.iter_logs,
+            geracao=self.search_store.generation, reindexar=self.reindex_search,
+        )
+
+    def reindex_search(self):
+        """Índices montados direto do arquivo, para quando ele é regravado no meio de uma consulta."""
+        resumos = self.search_store.load_index()
+        return QueryIndexes(resumos, self.search_store.index_generation)
 
-            self.results_box.add(log_box)
+    def read_record_quiet(self, summary):
+        """Lê a sessão sem passar pelo cache (seguro fora da thread da interface)."""
+        try:
+            return self.search_store.read_record(summary)
+        except (OSError, StaleIndexError):
+            return None
+
+    def build_result_row(self, log, score=None):
+        """Cria a linha de um resultado da busca; o clique abre os detalhes logo abaixo."""
+        log_box = toga.Box(style=Pack(direction=COLUMN, padding=8, background_color="#f5f5f5"))
+
+        texto = f"DATA: {log['data_finalizacao']} | CARD: {log['card_jira']}"
+        if "tempo_total" in log:
+            texto += f" | TOTAL: {self.format_duration(log['tempo_total'])} | ETAPAS: {log['num_etapas']}"
+
+        log_button = toga.Button(
+            texto,
+            on_press=functools.partial(self.display_log_details, log, log_box),
+            style=Pack(padding=5, font_weight="bold", color="blue", text_align="left")
+        )
+
+        hint = "Clique para mais detalhes"
+        if log.get("etapa_dominante"):
+            hint = f"Mais tempo em: {log['etapa_dominante']} | {hint}"
+        if score is not None:
+            hint = f"Semelhança: {score:.0%} | {hint}"
+
+        log_box.add(log_button)
+        log_box.add(toga.Label(hint, style=Pack(padding=2, font_size=10, color="gray")))
+        return log_box
 
     def update_time(self, inicio_input, fim_input, tempo_label):
         """Recalcula automaticamente o tempo baseado no início e fim."""
@@ -319,7 +1146,36 @@ class TimeTrackerApp(toga.App):
         except ValueError:
             tempo_label.text = "0"  # Se der erro no formato, colocar como 0
 
-    def display_log_details(self, log, log_box, widget=None):
+    def refresh_log_index(self):
+        """Remonta o índice quando outra instância regravou o arquivo de logs."""
+        self.logs = self.store.load_index()
+        self.logs_by_token = {log["token"]: log for log in self.logs}
+        self.record_cache.clear()
+        self.panel_cache.clear()
+
+    def load_log_record(self, summary):
+        """Retorna a sessão completa a partir do resumo, usando o cache LRU (None se ela não existir mais)."""
+        token = summary["token"]
+        if self.store.is_stale():
+            self.refresh_log_index()
+
+        log = self.record_cache.get(token)
+        if log is None:
+            if token not in self.logs_by_token:
+                return None
+            try:
+                log = self.store.read_record(self.logs_by_token[token])
+            except StaleIndexError:
+                # 🔹 O arquivo mudou entre a checagem e a leitura: remonta o índice e tenta de novo
+                self.refresh_log_index()
+                if token not in self.logs_by_token:
+                    return None
+                log = self.store.read_record(self.logs_by_token[token])
+            self.record_cache.put(token, log)
+        return log
+
+    @instrumentacao.medir("display_log_details")
+    def display_log_details(self, summary, log_box, widget=None):
         """Exibe os detalhes do log abaixo do item clicado. Se já estiver aberto, fecha."""
         
         # 🔹 Se o log já estiver aberto, remove ele ao clicar novamente
@@ -329,8 +1185,29 @@ class TimeTrackerApp(toga.App):
             self.current_token = None  # 🔹 Reseta o token ao fechar o detalhe
             return
 
-        self.current_token = log["token"]  # 🔹 Armazena o token do log atual
+        self.current_token = summary["token"]  # 🔹 Armazena o token do log atual
+
+        # 🔹 Reaproveita o painel já montado para este token, se ainda estiver no cache
+        if self.store.is_stale():
+            self.refresh_log_index()
+        details_container = self.panel_cache.get(summary["token"])
+        if details_container is None:
+            log = self.load_log_record(summary)
+            if log is None:
+                self.current_token = None
+                self.main_window.info_dialog("Logs", "Esta sessão não existe mais no arquivo de logs.")
+                return
+            details_container = self.build_details_panel(log)
+            self.panel_cache.put(summary["token"], details_container)
+        elif details_container.parent is not None:
+            details_container.parent.details = None
+            details_container.parent.remove(details_container)
 
+        log_box.details = details_container  # Marca que o log já tem um detalhe aberto
+        log_box.add(details_container)
+
+    def build_details_panel(self, log):
+        """Monta o painel de detalhes de uma sessão."""
         details_container = toga.Box(style=Pack(direction=COLUMN, padding=10, background_color="#e0e0e0"))
 
         details_container.add(toga.Label(f"Card JIRA: {log['card_jira']}", style=Pack(padding=5, font_weight="bold")))
@@ -344,15 +1221,22 @@ class TimeTrackerApp(toga.App):
         
         details_container.add(header)
 
-        for etapa in log["etapas"]:
+        def build_row(item):
+            etapa, tempo_minutos = item
             row = toga.Box(style=Pack(direction=ROW, padding=5))
             row.add(toga.Label(etapa["etapa"], style=Pack(flex=1, padding=5)))
             row.add(toga.Label(etapa["codigo"], style=Pack(flex=1, padding=5)))
-
-            tempo_minutos = math.ceil(etapa["tempo"] / 60)
             row.add(toga.Label(f"{tempo_minutos} minuto(s)", style=Pack(flex=1, padding=5)))
+            return row
 
-            details_container.add(row)
+        # 🔹 Minutos já calculados ao salvar; sessões antigas sem resumo calculam na hora
+        minutos = (log.get("resumo") or {}).get("minutos")
+        if not isinstance(minutos, list) or len(minutos) != len(log["etapas"]):
+            minutos = resumir_sessao(log["etapas"])["minutos"]
+
+        rows_box = toga.Box(style=Pack(direction=COLUMN))
+        details_container.add(rows_box)
+        self.render_rows(rows_box, list(zip(log["etapas"], minutos)), build_row)
 
         edit_button = toga.Button(
             "Editar",
@@ -360,10 +1244,119 @@ class TimeTrackerApp(toga.App):
             style=Pack(padding=10, background_color="#FFC107", color="black")
         )
         
+        history_button = toga.Button(
+            "Histórico",
+            on_press=lambda widget: self.show_history(details_container.log, details_container),
+            style=Pack(padding=10)
+        )
+
         details_container.add(edit_button)
+        details_container.add(history_button)
+        details_container.edit_box = None
+        details_container.cached_edit_box = None
+        details_container.history_box = None
+        details_container.log = log  # 🔹 Trocado quando uma versão é restaurada com o painel aberto
+        return details_container
+
+    def show_history(self, log, details_container):
+        """Lista as versões da sessão, da atual até a medição original. Se já estiver aberta, fecha."""
+        if details_container.history_box is not None:
+            details_container.remove(details_container.history_box)
+            details_container.history_box = None
+            return
+        self.render_history(log, details_container)
+
+    def render_history(self, log, details_container):
+        history_box = toga.Box(style=Pack(direction=COLUMN, padding=10, background_color="#f0f0f0"))
+        versoes = self.history.versions(log["token"], log["etapas"])
+        if len(versoes) == 1:
+            history_box.add(toga.Label("Nenhuma edição registrada.", style=Pack(padding=5, color="gray")))
+
+        for posicao, (versao, data, motivo, etapas) in enumerate(versoes):
+            version_box = toga.Box(style=Pack(direction=COLUMN, padding=2))
+            row = toga.Box(style=Pack(direction=ROW, padding=2))
+            titulo = f"Versão {versao}" + (" (atual)" if posicao == 0 else "")
+            total = sum(etapa.get("tempo", 0) or 0 for etapa in etapas)
+            row.add(toga.Label(
+                f"{titulo} | {data or 'medição original'} | {motivo} | "
+                f"{len(etapas)} ocorrência(s) | {self.format_duration(total)}",
+                style=Pack(flex=1, padding=5)
+            ))
+            row.add(toga.Button(
+                "Ver", on_press=functools.partial(self.toggle_version_rows, version_box, etapas), style=Pack(padding=5)
+            ))
+            if posicao > 0:
+                row.add(toga.Button(
+                    "Restaurar",
+                    on_press=functools.partial(self.restore_version, log["token"], versao, details_container),
+                    style=Pack(padding=5, background_color="#FFC107", color="black")
+                ))
+            version_box.add(row)
+            version_box.rows = None
+            history_box.add(version_box)
+
+        details_container.history_box = history_box
+        details_container.add(history_box)
+
+    def toggle_version_rows(self, version_box, etapas, widget=None):
+        if version_box.rows is not None:
+            version_box.remove(version_box.rows)
+            version_box.rows = None
+            return
 
-        log_box.details = details_container  # Marca que o log já tem um detalhe aberto
-        log_box.add(details_container)
+        def build_row(etapa):
+            return toga.Label(
+                f"{etapa['etapa']} ({etapa['codigo']}): {etapa.get('inicio')} - {etapa.get('fim')} | "
+                f"{self.format_duration(etapa.get('tempo', 0) or 0)}",
+                style=Pack(padding=(2, 15), font_size=10)
+            )
+
+        version_box.rows = toga.Box(style=Pack(direction=COLUMN))
+        version_box.add(version_box.rows)
+        self.render_rows(version_box.rows, etapas, build_row)
+
+    def restore_version(self, token, versao, details_container=None, widget=None):
+        """Volta a sessão para uma versão anterior; a restauração vira uma nova versão no histórico."""
+        restaurados, alteracoes = [], []
+
+        def alterar(logs):
+            for log in logs:
+                if log["token"] == token:
+                    etapas = self.history.version(token, log["etapas"], versao)
+                    alteracoes.append((log["etapas"], etapas))
+                    log["etapas"] = etapas
+                    log["resumo"] = resumir_sessao(etapas)
+                    restaurados.append(log)
+
+        try:
+            with self.store.locked():
+                self.logs = self.store.update(alterar)
+                for antes, depois in alteracoes:
+                    self.history.record(token, antes, depois, motivo=f"restauração da versão {versao}")
+        except KeyError:
+            self.main_window.info_dialog("Histórico", "Essa versão não existe mais no histórico.")
+            return
+        self.after_log_update(token, restaurados, "edicao")
+
+        # 🔹 O painel aberto passa a listar as versões a partir da sessão restaurada
+        if details_container is not None and restaurados:
+            details_container.log = restaurados[-1]
+            if details_container.history_box is not None:
+                details_container.remove(details_container.history_box)
+                self.render_history(restaurados[-1], details_container)
+        self.main_window.info_dialog("Histórico", f"Sessão restaurada para a versão {versao}.")
+
+    def render_rows(self, container, items, build_row):
+        """Adiciona as linhas em blocos: o primeiro é imediato e os demais são agendados no event loop."""
+        container.add(*(build_row(item) for item in items[:DETAIL_CHUNK_SIZE]))
+
+        if len(items) > DETAIL_CHUNK_SIZE:
+            self.loop.create_task(self._render_remaining_rows(container, items, build_row))
+
+    async def _render_remaining_rows(self, container, items, build_row):
+        for inicio in range(DETAIL_CHUNK_SIZE, len(items), DETAIL_CHUNK_SIZE):
+            await asyncio.sleep(0)  # 🔹 Devolve o controle à interface entre os blocos
+            container.add(*(build_row(item) for item in items[inicio:inicio + DETAIL_CHUNK_SIZE]))
 
     def show_detailed_edit_view(self, log, details_container):
         """Mostra todas as ocorrências individuais para edição em ordem cronológica. Se já estiver aberta, fecha."""
@@ -374,6 +1367,22 @@ class TimeTrackerApp(toga.App):
             details_container.edit_box = None
             return
 
+        self.current_token = log["token"]
+
+        # 🔹 O painel de edição fica guardado junto com o painel de detalhes em cache
+        edit_box = getattr(details_container, "cached_edit_box", None)
+        if edit_box is None:
+            edit_box = self.build_edit_panel(log)
+            details_container.cached_edit_box = edit_box
+
+        self.edit_inputs = edit_box.inputs
+
+        # 🔹 Exibe os detalhes na tela abaixo do resumo do log
+        details_container.edit_box = edit_box  # Marca que a edição já foi aberta
+        details_container.add(edit_box)
+
+    def build_edit_panel(self, log):
+        """Monta o painel de edição com um campo de início e fim por ocorrência."""
         # 🔹 Criamos um container para os detalhes
         edit_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
 
@@ -388,8 +1397,9 @@ class TimeTrackerApp(toga.App):
         edit_box.add(header)
 
         # 🔹 Criar campos editáveis para cada entrada individual
-        self.edit_inputs = []
-        for etapa in log["etapas"]:
+        edit_box.inputs = []
+
+        def build_row(etapa):
             row = toga.Box(style=Pack(direction=ROW, padding=5))
 
             etapa_label = toga.Label(etapa["etapa"], style=Pack(flex=1, padding=5))
@@ -401,7 +1411,7 @@ class TimeTrackerApp(toga.App):
             tempo_label = toga.Label(f"{etapa['tempo']} segundo(s)", style=Pack(flex=1, padding=5))
 
             # 🔹 Guarda os inputs para edição
-            self.edit_inputs.append({
+            edit_box.inputs.append({
                 "etapa": etapa_label,
                 "codigo": codigo_label,
                 "inicio": inicio_input,
@@ -414,11 +1424,15 @@ class TimeTrackerApp(toga.App):
             row.add(inicio_input)
             row.add(fim_input)
             row.add(tempo_label)
-            edit_box.add(row)
 
             # 🔹 Atualiza o tempo automaticamente ao alterar os valores de início e fim
             inicio_input.on_change = lambda widget: self.update_time(inicio_input, fim_input, tempo_label)
             fim_input.on_change = lambda widget: self.update_time(inicio_input, fim_input, tempo_label)
+            return row
+
+        rows_box = toga.Box(style=Pack(direction=COLUMN))
+        edit_box.add(rows_box)
+        self.render_rows(rows_box, log["etapas"], build_row)
 
         # 🔹 Botão "Salvar Alterações"
         save_button = toga.Button(
@@ -429,10 +1443,7 @@ class TimeTrackerApp(toga.App):
         )
 
         edit_box.add(save_button)
-
-        # 🔹 Exibe os detalhes na tela abaixo do resumo do log
-        details_container.edit_box = edit_box  # Marca que a edição já foi aberta
-        details_container.add(edit_box)
+        return edit_box
 
     def prevent_scroll_on_click(self):
         """Mantém a posição de rolagem ao interagir com botões."""
@@ -445,6 +1456,7 @@ class TimeTrackerApp(toga.App):
             pass  # Se não for possível acessar, ignora o erro
 
 
+    @instrumentacao.medir("save_edited_log")
     def save_edited_log(self, widget):
         """Salva as edições feitas nos detalhes do log e remove linhas vazias."""
         
@@ -452,11 +1464,39 @@ class TimeTrackerApp(toga.App):
             self.main_window.info_dialog("Erro", "Nenhum log foi selecionado para edição.")
             return
 
-        with open(self.log_file, "r") as f:
-            logs = json.load(f)
+        # 🔹 Lê, altera e grava sob lock: edições de outras instâncias feitas nesse meio tempo são preservadas
+        token = self.current_token
+        editados, antes = [], {}
+
+        def alterar(logs):
+            antes.update((log["token"], log["etapas"]) for log in logs if log["token"] == token)
+            editados.extend(self.apply_edits(logs, token))
 
+        with self.store.locked():
+            self.logs = self.store.update(alterar)
+            # 🔹 Só depois da gravação: uma falha ao gravar não deixa no histórico uma versão que não existe
+            for log in editados:
+                # 🔹 Só os intervalos alterados vão para o histórico; o arquivo guarda a versão atual
+                self.history.record(token, antes[token], log["etapas"])
+        self.after_log_update(token, editados, "edicao")
+
+        self.main_window.info_dialog("Sucesso", "Log atualizado com sucesso!")
+        self.current_token = None  # 🔹 Reseta o token após salvar
+
+    def after_log_update(self, token, alterados, tipo):
+        """Atualiza o índice, os caches e a fila de sincronização depois de regravar uma sessão."""
+        for log in alterados:
+            self.queue_sync(tipo, log)
+        self.logs_by_token = {log["token"]: log for log in self.logs}
+        self.record_cache.invalidate(token)
+        self.panel_cache.invalidate(token)
+
+    def apply_edits(self, logs, token):
+        """Aplica os valores dos campos de edição às etapas da sessão `token` e retorna as sessões alteradas."""
+        editados = []
         for log in logs:
-            if log["token"] == self.current_token:
+            if log["token"] == token:
+                editados.append(log)
                 novas_etapas = []
 
                 for i, etapa in enumerate(log["etapas"]):
@@ -481,14 +1521,14 @@ class TimeTrackerApp(toga.App):
                                 "fim": fim,
                                 "tempo": tempo_total
                             })
+                    else:
+                        novas_etapas.append(etapa)  # 🔹 Linha ainda não exibida: mantém como está
 
                 log["etapas"] = novas_etapas
+                log["resumo"] = resumir_sessao(novas_etapas)
+                instrumentacao.contar(registros=len(novas_etapas))
 
-        with open(self.log_file, "w") as f:
-            json.dump(logs, f, indent=4)
-
-        self.main_window.info_dialog("Sucesso", "Log atualizado com sucesso!")
-        self.current_token = None  # 🔹 Reseta o token após salvar
+        return editados
 
     async def clear_logs(self, widget):
         """Solicita confirmação antes de apagar todos os logs."""
@@ -500,17 +1540,26 @@ class TimeTrackerApp(toga.App):
 
         if confirm:
             # Apaga o conteúdo do arquivo de logs
-            if os.path.exists(self.log_file):
-                with open(self.log_file, "w") as f:
-                    json.dump([], f, indent=4)
+            with self.store.locked():
+                if os.path.exists(self.log_file):
+                    self.store.write_all([])
+                self.history.clear()
+
+            self.logs = []
+            self.logs_by_token = {}
+            self.record_cache.clear()
+            self.panel_cache.clear()
+            self.search_cache.clear()
+            if self.search_task is not None:
+                self.search_task.cancel()
+            self.search_generation += 1
+            self.shown_search = None
 
             # Verifica se results_box e details_box existem antes de tentar limpá-los
             if hasattr(self, "results_box") and self.results_box:
-                for child in self.results_box.children[:]:
-                    self.results_box.remove(child)
+                self.clear_results()
             if hasattr(self, "details_box") and self.details_box:
-                for child in self.details_box.children[:]:
-                    self.details_box.remove(child)
+                self.details_box.clear()
 
             # Exibe confirmação de que os logs foram apagados
             info_dialog = toga.InfoDialog(
@@ -520,89 +1569,45 @@ class TimeTrackerApp(toga.App):
             await self.main_window.dialog(info_dialog)
     
     def handle_stage(self, widget):
-        """Gerencia a seleção de etapas e o tempo registrado."""
+        return self.select_stage(widget.id, widget)
+
+    @instrumentacao.medir("handle_stage")
+    def select_stage(self, stage_name, widget=None):
+        """Gerencia a seleção de etapas e o tempo registrado na sessão em primeiro plano."""
         now = time.time()
         timestamp = datetime.now().strftime("%H:%M:%S")
+        session = self.sessions.foreground
 
-        # Desativar botões e configurações enquanto uma etapa está ativa
-        self.logs_button.enabled = False
-        self.finish_button.enabled = True
-
-        # Desativar o menu de configurações
-        for command in self.main_window.toolbar:
-            command.enabled = False  # 🔹 Desativa os comandos do menu
-
-        # Se já havia uma etapa ativa, salva o tempo e o horário de fim
-        if self.current_stage:
-            elapsed = now - self.start_time
-            self.stages[self.current_stage]["tempos"].append(elapsed)
-
-            if "horarios" not in self.stages[self.current_stage]:
-                self.stages[self.current_stage]["horarios"] = []
-
-            self.stages[self.current_stage]["horarios"].append({
-                "inicio": self.stages[self.current_stage]["hora_inicio"],
-                "fim": timestamp,
-                "tempo": elapsed
-            })
-
-            self.stages[self.current_stage]["hora_fim"] = timestamp
-            del self.buttons[self.current_stage].style.background_color
-
-        # Atualiza a nova etapa e registra um novo horário de início
-        self.current_stage = widget.id
-        self.start_time = now
-
-        if "horarios" not in self.stages[self.current_stage]:
-            self.stages[self.current_stage]["horarios"] = []
+        # Se já havia uma etapa ativa, a sessão salva o tempo e o horário de fim
+        session.switch_stage(stage_name, now, timestamp)
+        # 🔹 Os botões de recentes só são remontados quando a ordem muda
+        if self.num_buttons > STAGE_PICKER_THRESHOLD and self.stage_catalog.mark_used(stage_name):
+            self.render_recent_stages()
+        else:
+            self.refresh_stage_highlight()
 
-        self.stages[self.current_stage]["hora_inicio"] = timestamp  # Registra o início da nova etapa
-        widget.style.background_color = "lightblue"
+        # Desativar logs e configurações enquanto uma etapa está ativa
+        self.finish_button.enabled = True
+        self.update_tracking_controls()
+        self.refresh_session_status(now)
 
     def format_time(self, seconds):
         """Converte segundos para minutos, sempre arredondando para cima."""
         minutes = math.ceil(seconds / 60)  # 🔹 Sempre arredonda para cima
         return f"{minutes} minuto(s)"
 
+    @instrumentacao.medir("finish_tracking")
     def finish_tracking(self, widget):
-        """Finaliza a contagem de tempo, salva os logs e reativa os botões e menus."""
-        if self.current_stage:
-            elapsed = time.time() - self.start_time
-            self.stages[self.current_stage]["tempos"].append(elapsed)
-
-            if "horarios" not in self.stages[self.current_stage]:
-                self.stages[self.current_stage]["horarios"] = []
-
-            self.stages[self.current_stage]["horarios"].append({
-                "inicio": self.stages[self.current_stage]["hora_inicio"],
-                "fim": datetime.now().strftime("%H:%M:%S"),
-                "tempo": elapsed
-            })
-
-            self.stages[self.current_stage]["hora_fim"] = datetime.now().strftime("%H:%M:%S")
-
-        # Reativar os botões e configurações
-        self.logs_button.enabled = True
-        self.finish_button.enabled = False
-
-        for command in self.main_window.toolbar:
-            command.enabled = True  # 🔹 Reativa os comandos do menu
+        """Finaliza a sessão em primeiro plano, salva o log e reativa os botões e menus."""
+        session = self.sessions.foreground
+        session.stop(time.time(), datetime.now().strftime("%H:%M:%S"))
 
         jira_card = self.jira_input.value.strip() or "SEM CARD JIRA"
-        total_time = sum(sum(stage["tempos"]) for stage in self.stages.values())
+        total_time = session.elapsed(time.time())
+        token = uuid.uuid4().hex
 
         # 🔹 Criar log completo com todas as ocorrências separadas
-        log_completo = []
-        for stage_name, data in self.stages.items():
-            if "horarios" in data and len(data["horarios"]) > 0:
-                for horario in data["horarios"]:
-                    log_completo.append({
-                        "etapa": data["nome"],
-                        "codigo": data["codigo"],
-                        "inicio": horario["inicio"],
-                        "fim": horario["fim"],
-                        "tempo": horario["tempo"]
-                    })
+        log_completo = session.build_log(self.stages)
 
         # 🔹 Criar log resumido apenas com etapas agrupadas e tempos somados
         etapas_agrupadas = {}
@@ -613,7 +1618,7 @@ class TimeTrackerApp(toga.App):
             etapas_agrupadas[chave] += item["tempo"]
 
         # 🔹 Exibir o resumo com tempos em minutos
-        resumo_text = f"Card JIRA: {jira_card}\nToken: {uuid.uuid4().hex}\n\n"
+        resumo_text = f"Card JIRA: {jira_card}\nToken: {token}\n\n"
         for (etapa, codigo), tempo in etapas_agrupadas.items():
             resumo_text += f"Etapa: {etapa}\nCódigo: {codigo}\nTempo: {self.format_time(tempo)}\n\n"
 
@@ -621,49 +1626,37 @@ class TimeTrackerApp(toga.App):
         self.main_window.info_dialog("Resumo do Acompanhamento", resumo_text)
 
         # 🔹 Agora salvamos o log completo!
-        self.save_log(uuid.uuid4().hex, jira_card, log_completo)
-
-        # 🔹 Resetar estados para um novo acompanhamento
-        for stage in self.stages.values():
-            stage["tempos"] = []
-            stage["hora_inicio"] = None
-            stage["hora_fim"] = None
-            stage["horarios"] = []
+        instrumentacao.contar(registros=len(log_completo))
+        self.save_log(token, jira_card, log_completo)
 
-        self.current_stage = None
-        self.start_time = None
-        self.jira_input.value = ""
+        # 🔹 Encerra a sessão; a próxima (ou uma nova, vazia) vai para o primeiro plano
+        self.sessions.finish(session.nome)
+        self.show_foreground_session()
+        self.save_recent_stages()
 
-        # Resetar botões (remover cores de seleção)
-        for button in self.buttons.values():
-            del button.style.background_color
+    def save_recent_stages(self):
+        """Guarda as etapas recentes do seletor, só quando mudaram."""
+        if self.settings.get("etapas_recentes", []) == self.stage_catalog.recentes:
+            return
+        self.settings["etapas_recentes"] = list(self.stage_catalog.recentes)
+        with open(self.settings_file, "w") as f:
+            json.dump(self.settings, f, indent=4)
 
+    @instrumentacao.medir("save_log")
     def save_log(self, token, jira_card, log_completo):
-        """Salva os logs garantindo que o JSON seja válido."""
+        """Salva a sessão finalizada no arquivo de logs."""
         log_data = {
             "token": token,
             "data_finalizacao": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
             "card_jira": jira_card,
-            "etapas": log_completo  # 🔹 Salva o log completo
+            "etapas": log_completo,  # 🔹 Salva o log completo
+            "resumo": resumir_sessao(log_completo)  # 🔹 Totais prontos para a lista de resultados
         }
 
-        # 🔹 Verifica se o arquivo de logs existe e contém um JSON válido
-        if os.path.exists(self.log_file):
-            try:
-                with open(self.log_file, "r") as f:
-                    logs = json.load(f)
-                    if not isinstance(logs, list):
-                        logs = []  # Se não for uma lista, recria
-            except (json.JSONDecodeError, ValueError):
-                logs = []  # Se o JSON estiver corrompido, recria a lista vazia
-        else:
-            logs = []
-
-        logs.append(log_data)  # Adiciona o novo log
-
-        # 🔹 Salva os logs garantindo um JSON formatado corretamente
-        with open(self.log_file, "w") as f:
-            json.dump(logs, f, indent=4)
+        # 🔹 Acrescenta um registro enquadrado ao fim do arquivo, sem reler nem regravar as sessões anteriores
+        self.store.append(log_data)
+        instrumentacao.contar(registros=1)
+        self.queue_sync("sessao", log_data)
 
         print("✅ Logs salvos com sucesso.")
 
@@ -0,0 +1,404 @@
+"""Backups incrementais da pasta de dados, endereçados pelo conteúdo.
+
+Cada arquivo é dividido em partes terminadas em quebra de linha. O corte cai
+depois das linhas cujo CRC32 termina com os bits de MASCARA_CORTE ligados (em
+média uma a cada 32 sessões do arquivo de logs), então inserir, editar ou
+acrescentar uma sessão só muda as partes vizinhas. Cada parte é guardada uma
+única vez, compactada ou não, em "objetos/<2 primeiros>/<sha256>[.gz]". A lista
+de partes ([[sha256, bytes], ...]) vai para o mesmo depósito em blocos de
+PARTES_POR_BLOCO, e o snapshot é um manifesto em "snapshots/<id>.json":
+
+    {"id": ..., "data": ..., "motivo": ..., "arquivos": {"tracking_logs.json":
+        {"tamanho": ..., "inode": ..., "mtime": ..., "blocos": [[sha256, partes], ...]}}}
+
+Assim, acrescentar uma sessão grava a parte final, o último bloco e um manifesto
+pequeno, qualquer que seja o tamanho do histórico.
+
+Arquivos com o mesmo inode, tamanho e mtime do snapshot anterior reaproveitam
+as partes sem ser lidos. O arquivo de logs e o histórico de edições só crescem
+no lugar, e cada regravação deles avança um contador ("<arquivo>.rewrites",
+ver log_store.marcar_regravacao) guardado no manifesto. Com o contador igual e
+o arquivo maior, só é lido o trecho a partir da última parte do snapshot
+anterior; sem essa prova (o inode pode ter sido reaproveitado), o arquivo é
+lido por inteiro.
+
+A restauração remonta todos os arquivos conferindo o sha256 de cada parte antes
+de gravar qualquer coisa, e guarda o estado atual em um snapshot antes de
+substituí-lo.
+
+Uso:
+    python -m AppEnsaios.backup pasta/logs destino [--listar] [--verificar ID] [--restaurar ID] [--sem-compactar]
+"""
+import argparse
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+from AppEnsaios.log_store import LogStore, marcar_regravacao, regravacoes
+
+MASCARA_CORTE = 0x1F
+PARTES_POR_BLOCO = 32
+TAMANHO_MAXIMO_PARTE = 256 * 1024  # 🔹 Arquivos sem quebras de linha (ex.: .gz) são cortados por tamanho
+SO_ACRESCIMOS = ("tracking_logs.json", "tracking_logs.json.history.jsonl")
+IGNORADOS = (".lock", ".gen", ".verified", ".rewrites", ".tmp")
+
+
+class BackupError(Exception):
+    """Snapshot inexistente ou com partes ausentes ou danificadas."""
+
+
+def dividir(dados):
+    """Divide os bytes em partes; cada corte depende só da linha que termina nele e do início da parte."""
+    partes = []
+    inicio = pos = 0
+    while pos < len(dados):
+        limite = inicio + TAMANHO_MAXIMO_PARTE
+        fim = dados.find(b"\n", pos, limite)
+        if fim >= 0:
+            fim += 1
+            corte = zlib.crc32(dados[pos:fim]) & MASCARA_CORTE == MASCARA_CORTE
+        else:
+            fim = min(len(dados), limite)
+            corte = fim == limite
+        if corte:
+            partes.append(dados[inicio:fim])
+            inicio = fim
+        pos = fim
+    if inicio < len(dados):
+        partes.append(dados[inicio:])
+    return partes
+
+
+def _gravar(path, conteudo):
+    """Grava em um temporário e troca de lugar, como o arquivo de logs."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+class Backup:
+    """Snapshots da pasta `pasta` guardados em `destino`.
+
+    Com um LogStore, o arquivo de logs é lido e restaurado sob o lock de escrita dele.
+    """
+
+    def __init__(self, pasta, destino, store=None, compactar=True):
+        self.pasta = pasta
+        self.destino = destino
+        self.store = store
+        self.compactar = compactar
+        self.objetos_dir = os.path.join(destino, "objetos")
+        self.snapshots_dir = os.path.join(destino, "snapshots")
+
+    def _locked(self):
+        return self.store.locked() if self.store is not None else contextlib.nullcontext()
+
+    def _arquivos(self):
+        """Caminhos relativos (com "/") dos arquivos da pasta, sem locks, temporários e o próprio destino."""
+        destino = os.path.abspath(self.destino)
+        arquivos = []
+        for raiz_dir, dirs, nomes in os.walk(self.pasta):
+            dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(raiz_dir, d)) != destino)
+            for nome in sorted(nomes):
+                if nome.startswith(".tmp-") or nome.endswith(IGNORADOS):
+                    continue
+                arquivos.append(os.path.relpath(os.path.join(raiz_dir, nome), self.pasta).replace(os.sep, "/"))
+        return arquivos
+
+    def ids(self):
+        """Ids dos snapshots, do mais novo para o mais antigo."""
+        try:
+            nomes = os.listdir(self.snapshots_dir)
+        except FileNotFoundError:
+            return []
+        return sorted((nome[:-5] for nome in nomes if nome.endswith(".json")), reverse=True)
+
+    def manifest(self, snapshot_id):
+        try:
+            with open(os.path.join(self.snapshots_dir, snapshot_id + ".json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise BackupError(f"Snapshot {snapshot_id} não encontrado ou ilegível")
+
+    def snapshots(self):
+        """Resumo de cada snapshot legível, do mais novo para o mais antigo."""
+        resumos = []
+        for snapshot_id in self.ids():
+            with contextlib.suppress(BackupError):
+                manifesto = self.manifest(snapshot_id)
+                resumos.append({
+                    "id": snapshot_id,
+                    "data": manifesto["data"],
+                    "motivo": manifesto["motivo"],
+                    "arquivos": len(manifesto["arquivos"]),
+                    "tamanho": sum(arquivo["tamanho"] for arquivo in manifesto["arquivos"].values()),
+                })
+        return resumos
+
+    def create(self, motivo="manual"):
+        """Grava um snapshot só com as partes que o destino ainda não tem; retorna o manifesto e os contadores."""
+        inicio = time.perf_counter()
+        anterior = None
+        for snapshot_id in self.ids()[:1]:
+            with contextlib.suppress(BackupError):
+                anterior = self.manifest(snapshot_id)
+        anteriores = anterior["arquivos"] if anterior else {}
+
+        contadores = {"objetos_novos": 0, "bytes_lidos": 0, "bytes_gravados": 0}
+        arquivos = {}
+        with self._locked():
+            for rel in self._arquivos():
+                with contextlib.suppress(FileNotFoundError):  # 🔹 Removido durante a varredura
+                    arquivos[rel] = self._snapshot_file(rel, anteriores.get(rel), contadores)
+
+        agora = datetime.now()
+        manifesto = {
+            "id": agora.strftime("%Y%m%d-%H%M%S-%f"),
+            "data": agora.strftime("%d/%m/%Y %H:%M:%S"),
+            "motivo": motivo,
+            "arquivos": arquivos,
+        }
+        conteudo = json.dumps(manifesto, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        # 🔹 O manifesto é gravado por último: um snapshot interrompido não aparece na lista
+        _gravar(os.path.join(self.snapshots_dir, manifesto["id"] + ".json"), conteudo)
+        contadores["bytes_gravados"] += len(conteudo)
+        contadores["duracao_ms"] = round((time.perf_counter() - inicio) * 1000, 3)
+        return {**manifesto, **contadores}
+
+    def _snapshot_file(self, rel, anterior, contadores):
+        caminho = os.path.join(self.pasta, *rel.split("/"))
+        info = os.stat(caminho)
+        assinatura = {"tamanho": info.st_size, "inode": info.st_ino, "mtime": info.st_mtime_ns}
+        so_acrescimos = os.path.basename(rel) in SO_ACRESCIMOS
+        if so_acrescimos:
+            assinatura["regravacoes"] = regravacoes(caminho)
+        if anterior and all(anterior.get(chave) == valor for chave, valor in assinatura.items()):
+            return anterior  # 🔹 Não mudou: nem é aberto
+
+        with open(caminho, "rb") as f:
+            # 🔹 Só cresceu, sem regravação no meio: as partes anteriores à última continuam valendo
+            if (so_acrescimos and anterior and anterior["blocos"]
+                    and anterior.get("regravacoes") == assinatura["regravacoes"]
+                    and anterior["inode"] == info.st_ino and anterior["tamanho"] < info.st_size):
+                with contextlib.suppress(BackupError):
+                    ultimo_bloco = self._load_parts(anterior["blocos"][-1:])
+                    ultima, tamanho_ultima = ultimo_bloco[-1]
+                    f.seek(anterior["tamanho"] - tamanho_ultima)
+                    dados = f.read()
+                    contadores["bytes_lidos"] += len(dados)
+                    if hashlib.sha256(dados[:tamanho_ultima]).hexdigest() == ultima:
+                        novas = [self._store_object(parte, contadores) for parte in dividir(dados)]
+                        partes = ultimo_bloco[:-1] + novas
+                        return {
+                            **assinatura,
+                            "tamanho": anterior["tamanho"] - tamanho_ultima + len(dados),
+                            "blocos": anterior["blocos"][:-1] + self._store_parts(partes, contadores),
+                        }
+                f.seek(0)
+            dados = f.read()
+
+        contadores["bytes_lidos"] += len(dados)
+        partes = [self._store_object(parte, contadores) for parte in dividir(dados)]
+        # 🔹 O tamanho vem do que foi lido: um acréscimo feito depois do stat fica para o próximo snapshot
+        return {**assinatura, "tamanho": len(dados), "blocos": self._store_parts(partes, contadores)}
+
+    def _store_parts(self, partes, contadores):
+        """Guarda a lista de partes em blocos de PARTES_POR_BLOCO; retorna [[sha256, partes], ...]."""
+        blocos = []
+        for i in range(0, len(partes), PARTES_POR_BLOCO):
+            bloco = partes[i:i + PARTES_POR_BLOCO]
+            dados = json.dumps(bloco, separators=(",", ":")).encode("utf-8")
+            blocos.append([self._store_object(dados, contadores)[0], len(bloco)])
+        return blocos
+
+    def _load_parts(self, blocos):
+        partes = []
+        for digest, quantidade in blocos:
+            try:
+                bloco = json.loads(self._load_object(digest))
+            except ValueError:
+                bloco = None
+            if not isinstance(bloco, list) or len(bloco) != quantidade:
+                raise BackupError(f"bloco {digest[:12]} danificado")
+            partes += bloco
+        return partes
+
+    def _object_path(self, digest):
+        """Caminho da parte no destino (compactada ou não); None se ela não existir."""
+        base = os.path.join(self.objetos_dir, digest[:2], digest)
+        for path in (base + ".gz", base):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _store_object(self, dados, contadores):
+        digest = hashlib.sha256(dados).hexdigest()
+        if self._object_path(digest) is None:
+            path = os.path.join(self.objetos_dir, digest[:2], digest)
+            conteudo = dados
+            if self.compactar:
+                path += ".gz"
+                conteudo = gzip.compress(dados, mtime=0)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _gravar(path, conteudo)
+            contadores["objetos_novos"] += 1
+            contadores["bytes_gravados"] += len(conteudo)
+        return [digest, len(dados)]
+
+    def _load_object(self, digest, tamanho=None):
+        path = self._object_path(digest)
+        if path is None:
+            raise BackupError(f"parte {digest[:12]} ausente")
+        try:
+            with open(path, "rb") as f:
+                dados = f.read()
+            if path.endswith(".gz"):
+                dados = gzip.decompress(dados)
+        except (OSError, EOFError, zlib.error):
+            raise BackupError(f"parte {digest[:12]} ilegível")
+        if (tamanho is not None and len(dados) != tamanho) or hashlib.sha256(dados).hexdigest() != digest:
+            raise BackupError(f"parte {digest[:12]} danificada")
+        return dados
+
+    def _assemble(self, arquivo):
+        """Remonta o arquivo conferindo cada bloco, cada parte e o tamanho final."""
+        partes = self._load_parts(arquivo["blocos"])
+        dados = b"".join(self._load_object(digest, tamanho) for digest, tamanho in partes)
+        if len(dados) != arquivo["tamanho"]:
+            raise BackupError("tamanho divergente")
+        return dados
+
+    def _assemble_all(self, manifesto):
+        conteudos, problemas = {}, []
+        for rel, arquivo in manifesto["arquivos"].items():
+            try:
+                conteudos[rel] = self._assemble(arquivo)
+            except BackupError as exc:
+                problemas.append(f"{rel}: {exc}")
+        return conteudos, problemas
+
+    def verify(self, snapshot_id):
+        """Confere todas as partes do snapshot; retorna os problemas encontrados (vazio se íntegro)."""
+        return self._assemble_all(self.manifest(snapshot_id))[1]
+
+    def restore(self, snapshot_id):
+        """Restaura o snapshot depois de conferi-lo por inteiro; retorna um relatório.
+
+        Arquivos que não existiam no snapshot são removidos. O estado atual é
+        guardado antes em um snapshot novo, então a restauração pode ser desfeita.
+        """
+        conteudos, problemas = self._assemble_all(self.manifest(snapshot_id))
+        if problemas:
+            raise BackupError("Snapshot danificado, nada foi alterado:\n" + "\n".join(problemas))
+
+        log_path = os.path.abspath(self.store.path) if self.store is not None else None
+        with self._locked():
+            anterior = self.create(motivo=f"antes de restaurar {snapshot_id}")
+            removidos = [rel for rel in self._arquivos() if rel not in conteudos]
+            for rel, conteudo in conteudos.items():
+                caminho = os.path.join(self.pasta, *rel.split("/"))
+                if os.path.abspath(caminho) == log_path:
+                    self.store.restore(conteudo)  # 🔹 Avança a geração: outras instâncias refazem o índice
+                else:
+                    if os.path.basename(rel) in SO_ACRESCIMOS:
+                        marcar_regravacao(caminho)
+                    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                    _gravar(caminho, conteudo)
+            for rel in removidos:
+                caminho = os.path.join(self.pasta, *rel.split("/"))
+                if os.path.basename(rel) in SO_ACRESCIMOS:
+                    marcar_regravacao(caminho)
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(caminho)
+
+        return {
+            "snapshot": snapshot_id,
+            "arquivos": len(conteudos),
+            "bytes": sum(len(conteudo) for conteudo in conteudos.values()),
+            "removidos": removidos,
+            "anterior": anterior["id"],
+        }
+
+    def prune(self, manter):
+        """Apaga os snapshots além dos `manter` mais novos e as partes que só eles usavam.
+
+        Retorna quantos snapshots saíram.
+        """
+        ids = self.ids()
+        antigos = ids[max(1, manter):]
+        if not antigos:
+            return 0
+        for snapshot_id in antigos:
+            os.remove(os.path.join(self.snapshots_dir, snapshot_id + ".json"))
+
+        usadas = set()
+        for snapshot_id in ids[:max(1, manter)]:
+            for arquivo in self.manifest(snapshot_id)["arquivos"].values():
+                usadas.update(digest for digest, _ in arquivo["blocos"])
+                usadas.update(digest for digest, _ in self._load_parts(arquivo["blocos"]))
+        for raiz_dir, _, nomes in os.walk(self.objetos_dir):
+            for nome in nomes:
+                if nome.split(".")[0] not in usadas:
+                    os.remove(os.path.join(raiz_dir, nome))
+        return len(antigos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backup incremental da pasta de logs do app.")
+    parser.add_argument("pasta", help="Pasta de dados (a que contém o tracking_logs.json)")
+    parser.add_argument("destino", help="Pasta onde os snapshots são guardados")
+    parser.add_argument("--listar", action="store_true", help="Lista os snapshots existentes")
+    parser.add_argument("--verificar", metavar="ID", help="Confere as partes de um snapshot")
+    parser.add_argument("--restaurar", metavar="ID", help="Restaura um snapshot depois de conferi-lo")
+    parser.add_argument("--sem-compactar", action="store_true", help="Guarda as partes novas sem gzip")
+    args = parser.parse_args(argv)
+
+    backup = Backup(
+        args.pasta,
+        args.destino,
+        store=LogStore(os.path.join(args.pasta, "tracking_logs.json")),
+        compactar=not args.sem_compactar,
+    )
+    try:
+        if args.listar:
+            for snapshot in backup.snapshots():
+                print(f"{snapshot['id']}  {snapshot['data']}  {snapshot['arquivos']} arquivo(s)  {snapshot['motivo']}")
+        elif args.verificar:
+            problemas = backup.verify(args.verificar)
+            print("\n".join(problemas) if problemas else "Snapshot íntegro.")
+            return 1 if problemas else 0
+        elif args.restaurar:
+            relatorio = backup.restore(args.restaurar)
+            print(
+                f"{relatorio['arquivos']} arquivo(s) restaurado(s); "
+                f"estado anterior salvo em {relatorio['anterior']}"
+            )
+        else:
+            snapshot = backup.create()
+            print(
+                f"Snapshot {snapshot['id']}: {snapshot['objetos_novos']} objeto(s) novo(s), "
+                f"{snapshot['bytes_gravados'] / 1024:.1f} KB gravados em {snapshot['duracao_ms']:.0f} ms"
+            )
+    except BackupError as exc:
+        print(exc)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,469 @@
+"""Formato binário opcional (.aeb) para as sessões e seus intervalos.
+
+O JSON repete as chaves de cada intervalo e é formatado com indent=4; aqui os
+textos (etapas, códigos, tokens, cards, datas) ficam uma única vez em uma tabela
+de strings e os intervalos viram colunas de largura fixa (`array`). O leitor
+abre o arquivo com `mmap` e expõe cada coluna como um `memoryview` sobre o
+próprio arquivo: somar os tempos lê só a coluna de tempos, filtrar por código
+lê só a coluna de códigos.
+
+Layout (little-endian, seções alinhadas em 8 bytes):
+    cabeçalho   magic "AEB1", versão, nº de strings, sessões e intervalos
+    strings     posições (uint32, n+1) e depois os textos UTF-8 concatenados
+    sessões     colunas token, data, card, extra (ids de string), primeiro e
+                quantidade (faixa dos intervalos da sessão)
+    intervalos  colunas etapa, codigo, extra (ids de string), inicio e fim
+                (segundos do dia), tempo (float64) e tipo_tempo (uint8)
+
+Horários fora do formato HH:MM:SS são guardados na tabela de strings e chaves
+desconhecidas vão como JSON na coluna extra, então a conversão não perde dados.
+Só textos vão para a tabela de strings: token, data, card, etapa ou código
+ausentes ficam SEM_VALOR na coluna, e os de outro tipo (None, números) seguem na
+coluna extra com o tipo original; um horário ausente é HORARIO_AUSENTE. A coluna
+tipo_tempo diz se o tempo era int ou float; tempos de outros tipos (ou ausentes)
+vão na coluna extra. Arquivos das versões 1 e 2 continuam legíveis; os da
+versão 1, sem tipo_tempo, devolvem os tempos como float.
+"""
+import argparse
+import bisect
+import contextlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+from AppEnsaios.log_store import LogStore
+
+MAGIC = b"AEB1"
+VERSAO = 3
+VERSOES_LIDAS = (1, 2, 3)
+CABECALHO = struct.Struct("<4sHHIII")
+ALINHAMENTO = 8
+SEM_VALOR = 0xFFFFFFFF  # 🔹 id de string ausente (ex.: sem chaves extras)
+HORARIO_VAZIO = -1
+HORARIO_AUSENTE = -0x80000000  # 🔹 Chave inicio/fim ausente (diferente de None)
+
+CHAVES_SESSAO = ("token", "data_finalizacao", "card_jira", "etapas")
+CHAVES_INTERVALO = ("etapa", "codigo", "inicio", "fim", "tempo")
+TEXTOS_SESSAO = (("token", "token"), ("data", "data_finalizacao"), ("card", "card_jira"))  # 🔹 (coluna, chave)
+TEXTOS_INTERVALO = (("etapa", "etapa"), ("codigo", "codigo"))
+
+COLUNAS_SESSAO = (("token", "I"), ("data", "I"), ("card", "I"), ("extra", "I"),
+                  ("primeiro", "I"), ("quantidade", "I"))
+COLUNAS_INTERVALO_V1 = (("etapa", "I"), ("codigo", "I"), ("extra", "I"),
+                        ("inicio", "i"), ("fim", "i"), ("tempo", "d"))
+COLUNAS_INTERVALO = COLUNAS_INTERVALO_V1 + (("tipo_tempo", "B"),)
+
+# 🔹 Valores da coluna tipo_tempo
+TEMPO_FLOAT = 0
+TEMPO_INT = 1
+TEMPO_OUTRO = 2  # 🔹 Ausente ou não numérico: o valor, se houver, está na coluna extra
+
+_HORARIO = re.compile(r"^([01]\d|2[0-3]):([0-5]\d):([0-5]\d)$")
+_NATIVO_LITTLE = sys.byteorder == "little"
+
+
+class FormatoInvalido(ValueError):
+    """O arquivo não é um .aeb desta versão ou está truncado."""
+
+
+def _alinhar(posicao):
+    return (posicao + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+
+
+def _layout(n_strings, n_sessoes, n_intervalos, versao=VERSAO):
+    """Posição (offset, quantidade, typecode) de cada seção; depende só das contagens e da versão."""
+    colunas_intervalo = COLUNAS_INTERVALO if versao >= 2 else COLUNAS_INTERVALO_V1
+    secoes = {}
+    posicao = _alinhar(CABECALHO.size)
+    secoes["strings"] = (posicao, n_strings + 1, "I")
+    posicao = _alinhar(posicao + (n_strings + 1) * 4)
+    for prefixo, colunas, quantidade in (("sessao", COLUNAS_SESSAO, n_sessoes),
+                                         ("intervalo", colunas_intervalo, n_intervalos)):
+        for nome, typecode in colunas:
+            secoes[f"{prefixo}.{nome}"] = (posicao, quantidade, typecode)
+            posicao = _alinhar(posicao + quantidade * array(typecode).itemsize)
+    secoes["textos"] = (posicao, None, "B")
+    return secoes
+
+
+def _coluna_little(valores):
+    if not _NATIVO_LITTLE:
+        valores = array(valores.typecode, valores)
+        valores.byteswap()
+    return valores.tobytes()
+
+
+class _TabelaStrings:
+    def __init__(self):
+        self.ids = {}
+        self.textos = []
+
+    def id(self, texto):
+        if texto not in self.ids:
+            self.ids[texto] = len(self.textos)
+            self.textos.append(texto)
+        return self.ids[texto]
+
+
+def _texto(valor, strings):
+    """Id do texto; ausente ou de outro tipo fica SEM_VALOR (o valor, se houver, vai na coluna extra)."""
+    return strings.id(valor) if isinstance(valor, str) else SEM_VALOR
+
+
+def _guardadas(registro, textos):
+    """Chaves de texto que ficaram nas colunas próprias e não precisam ir na coluna extra."""
+    return {chave for _, chave in textos if isinstance(registro.get(chave), str)}
+
+
+def _codificar_horario(valor, strings):
+    if valor is None:
+        return HORARIO_VAZIO
+    m = _HORARIO.match(valor) if isinstance(valor, str) else None
+    if m:
+        return int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3))
+    # 🔹 Horário fora do padrão: guardado como texto, com id negativo
+    return -(strings.id(json.dumps(valor)) + 2)
+
+
+def _extra(registro, chaves, strings):
+    extra = {chave: valor for chave, valor in registro.items() if chave not in chaves}
+    return strings.id(json.dumps(extra, sort_keys=True)) if extra else SEM_VALOR
+
+
+def _tipo_tempo(tempo):
+    if isinstance(tempo, bool) or not isinstance(tempo, (int, float)):
+        return TEMPO_OUTRO
+    return TEMPO_INT if isinstance(tempo, int) else TEMPO_FLOAT
+
+
+def escrever(logs, path):
+    """Grava as sessões no formato binário (troca atômica do arquivo)."""
+    strings = _TabelaStrings()
+    sessoes = {nome: array(typecode) for nome, typecode in COLUNAS_SESSAO}
+    intervalos = {nome: array(typecode) for nome, typecode in COLUNAS_INTERVALO}
+
+    for log in logs:
+        etapas = log.get("etapas", [])
+        for coluna, chave in TEXTOS_SESSAO:
+            sessoes[coluna].append(_texto(log.get(chave), strings))
+        sessoes["extra"].append(_extra(log, _guardadas(log, TEXTOS_SESSAO) | {"etapas"}, strings))
+        sessoes["primeiro"].append(len(intervalos["tempo"]))
+        sessoes["quantidade"].append(len(etapas))
+        for etapa in etapas:
+            for coluna, chave in TEXTOS_INTERVALO:
+                intervalos[coluna].append(_texto(etapa.get(chave), strings))
+            tipo_tempo = _tipo_tempo(etapa.get("tempo"))
+            # 🔹 Tempo ausente ou não numérico segue como chave extra, com o tipo original
+            chaves = _guardadas(etapa, TEXTOS_INTERVALO) | {"inicio", "fim"}
+            if tipo_tempo != TEMPO_OUTRO:
+                chaves.add("tempo")
+            intervalos["extra"].append(_extra(etapa, chaves, strings))
+            for chave in ("inicio", "fim"):
+                intervalos[chave].append(
+                    _codificar_horario(etapa[chave], strings) if chave in etapa else HORARIO_AUSENTE
+                )
+            intervalos["tempo"].append(float(etapa["tempo"]) if tipo_tempo != TEMPO_OUTRO else 0.0)
+            intervalos["tipo_tempo"].append(tipo_tempo)
+
+    textos = [texto.encode("utf-8") for texto in strings.textos]
+    posicoes = array("I", [0])
+    for texto in textos:
+        posicoes.append(posicoes[-1] + len(texto))
+
+    secoes = _layout(len(textos), len(sessoes["token"]), len(intervalos["tempo"]))
+    colunas = {"strings": posicoes}
+    colunas.update({f"sessao.{nome}": valores for nome, valores in sessoes.items()})
+    colunas.update({f"intervalo.{nome}": valores for nome, valores in intervalos.items()})
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(CABECALHO.pack(MAGIC, VERSAO, 0, len(textos), len(sessoes["token"]), len(intervalos["tempo"])))
+            for nome, valores in colunas.items():
+                f.write(b"\0" * (secoes[nome][0] - f.tell()))
+                f.write(_coluna_little(valores))
+            f.write(b"\0" * (secoes["textos"][0] - f.tell()))
+            f.write(b"".join(textos))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    return len(sessoes["token"])
+
+
+class BinaryLogReader:
+    """Leitor do formato binário sobre um mmap; as colunas são views sem cópia."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 🔹 Arquivo vazio não pode ser mapeado
+            self._file.close()
+            raise FormatoInvalido(path)
+        self._buffer = memoryview(self._mmap)
+        self._colunas = {}  # 🔹 nome -> (bytes da seção, view tipada): uma view por coluna
+        self._strings = {}
+
+        if len(self._buffer) < CABECALHO.size:
+            self.close()
+            raise FormatoInvalido(path)
+        magic, self.versao, _, self.n_strings, self.n_sessoes, self.n_intervalos = CABECALHO.unpack_from(self._buffer)
+        if magic != MAGIC or self.versao not in VERSOES_LIDAS:
+            self.close()
+            raise FormatoInvalido(path)
+
+        self._secoes = _layout(self.n_strings, self.n_sessoes, self.n_intervalos, self.versao)
+        self._posicoes = self.coluna("strings")
+        self._textos = self._secoes["textos"][0]
+        if self._textos + self._posicoes[-1] > len(self._buffer):
+            self.close()
+            raise FormatoInvalido(path)
+
+    def close(self):
+        for bruto, view in self._colunas.values():
+            if isinstance(view, memoryview):
+                view.release()
+            if bruto is not None:
+                bruto.release()
+        self._colunas = {}
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.n_sessoes
+
+    def coluna(self, nome):
+        """View da coluna ("sessao.card", "intervalo.tempo"...) direto sobre o arquivo, criada uma vez."""
+        if nome in self._colunas:
+            return self._colunas[nome][1]
+        offset, quantidade, typecode = self._secoes[nome]
+        tamanho = quantidade * array(typecode).itemsize
+        if offset + tamanho > len(self._buffer):
+            raise FormatoInvalido(self.path)
+        bruto = self._buffer[offset:offset + tamanho]
+        if _NATIVO_LITTLE:
+            view = bruto.cast(typecode)
+            self._colunas[nome] = (bruto, view)
+            return view
+        valores = array(typecode, bytes(bruto))  # 🔹 Big-endian: sem view direta, a coluna é copiada
+        valores.byteswap()
+        bruto.release()
+        self._colunas[nome] = (None, valores)
+        return valores
+
+    def string(self, id_string):
+        texto = self._strings.get(id_string)
+        if texto is None:
+            inicio, fim = self._posicoes[id_string], self._posicoes[id_string + 1]
+            texto = str(self._buffer[self._textos + inicio:self._textos + fim], "utf-8")
+            self._strings[id_string] = texto
+        return texto
+
+    def id_string(self, texto):
+        """Id do texto na tabela (None se não existir); busca linear feita uma vez por consulta."""
+        alvo = texto.encode("utf-8")
+        for id_string in range(self.n_strings):
+            inicio, fim = self._posicoes[id_string], self._posicoes[id_string + 1]
+            if fim - inicio == len(alvo) and self._buffer[self._textos + inicio:self._textos + fim] == alvo:
+                return id_string
+        return None
+
+    def _horario(self, valor):
+        if valor == HORARIO_VAZIO:
+            return None
+        if valor < 0:
+            return json.loads(self.string(-valor - 2))
+        return f"{valor // 3600:02d}:{valor // 60 % 60:02d}:{valor % 60:02d}"
+
+    def _extra(self, coluna, indice):
+        id_extra = self.coluna(coluna)[indice]
+        return json.loads(self.string(id_extra)) if id_extra != SEM_VALOR else {}
+
+    def summaries(self):
+        """Resumo de cada sessão (token, data, card) sem tocar nos intervalos; campo ausente vira ""."""
+        colunas = [(chave, self.coluna(f"sessao.{coluna}")) for coluna, chave in TEXTOS_SESSAO]
+        resumos = []
+        for i in range(self.n_sessoes):
+            resumo = {chave: self.string(ids[i]) for chave, ids in colunas if ids[i] != SEM_VALOR}
+            if len(resumo) < len(colunas):
+                # 🔹 Campo que não era texto: o valor original está na coluna extra
+                extra = self._extra("sessao.extra", i)
+                resumo.update({chave: extra.get(chave, "") for chave, _ in colunas if chave not in resumo})
+            resumo["posicao"] = i
+            resumos.append(resumo)
+        return resumos
+
+    def session(self, posicao):
+        """Decodifica uma sessão completa pela posição."""
+        log = {}
+        for coluna, chave in TEXTOS_SESSAO:
+            id_texto = self.coluna(f"sessao.{coluna}")[posicao]
+            if id_texto != SEM_VALOR:
+                log[chave] = self.string(id_texto)
+        log["etapas"] = self.intervals(posicao)
+        log.update(self._extra("sessao.extra", posicao))
+        return log
+
+    def intervals(self, posicao):
+        primeiro = self.coluna("sessao.primeiro")[posicao]
+        quantidade = self.coluna("sessao.quantidade")[posicao]
+        colunas = {nome: self.coluna(f"intervalo.{nome}") for nome, _ in COLUNAS_INTERVALO_V1}
+        tipos = self.coluna("intervalo.tipo_tempo") if self.versao >= 2 else None
+        etapas = []
+        for i in range(primeiro, primeiro + quantidade):
+            etapa = {}
+            for coluna, chave in TEXTOS_INTERVALO:
+                if colunas[coluna][i] != SEM_VALOR:
+                    etapa[chave] = self.string(colunas[coluna][i])
+            for chave in ("inicio", "fim"):
+                if colunas[chave][i] != HORARIO_AUSENTE:
+                    etapa[chave] = self._horario(colunas[chave][i])
+            tipo_tempo = tipos[i] if tipos is not None else TEMPO_FLOAT
+            if tipo_tempo == TEMPO_INT:
+                etapa["tempo"] = int(colunas["tempo"][i])
+            elif tipo_tempo == TEMPO_FLOAT:
+                etapa["tempo"] = colunas["tempo"][i]
+            etapa.update(self._extra("intervalo.extra", i))
+            etapas.append(etapa)
+        return etapas
+
+    def iter_logs(self):
+        for posicao in range(self.n_sessoes):
+            yield self.session(posicao)
+
+    def sessao_do_intervalo(self, indice):
+        """Posição da sessão dona do intervalo (busca binária na coluna "primeiro")."""
+        return bisect.bisect_right(self.coluna("sessao.primeiro"), indice) - 1
+
+    def tempo_por_codigo(self):
+        """Soma dos tempos por código de etapa lendo só as colunas de código e tempo."""
+        codigos, tempos = self.coluna("intervalo.codigo"), self.coluna("intervalo.tempo")
+        totais = {}
+        for id_codigo, tempo in zip(codigos, tempos):
+            totais[id_codigo] = totais.get(id_codigo, 0.0) + tempo
+        outros = {}
+        if totais.pop(SEM_VALOR, None) is not None:
+            # 🔹 Códigos que não eram texto (raros): o valor original vem da coluna extra de cada intervalo
+            for indice, id_codigo in enumerate(codigos):
+                if id_codigo == SEM_VALOR:
+                    codigo = self._extra("intervalo.extra", indice).get("codigo")
+                    outros[codigo] = outros.get(codigo, 0.0) + tempos[indice]
+        return {**{self.string(id_codigo): total for id_codigo, total in totais.items()}, **outros}
+
+    def sessoes_com_codigo(self, codigo):
+        """Posições das sessões com alguma ocorrência do código, em ordem."""
+        id_codigo = self.id_string(codigo) if isinstance(codigo, str) else SEM_VALOR
+        if id_codigo is None:
+            return []
+        posicoes = []
+        ultimo = -1
+        for indice, valor in enumerate(self.coluna("intervalo.codigo")):
+            if valor != id_codigo:
+                continue
+            if id_codigo == SEM_VALOR:
+                # 🔹 Código que não era texto: compara com o valor original da coluna extra
+                extra = self._extra("intervalo.extra", indice)
+                if "codigo" not in extra or extra["codigo"] != codigo:
+                    continue
+            posicao = self.sessao_do_intervalo(indice)
+            if posicao != ultimo:
+                posicoes.append(posicao)
+                ultimo = posicao
+        return posicoes
+
+
+def ler(path):
+    """Lê todas as sessões de um arquivo binário."""
+    with BinaryLogReader(path) as leitor:
+        return list(leitor.iter_logs())
+
+
+def json_para_binario(json_path, binario_path):
+    """Converte o tracking_logs.json em .aeb lendo o JSON em fluxo."""
+    return escrever((log for _, log in LogStore(json_path).iter_logs()), binario_path)
+
+
+def binario_para_json(binario_path, json_path):
+    """Converte um .aeb de volta para o arquivo de logs do app."""
+    logs = ler(binario_path)
+    LogStore(json_path).write_all(logs)
+    return len(logs)
+
+
+def benchmark(json_path, binario_path, codigo=None):
+    """Compara tamanho e tempo de varredura (soma por código e filtro por código) dos dois formatos."""
+    store = LogStore(json_path)
+    resultado = {"bytes_json": os.path.getsize(json_path), "bytes_binario": os.path.getsize(binario_path)}
+
+    inicio = time.perf_counter()
+    totais_json = {}
+    sessoes_json = []
+    for posicao, (_, log) in enumerate(store.iter_logs()):
+        encontrou = False
+        for etapa in log.get("etapas", []):
+            totais_json[etapa["codigo"]] = totais_json.get(etapa["codigo"], 0.0) + (etapa.get("tempo", 0) or 0)
+            encontrou = encontrou or etapa["codigo"] == codigo
+        if encontrou:
+            sessoes_json.append(posicao)
+    resultado["segundos_json"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with BinaryLogReader(binario_path) as leitor:
+        totais_binario = leitor.tempo_por_codigo()
+        sessoes_binario = leitor.sessoes_com_codigo(codigo) if codigo is not None else []
+    resultado["segundos_binario"] = time.perf_counter() - inicio
+
+    resultado["mesmo_resultado"] = (
+        sessoes_json == sessoes_binario
+        and totais_json.keys() == totais_binario.keys()
+        and all(abs(totais_json[c] - totais_binario[c]) < 1e-6 * max(1.0, abs(totais_json[c])) for c in totais_json)
+    )
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Converte os logs entre JSON e o formato binário (.aeb).")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    para_binario = sub.add_parser("para-binario", help="JSON -> .aeb")
+    para_binario.add_argument("origem")
+    para_binario.add_argument("destino")
+    para_json = sub.add_parser("para-json", help=".aeb -> JSON")
+    para_json.add_argument("origem")
+    para_json.add_argument("destino")
+    comparar = sub.add_parser("benchmark", help="Compara os dois formatos")
+    comparar.add_argument("json")
+    comparar.add_argument("binario")
+    comparar.add_argument("--codigo", help="Código de etapa usado no filtro")
+    args = parser.parse_args(argv)
+
+    if args.comando == "para-binario":
+        print(f"Sessões convertidas: {json_para_binario(args.origem, args.destino)}")
+    elif args.comando == "para-json":
+        print(f"Sessões convertidas: {binario_para_json(args.origem, args.destino)}")
+    else:
+        for chave, valor in benchmark(args.json, args.binario, args.codigo).items():
+            print(f"{chave}: {valor}")
+
+
+if __name__ == "__main__":
+    main()
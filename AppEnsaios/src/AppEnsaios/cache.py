@@ -0,0 +1,65 @@
+"""Cache LRU com capacidade limitada e estatísticas de acerto."""
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Guarda até `capacity` itens, descartando o menos usado recentemente."""
+
+    def __init__(self, capacity=64, on_evict=None):
+        self.capacity = max(1, int(capacity))
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        """Retorna o valor e o marca como usado recentemente."""
+        try:
+            value = self._items[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            old_key, old_value = self._items.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(old_key, old_value)
+
+    def items(self):
+        """Pares (chave, valor) do menos para o mais usado, sem mexer na ordem de uso."""
+        return list(self._items.items())
+
+    def invalidate(self, key):
+        self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
+
+    def resize(self, capacity):
+        self.capacity = max(1, int(capacity))
+        while len(self._items) > self.capacity:
+            old_key, old_value = self._items.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(old_key, old_value)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "capacidade": self.capacity,
+            "itens": len(self._items),
+            "acertos": self.hits,
+            "falhas": self.misses,
+            "taxa_acerto": self.hits / total if total else 0.0,
+        }
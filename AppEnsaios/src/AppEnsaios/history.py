@@ -0,0 +1,152 @@
+"""Histórico de edições das sessões, guardado como diferenças.
+
+O arquivo de logs continua com a versão atual de cada sessão, então a leitura
+normal não muda. Cada edição acrescenta uma linha ao arquivo lateral
+"<arquivo>.history.jsonl" com só os trechos de `etapas` que mudaram:
+
+    {"token": ..., "versao": 2, "data": "...", "motivo": "edicao",
+     "trechos": [{"i": 3, "j": 3, "antes": [...], "depois": [...]}]}
+
+A versão 0 é a medição original. Para ver uma versão anterior, os trechos são
+desfeitos a partir da versão atual, da mais nova para a mais antiga.
+"""
+import contextlib
+import difflib
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from AppEnsaios.log_store import marcar_regravacao
+
+
+def diff_etapas(antes, depois):
+    """Trechos diferentes entre duas listas de etapas (i: posição em antes, j: em depois)."""
+    chaves_antes = [json.dumps(etapa, sort_keys=True) for etapa in antes]
+    chaves_depois = [json.dumps(etapa, sort_keys=True) for etapa in depois]
+    matcher = difflib.SequenceMatcher(None, chaves_antes, chaves_depois, autojunk=False)
+    return [
+        {"i": i1, "j": j1, "antes": antes[i1:i2], "depois": depois[j1:j2]}
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def aplicar(etapas, trechos, desfazer=False):
+    """Aplica os trechos (ou os desfaz) e retorna uma nova lista."""
+    resultado = list(etapas)
+    posicao, origem, destino = ("j", "depois", "antes") if desfazer else ("i", "antes", "depois")
+    # 🔹 Do fim para o começo: as posições dos trechos anteriores continuam válidas
+    for trecho in sorted(trechos, key=lambda t: t[posicao], reverse=True):
+        inicio = trecho[posicao]
+        resultado[inicio:inicio + len(trecho[origem])] = trecho[destino]
+    return resultado
+
+
+class EditHistory:
+    """Arquivo JSON Lines só de acréscimos com as diferenças de cada edição."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _linhas(self, token):
+        if not os.path.exists(self.path):
+            return
+        marcador = json.dumps(token)
+        with open(self.path, "r", encoding="utf-8") as f:
+            for linha in f:
+                if marcador not in linha:
+                    continue  # 🔹 Evita decodificar o histórico das outras sessões
+                try:
+                    entrada = json.loads(linha)
+                except ValueError:
+                    continue  # 🔹 Linha cortada por queda do app: ignorada
+                if entrada.get("token") == token:
+                    yield entrada
+
+    def entries(self, token):
+        """Edições da sessão, da primeira para a última."""
+        return sorted(self._linhas(token), key=lambda entrada: entrada["versao"])
+
+    def record(self, token, antes, depois, motivo="edicao"):
+        """Acrescenta a diferença entre as versões; retorna a entrada (None se nada mudou).
+
+        Deve ser chamado sob o lock do arquivo de logs, junto com a gravação.
+        """
+        trechos = diff_etapas(antes, depois)
+        if not trechos:
+            return None
+        anteriores = self.entries(token)
+        entrada = {
+            "token": token,
+            "versao": anteriores[-1]["versao"] + 1 if anteriores else 1,
+            "data": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+            "motivo": motivo,
+            "trechos": trechos,
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return entrada
+
+    def versions(self, token, atuais):
+        """Lista (versão, data, motivo, etapas) da atual até a original, a partir das etapas atuais."""
+        entradas = self.entries(token)
+        etapas = atuais
+        versoes = []
+        for entrada in reversed(entradas):
+            versoes.append((entrada["versao"], entrada["data"], entrada["motivo"], etapas))
+            etapas = aplicar(etapas, entrada["trechos"], desfazer=True)
+        versoes.append((0, None, "original", etapas))
+        return versoes
+
+    def version(self, token, atuais, versao):
+        """Etapas da sessão na versão pedida (KeyError se ela não existir)."""
+        for numero, _, _, etapas in self.versions(token, atuais):
+            if numero == versao:
+                return etapas
+        raise KeyError(versao)
+
+    def remove(self, tokens):
+        """Regrava o histórico sem as sessões de `tokens`; retorna quantas entradas saíram.
+
+        Deve ser chamado sob o lock do arquivo de logs.
+        """
+        tokens = set(tokens)
+        if not tokens or not os.path.exists(self.path):
+            return 0
+        mantidas, removidas = [], 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    token = json.loads(linha).get("token")
+                except ValueError:
+                    token = None  # 🔹 Linha cortada: sai junto, como na leitura
+                if token in tokens or token is None:
+                    removidas += 1
+                else:
+                    mantidas.append(linha)
+        if not removidas:
+            return 0
+        marcar_regravacao(self.path)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.writelines(mantidas)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        return removidas
+
+    def clear(self):
+        if os.path.exists(self.path):
+            marcar_regravacao(self.path)  # 🔹 O arquivo novo pode reaproveitar o inode deste
+            os.remove(self.path)
+
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
@@ -0,0 +1,161 @@
+"""Instrumentação opcional das operações críticas do app (latência, bytes e registros).
+
+Ativada pela variável de ambiente APPENSAIOS_INSTRUMENTACAO=1 ou pela chave
+"instrumentacao" do settings.json. Desativada, cada operação paga apenas uma
+verificação de atributo.
+"""
+import csv
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+ENV_VAR = "APPENSAIOS_INSTRUMENTACAO"
+
+# 🔹 Limites superiores (em ms) das faixas do histograma
+LIMITES_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, math.inf)
+AMOSTRAS_RECENTES = 512
+
+
+def _rotulo_faixa(limite):
+    return "inf" if limite == math.inf else f"{limite:g}ms"
+
+
+def percentil(amostras, p):
+    """Percentil p (0-100) por vizinho mais próximo; 0.0 se não houver amostras."""
+    if not amostras:
+        return 0.0
+    ordenadas = sorted(amostras)
+    indice = max(0, math.ceil(p / 100 * len(ordenadas)) - 1)
+    return ordenadas[indice]
+
+
+class EstatisticaOperacao:
+    """Histograma de latência e contadores de I/O de uma operação."""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.faixas = [0] * len(LIMITES_MS)
+        self.recentes = deque(maxlen=AMOSTRAS_RECENTES)
+        self.bytes_lidos = 0
+        self.bytes_escritos = 0
+        self.registros = 0
+
+    def registrar(self, duracao_ms):
+        self.chamadas += 1
+        self.total_ms += duracao_ms
+        self.max_ms = max(self.max_ms, duracao_ms)
+        self.recentes.append(duracao_ms)
+        for i, limite in enumerate(LIMITES_MS):
+            if duracao_ms <= limite:
+                self.faixas[i] += 1
+                break
+
+    def resumo(self):
+        return {
+            "chamadas": self.chamadas,
+            "p50_ms": round(percentil(self.recentes, 50), 3),
+            "p95_ms": round(percentil(self.recentes, 95), 3),
+            "max_ms": round(self.max_ms, 3),
+            "total_ms": round(self.total_ms, 3),
+            "bytes_lidos": self.bytes_lidos,
+            "bytes_escritos": self.bytes_escritos,
+            "registros": self.registros,
+            "histograma": {_rotulo_faixa(limite): n for limite, n in zip(LIMITES_MS, self.faixas)},
+        }
+
+
+class Instrumentacao:
+    """Coleta estatísticas por operação quando ativada."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.operacoes = {}
+        # 🔹 Operações em andamento de cada thread, para atribuir bytes e registros
+        self._local = threading.local()
+
+    @property
+    def _pilha(self):
+        pilha = getattr(self._local, "pilha", None)
+        if pilha is None:
+            pilha = self._local.pilha = []
+        return pilha
+
+    def _estatistica(self, operacao):
+        if operacao not in self.operacoes:
+            self.operacoes[operacao] = EstatisticaOperacao()
+        return self.operacoes[operacao]
+
+    def medir(self, operacao):
+        """Decorador que mede a latência da operação enquanto a instrumentação estiver ativa."""
+
+        def decorador(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+
+                self._pilha.append(operacao)
+                inicio = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    duracao_ms = (time.perf_counter() - inicio) * 1000
+                    self._pilha.pop()
+                    self._estatistica(operacao).registrar(duracao_ms)
+
+            return wrapper
+
+        return decorador
+
+    def registrar(self, operacao, duracao_ms, registros=0):
+        """Registra uma medição feita fora do decorador (ex.: operações assíncronas)."""
+        if not self.enabled:
+            return
+        estatistica = self._estatistica(operacao)
+        estatistica.registrar(duracao_ms)
+        estatistica.registros += registros
+
+    def contar(self, bytes_lidos=0, bytes_escritos=0, registros=0):
+        """Soma bytes e registros à operação em andamento."""
+        if not self.enabled or not self._pilha:
+            return
+        estatistica = self._estatistica(self._pilha[-1])
+        estatistica.bytes_lidos += bytes_lidos
+        estatistica.bytes_escritos += bytes_escritos
+        estatistica.registros += registros
+
+    def resumo(self):
+        return {operacao: estatistica.resumo() for operacao, estatistica in sorted(self.operacoes.items())}
+
+    def limpar(self):
+        self.operacoes = {}
+
+    def exportar_json(self, caminho):
+        with open(caminho, "w") as f:
+            json.dump(self.resumo(), f, indent=4)
+
+    def exportar_csv(self, caminho):
+        colunas = ["operacao", "chamadas", "p50_ms", "p95_ms", "max_ms", "total_ms",
+                   "bytes_lidos", "bytes_escritos", "registros"]
+        faixas = [_rotulo_faixa(limite) for limite in LIMITES_MS]
+
+        with open(caminho, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(colunas + faixas)
+            for operacao, resumo in self.resumo().items():
+                linha = [operacao] + [resumo[coluna] for coluna in colunas[1:]]
+                writer.writerow(linha + [resumo["histograma"][faixa] for faixa in faixas])
+
+
+def ativada_pelo_ambiente():
+    return os.environ.get(ENV_VAR, "").strip().lower() in ("1", "true", "sim", "on")
+
+
+# 🔹 Instância única usada pelo app
+instrumentacao = Instrumentacao(enabled=ativada_pelo_ambiente())
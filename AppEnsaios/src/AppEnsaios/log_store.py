@@ -0,0 +1,580 @@
+"""Acesso ao arquivo de logs (tracking_logs.json).
+
+Além da leitura e gravação completas, monta um índice leve das sessões
+(token, data, card, posição no arquivo) sem manter todas as etapas em memória.
+
+Cada sessão ocupa uma linha enquadrada com tamanho e CRC32 do JSON:
+
+    <bytes> <crc32 em hex> {"token": ...}
+
+Registros danificados (checksum divergente, gravação cortada, cabeçalho ilegível) são
+pulados na leitura e ficam em `last_damage`; `salvage` regrava o arquivo só
+com os íntegros e guarda os trechos perdidos na pasta "quarentena". Arquivos
+antigos, gravados como uma lista JSON, continuam legíveis e são convertidos na
+primeira regravação.
+
+Várias instâncias do app (ou scripts) podem usar o mesmo arquivo: quem grava
+segura um lock exclusivo (fcntl) em "<arquivo>.lock" durante o ciclo
+ler-alterar-gravar e substitui o arquivo de forma atômica; quem só lê nunca
+pega o lock. Cada gravação incrementa o contador em "<arquivo>.gen", usado
+para detectar índices desatualizados. "<arquivo>.verified" guarda até onde o
+arquivo já foi conferido, para a verificação na abertura ler só o que veio depois.
+"<arquivo>.rewrites" conta só as regravações (acréscimos não contam): com ele
+igual, quem guardou o início do arquivo (o backup) sabe que ele não mudou.
+"""
+import contextlib
+import io
+import json
+import math
+import os
+import re
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+from AppEnsaios.instrumentation import instrumentacao
+
+try:
+    import fcntl
+except ImportError:  # 🔹 Windows: sem lock entre processos, só a troca atômica do arquivo
+    fcntl = None
+
+TAMANHO_BLOCO = 1 << 20
+CAMPOS_RESUMO_INDICE = ("tempo_total", "num_etapas", "etapa_dominante")
+
+_ESPACOS = re.compile(r"[ \t\n\r]*")
+_BRANCOS = re.compile(rb"[ \t\n\r]*")
+_CABECALHO = re.compile(rb"(\d{1,10}) ([0-9a-f]{8}) ")
+_TOKEN = re.compile(rb'"token": *"([^"\\]*)')
+_CARD = re.compile(rb'"card_jira": *"([^"\\]*)')
+
+
+def resumir_sessao(etapas):
+    """Totais gravados junto com a sessão, para a lista não precisar percorrer as etapas."""
+    tempo_por_etapa = {}
+    minutos = []
+    for etapa in etapas:
+        tempo = etapa.get("tempo", 0) or 0
+        nome = etapa.get("etapa", "")
+        tempo_por_etapa[nome] = tempo_por_etapa.get(nome, 0) + tempo
+        minutos.append(math.ceil(tempo / 60))
+
+    return {
+        "tempo_total": sum(etapa.get("tempo", 0) or 0 for etapa in etapas),
+        "num_etapas": len(etapas),
+        "etapa_dominante": max(tempo_por_etapa, key=tempo_por_etapa.get) if tempo_por_etapa else None,
+        "tempo_por_etapa": tempo_por_etapa,
+        "minutos": minutos,  # 🔹 Uma entrada por ocorrência, na ordem de "etapas"
+    }
+
+
+def enquadrar(log):
+    """Retorna (cabeçalho, JSON, crc) da linha que guarda a sessão no arquivo."""
+    dados = json.dumps(log, ensure_ascii=False).encode("utf-8")
+    crc = zlib.crc32(dados)
+    return b"%d %08x " % (len(dados), crc), dados, crc
+
+
+def _dano(offset, dados, motivo):
+    """Trecho ilegível do arquivo, com o que der para identificar da sessão perdida."""
+    token = _TOKEN.search(dados)
+    card = _CARD.search(dados)
+    return {
+        "offset": offset,
+        "bytes": len(dados),
+        "motivo": motivo,
+        "token": token[1].decode("utf-8", "replace") if token else None,
+        "card_jira": card[1].decode("utf-8", "replace") if card else None,
+        "dados": bytes(dados),
+    }
+
+
+def _substituir(path, conteudo):
+    """Grava em um arquivo temporário e o troca de lugar, para leitores nunca verem gravação pela metade."""
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode("utf-8")
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def regravacoes(path):
+    """Quantas vezes `path` foi regravado ou apagado por este app (0 se nunca)."""
+    try:
+        with open(path + ".rewrites", "r") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def marcar_regravacao(path):
+    """Avança o contador de regravações de `path`; chamado sob o lock do arquivo de logs, antes da troca.
+
+    O inode sozinho não prova nada: o do arquivo trocado pode ser reaproveitado.
+    """
+    _substituir(path + ".rewrites", str(regravacoes(path) + 1))
+
+
+class StaleIndexError(Exception):
+    """O índice em memória não corresponde mais ao arquivo em disco."""
+
+
+class LogStore:
+    """Lê e grava a lista de sessões salvas."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.generation_path = path + ".gen"
+        self.verified_path = path + ".verified"
+        self.quarantine_dir = os.path.join(os.path.dirname(path) or ".", "quarentena")
+        self.index_generation = None
+        self.last_damage = []
+        self.lock_acquisitions = 0
+        self.lock_wait_seconds = 0.0
+        self._lock_depth = 0
+        self._lock_file = None
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Lock exclusivo de escrita entre processos (reentrante dentro da mesma instância)."""
+        if self._lock_depth == 0:
+            self._lock_file = open(self.lock_path, "a")
+            if fcntl is not None:
+                inicio = time.perf_counter()
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+                self.lock_wait_seconds += time.perf_counter() - inicio
+            self.lock_acquisitions += 1
+
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                self._lock_file.close()
+                self._lock_file = None
+
+    def generation(self):
+        """Contador de gravações do arquivo de logs (0 se nunca foi gravado por esta versão)."""
+        try:
+            with open(self.generation_path, "r") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def is_stale(self):
+        """Indica se o arquivo foi regravado depois do último índice montado."""
+        return self.index_generation is None or self.generation() != self.index_generation
+
+    def is_legacy(self):
+        """Indica se o arquivo ainda está no formato antigo (uma lista JSON)."""
+        try:
+            with open(self.path, "rb") as f:
+                inicio = f.read(64)
+        except FileNotFoundError:
+            return False
+        return inicio.lstrip().startswith(b"[")
+
+    def _bump_generation(self):
+        generation = self.generation() + 1
+        self._replace_file(self.generation_path, str(generation))
+        return generation
+
+    def _replace_file(self, path, conteudo):
+        _substituir(path, conteudo)
+
+    def read_all(self):
+        """Lê todas as sessões íntegras do arquivo; as danificadas ficam em `last_damage`."""
+        return [log for _, _, _, log in self._iter_records()]
+
+    def read_for_update(self):
+        """Lê a lista para alteração; arquivo ausente vira lista vazia.
+
+        Registros danificados são guardados na quarentena antes da regravação,
+        que os deixaria de fora.
+        """
+        if not os.path.exists(self.path):
+            return []
+        danos = []
+        logs = [log for _, _, _, log in self._iter_records(danos=danos)]
+        if danos:
+            self._quarantine(danos, len(logs))
+        self.last_damage = danos
+        return logs
+
+    def _encode(self, logs):
+        """Retorna (conteúdo enquadrado, índice) da lista de sessões."""
+        index = []
+        partes = []
+        posicao = 0
+        for log in logs:
+            cabecalho, dados, crc = enquadrar(log)
+            posicao += len(cabecalho)
+            index.append(self._summary(log, posicao, len(dados), crc))
+            posicao += len(dados) + 1
+            partes += [cabecalho, dados, b"\n"]
+        return b"".join(partes), index
+
+    def write_all(self, logs):
+        """Grava a lista de sessões e retorna o índice do arquivo gravado."""
+        conteudo, index = self._encode(logs)
+
+        with self.locked():
+            marcar_regravacao(self.path)
+            self._replace_file(self.path, conteudo)
+            self.index_generation = self._bump_generation()
+            # 🔹 O conteúdo acabou de ser montado a partir da lista: já conta como verificado
+            self._mark_verified(len(conteudo))
+
+        instrumentacao.contar(bytes_escritos=len(conteudo))
+        return index
+
+    def restore(self, conteudo):
+        """Substitui o arquivo pelos bytes de um backup, sob lock, sem decodificá-los.
+
+        O ponto verificado é descartado: a próxima verificação confere o arquivo inteiro.
+        """
+        with self.locked():
+            marcar_regravacao(self.path)
+            self._replace_file(self.path, conteudo)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.verified_path)
+            self.index_generation = None
+            self._bump_generation()
+
+        instrumentacao.contar(bytes_escritos=len(conteudo))
+
+    def update(self, alterar):
+        """Ciclo ler-alterar-gravar sob lock: `alterar` recebe a lista atual e a modifica no lugar."""
+        with self.locked():
+            logs = self.read_for_update()
+            alterar(logs)
+            return self.write_all(logs)
+
+    def rewrite(self, filtrar, tentativas=3):
+        """Regrava o arquivo com a lista retornada por `filtrar(logs)`, segurando o lock só para copiar e trocar.
+
+        Os bytes atuais são copiados sob lock; decodificar, filtrar e codificar
+        é feito sem ele, então as gravações da interface não esperam. Na troca,
+        sessões acrescentadas nesse meio-tempo são levadas para o arquivo novo;
+        se o arquivo foi regravado, o ciclo recomeça (e `filtrar` roda de novo).
+        Formato antigo, registros danificados ou `tentativas` esgotadas caem no
+        ciclo inteiro sob lock de `update`.
+        """
+        for _ in range(tentativas):
+            with self.locked():
+                if self.is_legacy():
+                    break
+                with open(self.path, "rb") as f:
+                    anterior = f.read()
+            instrumentacao.contar(bytes_lidos=len(anterior))
+
+            danos = []
+            logs = [log for _, _, _, log in self._iter_records(arquivo=io.BytesIO(anterior), danos=danos)]
+            if danos:
+                break
+            conteudo, _ = self._encode(filtrar(logs))
+
+            with self.locked():
+                with open(self.path, "rb") as f:
+                    if f.read(len(anterior)) != anterior:
+                        continue  # 🔹 Regravado por outra operação: as sessões filtradas podem estar velhas
+                    acrescentado = f.read()
+                marcar_regravacao(self.path)
+                self._replace_file(self.path, conteudo + acrescentado)
+                self.index_generation = self._bump_generation()
+                # 🔹 Só o conteúdo montado aqui conta como verificado; o acréscimo é conferido depois
+                self._mark_verified(len(conteudo))
+            instrumentacao.contar(bytes_escritos=len(conteudo) + len(acrescentado))
+            return
+
+        def alterar(logs):
+            logs[:] = filtrar(logs)
+
+        self.update(alterar)
+
+    def append(self, log):
+        """Acrescenta uma sessão ao fim do arquivo sob lock, sem regravar as anteriores; retorna o resumo dela."""
+        with self.locked():
+            if self.is_legacy():
+                return self.update(lambda logs: logs.append(log))[-1]
+
+            cabecalho, dados, crc = enquadrar(log)
+            quadro = cabecalho + dados + b"\n"
+            with open(self.path, "a+b") as f:
+                fim = f.seek(0, os.SEEK_END)
+                if fim:
+                    f.seek(fim - 1)
+                    if f.read(1) != b"\n":
+                        # 🔹 Gravação anterior cortada: começa em linha nova para não colar no trecho danificado
+                        quadro = b"\n" + quadro
+                        fim += 1
+                f.write(quadro)
+                f.flush()
+                os.fsync(f.fileno())
+            self._bump_generation()
+
+        instrumentacao.contar(bytes_escritos=len(quadro))
+        return self._summary(log, fim + len(cabecalho), len(dados), crc)
+
+    def load_index(self):
+        """Percorre o arquivo em blocos e retorna só o resumo de cada sessão.
+
+        Cada registro é decodificado e descartado em seguida, então a memória
+        usada depende do tamanho do bloco e não do histórico inteiro.
+        """
+        # 🔹 O contador é lido antes de abrir o arquivo: se houver gravação no meio, o índice só parece velho
+        generation = self.generation()
+        index = []
+        for offset, length, crc, log in self._iter_records():
+            if not isinstance(log, dict):
+                continue
+            index.append(self._summary(log, offset, length, crc))
+
+        self.index_generation = generation
+        return index
+
+    def read_record(self, summary):
+        """Lê apenas os bytes de uma sessão a partir do resumo do índice."""
+        with open(self.path, "rb") as f:
+            f.seek(summary["offset"])
+            dados = f.read(summary["length"])
+
+        instrumentacao.contar(bytes_lidos=len(dados))
+        if summary.get("crc") is not None and zlib.crc32(dados) != summary["crc"]:
+            raise StaleIndexError(summary["token"])
+        try:
+            log = json.loads(dados)
+        except ValueError:
+            raise StaleIndexError(summary["token"])
+        if not isinstance(log, dict) or log.get("token") != summary["token"]:
+            raise StaleIndexError(summary["token"])
+        return log
+
+    def iter_logs(self):
+        """Gera (posição, sessão) lendo o arquivo em sequência, sem carregá-lo inteiro."""
+        for offset, _, _, log in self._iter_records():
+            if isinstance(log, dict):
+                yield offset, log
+
+    def verify(self, incremental=True):
+        """Confere os checksums dos registros gravados depois do último ponto verificado.
+
+        Sem danos, o ponto avança até o último registro íntegro; com
+        `incremental=False` o arquivo é conferido desde o início.
+        """
+        inicio = self._verified_point() if incremental else 0
+        fim, verificados, danos = inicio, 0, []
+        if os.path.exists(self.path):
+            for offset, length, _, _ in self._iter_records(inicio, danos=danos):
+                verificados += 1
+                fim = offset + length + 1
+            if not danos and not self.is_legacy():
+                self._mark_verified(fim)
+        return {
+            "inicio": inicio,
+            "fim": fim,
+            "verificados": verificados,
+            "danos": [{campo: valor for campo, valor in dano.items() if campo != "dados"} for dano in danos],
+        }
+
+    def salvage(self):
+        """Recupera em uma passada as sessões íntegras e regrava o arquivo sem os trechos danificados.
+
+        Os trechos vão para a quarentena e o relatório retornado lista o que se
+        perdeu. Um arquivo no formato antigo é convertido mesmo sem danos.
+        """
+        with self.locked():
+            if not os.path.exists(self.path):
+                return {"recuperados": 0, "perdidos": [], "quarentena": None}
+            legado = self.is_legacy()
+            danos = []
+            logs = [log for _, _, _, log in self._iter_records(danos=danos)]
+            if danos:
+                relatorio = self._quarantine(danos, len(logs))
+            else:
+                relatorio = {"recuperados": len(logs), "perdidos": [], "quarentena": None}
+            if danos or legado:
+                self.write_all(logs)
+        return relatorio
+
+    def _verified_point(self):
+        """Posição até onde o arquivo atual já foi conferido (0 se foi trocado ou nunca verificado)."""
+        try:
+            with open(self.verified_path, "r") as f:
+                ponto = json.load(f)
+            info = os.stat(self.path)
+        except (OSError, ValueError):
+            return 0
+        # 🔹 Outro inode ou arquivo menor: foi regravado por fora e precisa ser conferido todo
+        if ponto.get("inode") != info.st_ino or ponto.get("tamanho", 0) > info.st_size:
+            return 0
+        return ponto.get("tamanho", 0)
+
+    def _mark_verified(self, tamanho):
+        self._replace_file(self.verified_path, json.dumps({"inode": os.stat(self.path).st_ino, "tamanho": tamanho}))
+
+    def _quarantine(self, danos, recuperados):
+        """Guarda os trechos danificados e o relatório de recuperação; retorna o relatório."""
+        os.makedirs(self.quarantine_dir, exist_ok=True)
+        prefixo = os.path.join(
+            self.quarantine_dir, f"{os.path.basename(self.path)}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        )
+        with open(prefixo + ".dat", "wb") as f:
+            for dano in danos:
+                f.write(f"# offset={dano['offset']} bytes={dano['bytes']} motivo={dano['motivo']}\n".encode("utf-8"))
+                f.write(dano["dados"] + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        relatorio = {
+            "data": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+            "arquivo": os.path.abspath(self.path),
+            "recuperados": recuperados,
+            "perdidos": [{campo: valor for campo, valor in dano.items() if campo != "dados"} for dano in danos],
+            "quarentena": prefixo + ".dat",
+        }
+        with open(prefixo + ".json", "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+        return relatorio
+
+    def _summary(self, log, offset, length, crc=None):
+        # 🔹 Sessões antigas, gravadas sem resumo, têm os totais calculados durante a leitura
+        resumo = log.get("resumo")
+        if not isinstance(resumo, dict) or not all(campo in resumo for campo in CAMPOS_RESUMO_INDICE):
+            resumo = resumir_sessao(log.get("etapas", []))
+        return {
+            "token": log.get("token", ""),
+            "data_finalizacao": log.get("data_finalizacao", ""),
+            "card_jira": log.get("card_jira", ""),
+            **{campo: resumo[campo] for campo in CAMPOS_RESUMO_INDICE},
+            "offset": offset,
+            "length": length,
+            "crc": crc,
+        }
+
+    def _iter_records(self, inicio=0, arquivo=None, danos=None):
+        """Gera (posição, tamanho, crc, registro) dos registros íntegros; os danificados vão para `danos`.
+
+        Sem `danos`, vão para uma lista nova em `last_damage`. Os métodos que
+        decidem pelos danos passam a própria lista: `last_damage` é da instância
+        e outra leitura (em outra thread) pode trocá-lo no meio do caminho.
+        `arquivo` (já no formato enquadrado) substitui a leitura do caminho, ex.: uma cópia em memória.
+        """
+        if danos is None:
+            danos = self.last_damage = []
+        if arquivo is None and self.is_legacy():
+            yield from self._iter_legacy_records(danos)
+            return
+
+        with contextlib.nullcontext(arquivo) if arquivo is not None else open(self.path, "rb") as f:
+            f.seek(inicio)
+            buffer = b""
+            base = inicio
+            pos = 0
+            eof = False
+            while True:
+                pos = _BRANCOS.match(buffer, pos).end()
+                fim_linha = buffer.find(b"\n", pos)
+                if fim_linha < 0 and not eof:
+                    # 🔹 Linha cortada no fim do bloco: descarta o que já foi lido e busca mais
+                    bloco = f.read(TAMANHO_BLOCO)
+                    eof = len(bloco) < TAMANHO_BLOCO
+                    instrumentacao.contar(bytes_lidos=len(bloco))
+                    base += pos
+                    buffer = buffer[pos:] + bloco
+                    pos = 0
+                    continue
+                if pos >= len(buffer):
+                    return
+                if fim_linha < 0:
+                    fim_linha = len(buffer)
+
+                cabecalho = _CABECALHO.match(buffer, pos, fim_linha)
+                if cabecalho is None:
+                    motivo = "cabeçalho inválido"
+                else:
+                    tamanho, crc = int(cabecalho[1]), int(cabecalho[2], 16)
+                    fim = cabecalho.end() + tamanho
+                    # 🔹 O tamanho delimita o registro mesmo que a quebra de linha depois dele tenha se perdido
+                    if fim > fim_linha:
+                        motivo = "registro incompleto"
+                    elif zlib.crc32(buffer[cabecalho.end():fim]) != crc:
+                        motivo = "checksum divergente"
+                    else:
+                        try:
+                            log = json.loads(buffer[cabecalho.end():fim])
+                        except ValueError:
+                            motivo = "JSON inválido"
+                        else:
+                            yield base + cabecalho.end(), tamanho, crc, log
+                            pos = fim
+                            continue
+
+                danos.append(_dano(base + pos, buffer[pos:fim_linha], motivo))
+                pos = fim_linha + 1
+
+    def _iter_legacy_records(self, danos):
+        """Gera (posição, tamanho, None, registro) para cada item da lista JSON do formato antigo."""
+        decoder = json.JSONDecoder()
+        # 🔹 latin-1 mapeia cada byte em um caractere: as posições do texto são posições no arquivo
+        with open(self.path, "r", encoding="latin-1", newline="") as f:
+            buffer = f.read(TAMANHO_BLOCO)
+            buffer_ascii = buffer.isascii()
+            base = 0
+            eof = len(buffer) < TAMANHO_BLOCO
+            instrumentacao.contar(bytes_lidos=len(buffer))
+
+            pos = _ESPACOS.match(buffer).end() + 1
+
+            while True:
+                pos = _ESPACOS.match(buffer, pos).end()
+                if pos < len(buffer) and buffer[pos] == "]":
+                    return
+                if pos < len(buffer) and buffer[pos] == ",":
+                    pos += 1
+                    continue
+
+                try:
+                    if pos >= len(buffer):
+                        raise json.JSONDecodeError("Fim do bloco", buffer, pos)
+                    log, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        if pos >= len(buffer):
+                            return
+                        # 🔹 Item ilegível: pula até o próximo item no recuo usado pelo app e pelo json.dump
+                        proximo = buffer.find("\n    {", pos + 1)
+                        fim = proximo if proximo >= 0 else len(buffer)
+                        danos.append(
+                            _dano(base + pos, buffer[pos:fim].rstrip("]\n\t\r ,").encode("latin-1"), "JSON inválido")
+                        )
+                        pos = fim
+                        continue
+                    # 🔹 Registro cortado no fim do bloco: descarta o que já foi lido e busca mais
+                    bloco = f.read(TAMANHO_BLOCO)
+                    eof = len(bloco) < TAMANHO_BLOCO
+                    instrumentacao.contar(bytes_lidos=len(bloco))
+                    base += pos
+                    buffer = buffer[pos:] + bloco
+                    buffer_ascii = buffer.isascii()
+                    pos = 0
+                    continue
+
+                if not buffer_ascii and not buffer[pos:end].isascii():
+                    # 🔹 Texto UTF-8 fora do ASCII: decodifica de novo a partir dos bytes originais
+                    log = json.loads(buffer[pos:end].encode("latin-1"))
+                yield base + pos, end - pos, None, log
+                pos = end
@@ -0,0 +1,247 @@
+"""Rotina de manutenção que valida e recalcula as durações das etapas salvas.
+
+Uso:
+    python -m AppEnsaios.maintenance caminho/tracking_logs.json [--corrigir] [--resumos] [--relatorio arquivo.json]
+"""
+import argparse
+import functools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from AppEnsaios.history import EditHistory
+from AppEnsaios.log_store import LogStore, resumir_sessao
+
+SEGUNDOS_NO_DIA = 24 * 60 * 60
+TAMANHO_LOTE = 65536
+TOLERANCIA_PADRAO = 2.0  # 🔹 inicio/fim são truncados em segundos e o tempo é medido com time.time()
+
+NEGATIVO = "negativo"
+VIRADA_DE_DIA = "virada_de_dia"
+INCONSISTENTE = "inconsistente"
+FORMATO_INVALIDO = "formato_invalido"
+ACIMA_DE_UM_DIA = "acima_de_um_dia"
+
+CORRIGIVEIS = (NEGATIVO, INCONSISTENTE)  # 🔹 Os únicos que --corrigir altera
+NOTAS = (VIRADA_DE_DIA,)  # 🔹 Intervalos corretos que só são anotados no relatório
+
+
+@functools.lru_cache(maxsize=1)
+def tabela_horarios():
+    """Tabela pré-calculada "HH:MM:SS" -> segundos, montada uma única vez por processo."""
+    return {
+        f"{h:02}:{m:02}:{s:02}": h * 3600 + m * 60 + s
+        for h in range(24)
+        for m in range(60)
+        for s in range(60)
+    }
+
+
+def parse_horario(texto):
+    """Converte "HH:MM:SS" em segundos desde a meia-noite; retorna None se o formato for inválido."""
+    segundos = tabela_horarios().get(texto)
+    if segundos is None and isinstance(texto, str):
+        # 🔹 Caminho lento apenas para formatos fora do padrão (ex.: "7:05:00")
+        try:
+            t = datetime.strptime(texto.strip(), "%H:%M:%S")
+        except ValueError:
+            return None
+        segundos = t.hour * 3600 + t.minute * 60 + t.second
+    return segundos
+
+
+def validar_lote(lote, tolerancia=TOLERANCIA_PADRAO):
+    """Valida um lote em colunas (inicio, fim, tempo) e retorna [(posição, tipo, esperado)].
+
+    `tempo` é medido pelo relógio e inicio/fim só têm a hora: um intervalo de um
+    dia ou mais não pode ser conferido por eles e é marcado como ACIMA_DE_UM_DIA.
+    """
+    inicios, fins, tempos = lote
+    tabela = tabela_horarios()
+    # 🔹 Conversão em bloco pela tabela; só os valores fora do padrão caem no parse lento
+    seg_inicio = list(map(tabela.get, inicios))
+    seg_fim = list(map(tabela.get, fins))
+
+    problemas = []
+    for i, (ini, fim, tempo) in enumerate(zip(seg_inicio, seg_fim, tempos)):
+        if ini is None:
+            ini = parse_horario(inicios[i])
+        if fim is None:
+            fim = parse_horario(fins[i])
+        if ini is None or fim is None or not isinstance(tempo, (int, float)):
+            problemas.append((i, FORMATO_INVALIDO, None))
+            continue
+
+        esperado = fim - ini
+        virada = esperado < 0
+        if virada:
+            esperado += SEGUNDOS_NO_DIA
+
+        if tempo < 0:
+            problemas.append((i, NEGATIVO, esperado))
+        elif tempo + tolerancia >= SEGUNDOS_NO_DIA:
+            problemas.append((i, ACIMA_DE_UM_DIA, esperado))
+        elif abs(tempo - esperado) > tolerancia:
+            problemas.append((i, INCONSISTENTE, esperado))
+        elif virada:
+            problemas.append((i, VIRADA_DE_DIA, esperado))  # 🔹 Nota: o tempo já contabiliza a virada
+
+    return problemas
+
+
+def iterar_lotes(logs, tamanho_lote=TAMANHO_LOTE):
+    """Percorre os logs montando lotes em colunas, junto com a referência (log, etapa) de cada linha."""
+    refs, inicios, fins, tempos = [], [], [], []
+    for i, log in enumerate(logs):
+        for j, etapa in enumerate(log.get("etapas", [])):
+            refs.append((i, j))
+            inicios.append(etapa.get("inicio"))
+            fins.append(etapa.get("fim"))
+            tempos.append(etapa.get("tempo"))
+            if len(refs) >= tamanho_lote:
+                yield refs, (inicios, fins, tempos)
+                refs, inicios, fins, tempos = [], [], [], []
+    if refs:
+        yield refs, (inicios, fins, tempos)
+
+
+def verificar_logs(logs, corrigir=False, tolerancia=TOLERANCIA_PADRAO, processos=1, tamanho_lote=TAMANHO_LOTE):
+    """Valida todas as etapas dos logs e, se pedido, corrige os tempos em memória.
+
+    Só intervalos negativos ou inconsistentes recebem a duração calculada a partir de inicio/fim.
+    Intervalos que viram a meia-noite com o tempo certo vão para "notas", não para "problemas";
+    intervalos de um dia ou mais são apontados e nunca corrigidos.
+    """
+    lotes = iterar_lotes(logs, tamanho_lote)
+    validar = functools.partial(validar_lote, tolerancia=tolerancia)
+
+    if processos > 1:
+        refs_por_lote = []
+
+        def colunas():
+            for refs, lote in lotes:
+                refs_por_lote.append(refs)
+                yield lote
+
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            resultados = list(executor.map(validar, colunas()))
+    else:
+        refs_por_lote, resultados = [], []
+        for refs, lote in lotes:
+            refs_por_lote.append(refs)
+            resultados.append(validar(lote))
+
+    relatorio = {
+        "total_sessoes": len(logs),
+        "total_intervalos": sum(len(refs) for refs in refs_por_lote),
+        "contagem": {NEGATIVO: 0, VIRADA_DE_DIA: 0, INCONSISTENTE: 0, FORMATO_INVALIDO: 0, ACIMA_DE_UM_DIA: 0},
+        "corrigidos": 0,
+        "problemas": [],
+        "notas": [],
+    }
+
+    for refs, problemas in zip(refs_por_lote, resultados):
+        for posicao, tipo, esperado in problemas:
+            i, j = refs[posicao]
+            log = logs[i]
+            etapa = log["etapas"][j]
+            relatorio["contagem"][tipo] += 1
+            relatorio["notas" if tipo in NOTAS else "problemas"].append({
+                "token": log.get("token"),
+                "card_jira": log.get("card_jira"),
+                "indice": j,
+                "etapa": etapa.get("etapa"),
+                "inicio": etapa.get("inicio"),
+                "fim": etapa.get("fim"),
+                "tempo": etapa.get("tempo"),
+                "esperado": esperado,
+                "tipo": tipo,
+            })
+
+            if corrigir and tipo in CORRIGIVEIS and etapa.get("tempo") != esperado:
+                etapa["tempo"] = esperado
+                relatorio["corrigidos"] += 1
+
+    return relatorio
+
+
+def atualizar_resumos(logs):
+    """Grava o resumo nas sessões antigas e refaz os que ficaram desatualizados; retorna quantos mudaram."""
+    atualizados = 0
+    for log in logs:
+        resumo = resumir_sessao(log.get("etapas", []))
+        if log.get("resumo") != resumo:
+            log["resumo"] = resumo
+            atualizados += 1
+    return atualizados
+
+
+def executar(log_file, corrigir=False, relatorio_file=None, tolerancia=TOLERANCIA_PADRAO, processos=1, resumos=False):
+    """Carrega o arquivo de logs, valida, grava as correções e o relatório."""
+    store = LogStore(log_file)
+
+    if corrigir or resumos:
+        # 🔹 Ler-alterar-gravar sob o lock do arquivo, como o app faz
+        with store.locked():
+            # 🔹 Registros danificados vão para a quarentena antes da regravação
+            logs = store.read_for_update()
+            # 🔹 As correções alteram as etapas no lugar: a versão anterior é copiada antes
+            originais = [[dict(etapa) for etapa in log.get("etapas", [])] for log in logs] if corrigir else []
+            relatorio = verificar_logs(logs, corrigir=corrigir, tolerancia=tolerancia, processos=processos)
+            relatorio["resumos_atualizados"] = atualizar_resumos(logs)
+            if relatorio["corrigidos"] or relatorio["resumos_atualizados"]:
+                store.write_all(logs)
+                # 🔹 Depois da gravação, cada sessão corrigida ganha uma versão no histórico de edições;
+                # resumos não mudam as etapas e não geram entradas
+                historico = EditHistory(log_file + ".history.jsonl")
+                for log, antes in zip(logs, originais):
+                    historico.record(log.get("token"), antes, log.get("etapas", []), motivo="correção de duração")
+    else:
+        relatorio = verificar_logs(store.read_all(), tolerancia=tolerancia, processos=processos)
+
+    relatorio["registros_danificados"] = [
+        {campo: valor for campo, valor in dano.items() if campo != "dados"} for dano in store.last_damage
+    ]
+    relatorio["arquivo"] = os.path.abspath(log_file)
+    relatorio["data"] = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+
+    if relatorio_file:
+        with open(relatorio_file, "w") as f:
+            json.dump(relatorio, f, indent=4)
+
+    return relatorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida e recalcula as durações das etapas salvas.")
+    parser.add_argument("log_file", help="Caminho do tracking_logs.json")
+    parser.add_argument("--corrigir", action="store_true", help="Grava os tempos recalculados no arquivo")
+    parser.add_argument("--resumos", action="store_true", help="Grava o resumo (totais) nas sessões que não o têm")
+    parser.add_argument("--relatorio", help="Arquivo JSON onde o relatório será salvo")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO, help="Diferença aceita em segundos")
+    parser.add_argument("--processos", type=int, default=1, help="Número de processos para validar os lotes")
+    args = parser.parse_args(argv)
+
+    relatorio = executar(
+        args.log_file,
+        corrigir=args.corrigir,
+        relatorio_file=args.relatorio,
+        tolerancia=args.tolerancia,
+        processos=args.processos,
+        resumos=args.resumos,
+    )
+
+    print(f"Sessões: {relatorio['total_sessoes']} | Intervalos: {relatorio['total_intervalos']}")
+    for tipo, quantidade in relatorio["contagem"].items():
+        print(f"{tipo}: {quantidade}")
+    if relatorio["registros_danificados"]:
+        print(f"Registros danificados (ignorados): {len(relatorio['registros_danificados'])}")
+    if args.corrigir:
+        print(f"Corrigidos: {relatorio['corrigidos']}")
+    if "resumos_atualizados" in relatorio:
+        print(f"Resumos atualizados: {relatorio['resumos_atualizados']}")
+
+
+if __name__ == "__main__":
+    main()
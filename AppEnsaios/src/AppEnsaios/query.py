@@ -0,0 +1,329 @@
+"""Linguagem de consulta do visualizador de logs.
+
+Exemplo: card:ABC-12 code:0003 date:2025-03-01..2025-03-31 dur>30m stage:"Etapa 2"
+
+Campos:
+    card:VALOR      card JIRA exato (sem diferenciar maiúsculas); com * vira busca por trecho
+    token:TRECHO    trecho do token
+    date:DATA       data de finalização; aceita intervalo DATA..DATA e lados abertos
+                    (DATA no formato AAAA-MM-DD ou DD/MM/AAAA)
+    code:CODIGO     sessões com alguma ocorrência desse código de etapa
+    stage:NOME      sessões com alguma ocorrência dessa etapa (nome exato, sem diferenciar maiúsculas)
+    dur>N, dur<N, dur>=N, dur<=N, dur:N
+                    tempo total (s, m ou h) das ocorrências; com code/stage, só das que casarem
+                    (sozinho, usa o tempo_total do resumo e não abre as sessões)
+Palavras soltas procuram um trecho na data, no token ou no card, como a busca simples.
+
+A consulta é compilada em um plano: filtros de card e data usam os índices
+montados sobre os resumos, o restante é verificado em uma varredura em fluxo;
+code, stage e dur precisam das etapas e são avaliados por último.
+"""
+import bisect
+import re
+import shlex
+from datetime import date
+
+CAMPOS = ("card", "token", "date", "code", "stage", "dur")
+CAMPOS_DE_ETAPA = ("code", "stage", "dur")
+
+_TERMO = re.compile(r"^(?P<campo>[a-zA-Z]+)\s*(?P<op>:|>=|<=|>|<|=)(?P<valor>.*)$", re.S)
+_DURACAO = re.compile(r"^(?P<n>\d+(?:[.,]\d+)?)\s*(?P<unidade>[smh]?)$", re.I)
+_ESTRUTURADA = re.compile(r"(?:^|\s)(?:%s)\s*(?::|>|<|=)" % "|".join(CAMPOS), re.I)
+
+_UNIDADES = {"": 1, "s": 1, "m": 60, "h": 3600}
+TENTATIVAS = 3  # 🔹 Vezes que a consulta recomeça quando o arquivo é regravado no meio dela
+
+
+class QueryError(ValueError):
+    """Consulta com sintaxe inválida."""
+
+
+class Termo:
+    """Um filtro da consulta: campo, operador e valor já convertido."""
+
+    def __init__(self, campo, op, valor):
+        self.campo = campo
+        self.op = op
+        self.valor = valor
+
+    def __repr__(self):
+        return f"Termo({self.campo!r}, {self.op!r}, {self.valor!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Termo) and (self.campo, self.op, self.valor) == (other.campo, other.op, other.valor)
+
+
+def parece_estruturada(texto):
+    """Indica se o texto usa a sintaxe campo:valor (senão vale a busca simples)."""
+    return bool(_ESTRUTURADA.search(texto))
+
+
+def _parse_data(texto):
+    texto = texto.strip()
+    try:
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}", texto):
+            return date(int(texto[:4]), int(texto[5:7]), int(texto[8:10])).toordinal()
+        if re.fullmatch(r"\d{2}/\d{2}/\d{4}", texto):
+            return date(int(texto[6:10]), int(texto[3:5]), int(texto[:2])).toordinal()
+    except ValueError:
+        pass
+    raise QueryError(f"Data inválida: {texto!r}")
+
+
+def _parse_duracao(texto):
+    m = _DURACAO.match(texto.strip())
+    if not m:
+        raise QueryError(f"Duração inválida: {texto!r}")
+    return float(m.group("n").replace(",", ".")) * _UNIDADES[m.group("unidade").lower()]
+
+
+def ordinal_da_data(data_finalizacao):
+    """Converte "DD/MM/AAAA HH:MM:SS" em ordinal do dia; None se não for possível."""
+    try:
+        return date(int(data_finalizacao[6:10]), int(data_finalizacao[3:5]), int(data_finalizacao[:2])).toordinal()
+    except (ValueError, TypeError):
+        return None
+
+
+def parse(texto):
+    """Converte o texto da consulta em uma lista de Termo."""
+    try:
+        partes = shlex.split(texto)
+    except ValueError as exc:
+        raise QueryError(f"Aspas não fechadas: {exc}") from exc
+
+    termos = []
+    for parte in partes:
+        m = _TERMO.match(parte)
+        if not m or m.group("campo").lower() not in CAMPOS:
+            termos.append(Termo("texto", ":", parte))
+            continue
+
+        campo, op, valor = m.group("campo").lower(), m.group("op"), m.group("valor")
+        if op == "=":
+            op = ":"
+        if campo != "dur" and op != ":":
+            raise QueryError(f"O campo {campo} só aceita ':'")
+        if not valor:
+            raise QueryError(f"Valor vazio para {campo}")
+
+        if campo == "date":
+            if ".." in valor:
+                inicio, fim = valor.split("..", 1)
+                valor = (_parse_data(inicio) if inicio else None, _parse_data(fim) if fim else None)
+            else:
+                dia = _parse_data(valor)
+                valor = (dia, dia)
+        elif campo == "dur":
+            valor = _parse_duracao(valor)
+        elif campo in ("card", "stage"):
+            valor = valor.lower()
+
+        termos.append(Termo(campo, op, valor))
+    return termos
+
+
+class _IndicesVelhos(Exception):
+    """O arquivo foi regravado depois dos índices: offsets e posições não valem mais."""
+
+
+class QueryIndexes:
+    """Índices sobre os resumos das sessões: card exato e data ordenada.
+
+    `geracao` é o contador de gravações do arquivo quando os resumos foram lidos.
+    """
+
+    def __init__(self, resumos, geracao=None):
+        self.resumos = resumos
+        self.geracao = geracao
+        self.por_card = {}
+        datas = []
+        for posicao, resumo in enumerate(resumos):
+            self.por_card.setdefault(str(resumo.get("card_jira", "")).lower(), []).append(posicao)
+            dia = ordinal_da_data(resumo.get("data_finalizacao", ""))
+            if dia is not None:
+                datas.append((dia, posicao))
+        datas.sort()
+        self.datas = datas
+        self._dias = [dia for dia, _ in datas]
+
+    def card(self, valor):
+        return set(self.por_card.get(valor, ()))
+
+    def intervalo_datas(self, inicio, fim):
+        esquerda = 0 if inicio is None else bisect.bisect_left(self._dias, inicio)
+        direita = len(self._dias) if fim is None else bisect.bisect_right(self._dias, fim)
+        return {posicao for _, posicao in self.datas[esquerda:direita]}
+
+
+def _comparar(op, valor, limite):
+    if op == ">":
+        return valor > limite
+    if op == ">=":
+        return valor >= limite
+    if op == "<":
+        return valor < limite
+    if op == "<=":
+        return valor <= limite
+    return valor == limite
+
+
+class QueryPlan:
+    """Plano compilado: consultas aos índices, filtros nos resumos e filtros nas etapas."""
+
+    def __init__(self, termos):
+        self.termos = termos
+        self.indexados = []
+        self.filtros_resumo = []
+        self.filtros_etapa = [t for t in termos if t.campo in CAMPOS_DE_ETAPA]
+        # 🔹 Sem code/stage, dur compara o tempo total já guardado no resumo da sessão
+        self.dur_pelo_resumo = bool(self.filtros_etapa) and all(t.campo == "dur" for t in self.filtros_etapa)
+        self.examinados = 0
+        self.registros_lidos = 0
+
+        for termo in termos:
+            if termo.campo == "date" or (termo.campo == "card" and "*" not in termo.valor):
+                self.indexados.append(termo)
+            elif termo.campo in ("card", "token", "texto"):
+                self.filtros_resumo.append(termo)
+
+    def describe(self):
+        """Passos do plano, para testes e diagnóstico."""
+        passos = [f"indice:{t.campo}" for t in self.indexados] or ["varredura"]
+        passos += [f"filtro:{t.campo}" for t in self.filtros_resumo]
+        origem = "resumo" if self.dur_pelo_resumo else "etapas"
+        passos += [f"{origem}:{t.campo}" for t in self.filtros_etapa]
+        return passos
+
+    def candidatos(self, indexes):
+        """Posições candidatas pelos índices (None = todas)."""
+        candidatos = None
+        for termo in self.indexados:
+            if termo.campo == "card":
+                encontrados = indexes.card(termo.valor)
+            else:
+                encontrados = indexes.intervalo_datas(*termo.valor)
+            candidatos = encontrados if candidatos is None else candidatos & encontrados
+            if not candidatos:
+                return set()
+        return candidatos
+
+    def aceita_resumo(self, resumo):
+        for termo in self.filtros_resumo:
+            if termo.campo == "card":
+                trecho = termo.valor.replace("*", "")
+                if trecho not in str(resumo.get("card_jira", "")).lower():
+                    return False
+            elif termo.campo == "token":
+                if termo.valor not in resumo.get("token", ""):
+                    return False
+            else:
+                trecho = termo.valor.lower()
+                if not any(trecho in str(resumo.get(campo, "")).lower()
+                           for campo in ("data_finalizacao", "token", "card_jira")):
+                    return False
+        return True
+
+    def aceita_registro(self, registro):
+        codigos = {t.valor for t in self.filtros_etapa if t.campo == "code"}
+        etapas = {t.valor for t in self.filtros_etapa if t.campo == "stage"}
+        duracoes = [t for t in self.filtros_etapa if t.campo == "dur"]
+
+        total = 0.0
+        encontrou = False
+        for etapa in registro.get("etapas", []):
+            if codigos and etapa.get("codigo") not in codigos:
+                continue
+            if etapas and str(etapa.get("etapa", "")).lower() not in etapas:
+                continue
+            encontrou = True
+            total += etapa.get("tempo", 0) or 0
+
+        if (codigos or etapas) and not encontrou:
+            return False
+        return all(_comparar(t.op, total, t.valor) for t in duracoes)
+
+    def execute(self, indexes, carregar=None, varrer=None, geracao=None, reindexar=None):
+        """Gera os resumos que satisfazem a consulta, na ordem do arquivo.
+
+        `carregar(resumo)` lê uma sessão completa; `varrer()` gera (offset, sessão)
+        lendo o arquivo em sequência e é preferido quando muitas sessões precisam
+        ser abertas.
+
+        Com `geracao()` (contador de gravações do arquivo) e `reindexar()` (índices
+        novos), se o arquivo foi regravado antes ou durante a leitura das sessões a
+        consulta recomeça sobre os índices novos, sem repetir resumos já entregues.
+        """
+        entregues = set()
+        for tentativa in range(TENTATIVAS + 1):
+            # 🔹 Na última tentativa segue sem conferir, para não ficar preso a um arquivo que não para de mudar
+            conferir = geracao if reindexar is not None and tentativa < TENTATIVAS else None
+            try:
+                for resumo in self._executar(indexes, carregar, varrer, conferir):
+                    if resumo["token"] in entregues:
+                        continue
+                    if reindexar is not None:
+                        entregues.add(resumo["token"])
+                    yield resumo
+                return
+            except _IndicesVelhos:
+                indexes = reindexar()
+
+    def _executar(self, indexes, carregar, varrer, geracao):
+        def conferir():
+            if geracao is not None and geracao() != indexes.geracao:
+                raise _IndicesVelhos()
+
+        conferir()
+        candidatos = self.candidatos(indexes)
+        if candidatos is None:
+            posicoes = range(len(indexes.resumos))
+        else:
+            posicoes = sorted(candidatos)
+
+        selecionados = []
+        for posicao in posicoes:
+            self.examinados += 1
+            resumo = indexes.resumos[posicao]
+            if not self.aceita_resumo(resumo):
+                continue
+            if not self.filtros_etapa:
+                yield resumo
+                continue
+            if self.dur_pelo_resumo and "tempo_total" in resumo:
+                if all(_comparar(t.op, resumo["tempo_total"], t.valor) for t in self.filtros_etapa):
+                    yield resumo
+                continue
+            selecionados.append(resumo)
+
+        if not self.filtros_etapa or not selecionados:
+            return
+
+        # 🔹 Muitas sessões para abrir: uma leitura sequencial do arquivo sai mais barata
+        if varrer is not None and (carregar is None or len(selecionados) > len(indexes.resumos) // 4):
+            # 🔹 Os resumos são casados pelo offset: com o arquivo regravado, sessões sumiriam sem aviso
+            conferir()
+            por_offset = {resumo["offset"]: resumo for resumo in selecionados}
+            for offset, registro in varrer():
+                resumo = por_offset.get(offset)
+                if resumo is None:
+                    continue
+                if geracao is not None and registro.get("token") != resumo["token"]:
+                    raise _IndicesVelhos()
+                self.registros_lidos += 1
+                if self.aceita_registro(registro):
+                    yield resumo
+            conferir()
+            return
+
+        for resumo in selecionados:
+            registro = carregar(resumo)
+            self.registros_lidos += 1
+            if registro is None:
+                conferir()
+            elif self.aceita_registro(registro):
+                yield resumo
+
+
+def compile_query(texto):
+    return QueryPlan(parse(texto))
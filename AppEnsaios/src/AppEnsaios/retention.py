@@ -0,0 +1,322 @@
+"""Política de retenção e compactação do arquivo de logs.
+
+Sessões além do limite (idade, quantidade ou tamanho) saem do arquivo ativo:
+no modo "arquivar" vão para um arquivo JSON Lines compactado com gzip em
+logs/arquivo/, no modo "descartar" são apagadas. Nos dois casos os totais
+delas (tempo por etapa e por card) somam-se a retencao_agregados.json.
+
+A compactação também regrava o arquivo ativo sem duplicatas (mesmo token: vale
+a última ocorrência) e sem marcações de remoção. A regravação segura o lock do
+arquivo só para copiar e trocar (LogStore.rewrite), e uma sessão editada depois
+de arquivada tem a versão nova acrescentada ao arquivo antes de sair do ativo.
+O histórico de edições das sessões removidas sai na mesma fase. Cada passo é
+anotado em um checkpoint (retencao_checkpoint.json): se o app fechar no meio, a
+próxima execução termina o trabalho pendente antes de selecionar novas sessões.
+"""
+import contextlib
+import functools
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from AppEnsaios.history import EditHistory
+from AppEnsaios.log_store import resumir_sessao
+
+ARQUIVAR = "arquivar"
+DESCARTAR = "descartar"
+MODOS = (ARQUIVAR, DESCARTAR)
+EXECUCOES_GUARDADAS = 50
+
+# 🔹 Fases do checkpoint, na ordem em que acontecem
+FASE_ARQUIVANDO = "arquivando"
+FASE_REMOVENDO = "removendo"
+FASE_AGREGANDO = "agregando"
+
+
+class RetentionPolicy:
+    """Limites do arquivo ativo; None desliga o critério."""
+
+    def __init__(self, dias=None, max_sessoes=None, max_bytes=None, modo=ARQUIVAR):
+        if modo not in MODOS:
+            raise ValueError(f"Modo de retenção inválido: {modo!r}")
+        self.dias = dias
+        self.max_sessoes = max_sessoes
+        self.max_bytes = max_bytes
+        self.modo = modo
+
+    @classmethod
+    def from_settings(cls, settings):
+        def positivo(chave):
+            valor = settings.get(chave)
+            return valor if isinstance(valor, (int, float)) and valor > 0 else None
+
+        megabytes = positivo("retencao_mb")
+        return cls(
+            dias=positivo("retencao_dias"),
+            max_sessoes=positivo("retencao_sessoes"),
+            max_bytes=int(megabytes * 1024 * 1024) if megabytes else None,
+            modo=settings.get("retencao_modo", ARQUIVAR) if settings.get("retencao_modo") in MODOS else ARQUIVAR,
+        )
+
+    @property
+    def ativa(self):
+        return any(limite is not None for limite in (self.dias, self.max_sessoes, self.max_bytes))
+
+
+def data_da_sessao(resumo):
+    try:
+        return datetime.strptime(resumo.get("data_finalizacao", ""), "%d/%m/%Y %H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+
+
+def selecionar_expirados(index, politica, agora=None):
+    """Tokens das sessões além dos limites, a partir do índice (sem abrir as etapas).
+
+    As sessões são consideradas na ordem do arquivo, que é a ordem de
+    finalização: as mais antigas saem primeiro. Só a última ocorrência de cada
+    token conta; as anteriores são duplicatas e somem na compactação.
+    """
+    agora = agora or datetime.now()
+    ultimas = {}
+    for resumo in index:
+        ultimas.pop(resumo["token"], None)
+        ultimas[resumo["token"]] = resumo
+    vivas = list(ultimas.values())
+
+    expirados = set()
+    if politica.dias is not None:
+        limite = agora - timedelta(days=politica.dias)
+        for resumo in vivas:
+            data = data_da_sessao(resumo)
+            if data is not None and data < limite:
+                expirados.add(resumo["token"])
+
+    restantes = [resumo for resumo in vivas if resumo["token"] not in expirados]
+    if politica.max_sessoes is not None and len(restantes) > politica.max_sessoes:
+        for resumo in restantes[:len(restantes) - politica.max_sessoes]:
+            expirados.add(resumo["token"])
+        restantes = restantes[len(restantes) - politica.max_sessoes:]
+
+    if politica.max_bytes is not None:
+        tamanho = sum(resumo["length"] for resumo in restantes)
+        for resumo in restantes:
+            if tamanho <= politica.max_bytes:
+                break
+            expirados.add(resumo["token"])
+            tamanho -= resumo["length"]
+
+    return [resumo["token"] for resumo in vivas if resumo["token"] in expirados]
+
+
+def _eh_marcacao_de_remocao(log):
+    return not isinstance(log, dict) or "token" not in log or log.get("removido") is True
+
+
+def assinatura(log):
+    """Hash do conteúdo da sessão, para saber se ela mudou depois de arquivada."""
+    return hashlib.sha1(json.dumps(log, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def compactar_lista(logs, remover=()):
+    """Remove duplicatas, marcações de remoção e os tokens de `remover`, no lugar."""
+    remover = set(remover)
+    ultimas = {}
+    for log in logs:
+        if _eh_marcacao_de_remocao(log):
+            continue
+        ultimas.pop(log["token"], None)
+        ultimas[log["token"]] = log
+    logs[:] = [log for token, log in ultimas.items() if token not in remover]
+
+
+class Compactador:
+    """Executa a retenção sobre um LogStore, retomando uma execução interrompida."""
+
+    def __init__(self, store, pasta):
+        self.store = store
+        self.pasta = pasta
+        self.pasta_arquivo = os.path.join(pasta, "arquivo")
+        self.checkpoint_path = os.path.join(pasta, "retencao_checkpoint.json")
+        self.agregados_path = os.path.join(pasta, "retencao_agregados.json")
+        self.historico = EditHistory(store.path + ".history.jsonl")
+
+    def _gravar_json(self, path, dados):
+        """Grava em um temporário e troca de lugar, como o arquivo de logs."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(dados, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+    def _ler_json(self, path, padrao):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return padrao
+
+    def checkpoint(self):
+        return self._ler_json(self.checkpoint_path, None)
+
+    def agregados(self):
+        return self._ler_json(self.agregados_path, {
+            "sessoes": 0, "tempo_total": 0, "por_etapa": {}, "por_card": {}, "execucoes": [],
+        })
+
+    def executar(self, politica, agora=None):
+        """Termina uma execução pendente e aplica a política; retorna um relatório."""
+        relatorio = {"retomada": False, "expirados": 0, "duplicadas": 0, "arquivo": None,
+                     "bytes_antes": os.path.getsize(self.store.path)}
+        pendente = self.checkpoint()
+        if pendente is not None:
+            relatorio["retomada"] = True
+            self._continuar(pendente)
+
+        index = self.store.load_index()
+        tokens = selecionar_expirados(index, politica, agora) if politica.ativa else []
+        relatorio["duplicadas"] = len(index) - len({resumo["token"] for resumo in index})
+        if not tokens and not relatorio["duplicadas"]:
+            relatorio["bytes_depois"] = os.path.getsize(self.store.path)
+            return relatorio  # 🔹 Nada a fazer: o arquivo não é regravado
+
+        estado = {
+            "id": uuid.uuid4().hex,
+            "modo": politica.modo,
+            "tokens": tokens,
+            "arquivo": None,
+            "fase": FASE_ARQUIVANDO,
+        }
+        if tokens and politica.modo == ARQUIVAR:
+            os.makedirs(self.pasta_arquivo, exist_ok=True)
+            estado["arquivo"] = os.path.join(
+                self.pasta_arquivo, f"logs-{time.strftime('%Y%m%d-%H%M%S')}-{estado['id'][:8]}.jsonl.gz"
+            )
+
+        self._gravar_json(self.checkpoint_path, estado)
+        self._continuar(estado)
+
+        relatorio.update({
+            "expirados": len(tokens),
+            "arquivo": estado["arquivo"],
+            "bytes_depois": os.path.getsize(self.store.path),
+        })
+        return relatorio
+
+    def _continuar(self, estado):
+        """Executa as fases restantes; cada uma pode ser repetida sem efeito duplicado."""
+        tokens = set(estado["tokens"])
+
+        if estado["fase"] == FASE_ARQUIVANDO:
+            if tokens:
+                expiradas = self._sessoes(tokens)
+                if estado["arquivo"]:
+                    self._arquivar(estado["arquivo"], expiradas)
+                estado["versoes"] = {log["token"]: assinatura(log) for log in expiradas}
+            estado["fase"] = FASE_REMOVENDO
+            self._gravar_json(self.checkpoint_path, estado)
+
+        if estado["fase"] == FASE_REMOVENDO:
+            # 🔹 Sessões gravadas durante a compactação são levadas para o arquivo novo
+            self.store.rewrite(functools.partial(self._remover, estado, tokens))
+            with self.store.locked():
+                self.historico.remove(tokens)
+            estado["fase"] = FASE_AGREGANDO
+            self._gravar_json(self.checkpoint_path, estado)
+
+        if estado["fase"] == FASE_AGREGANDO and estado.get("delta"):
+            self._somar_agregados(estado["id"], estado["delta"])
+
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.checkpoint_path)
+
+    def _remover(self, estado, tokens, logs):
+        """Filtro da regravação: confere as sessões a remover e anota os totais delas antes de tirá-las."""
+        removidas = {}
+        for log in logs:
+            if not _eh_marcacao_de_remocao(log) and log["token"] in tokens:
+                removidas[log["token"]] = log
+        if removidas:
+            versoes = estado.setdefault("versoes", {})
+            # 🔹 Editada depois de arquivada: a versão atual também vai para o arquivo
+            alteradas = [log for token, log in removidas.items() if versoes.get(token) != assinatura(log)]
+            if alteradas and estado["arquivo"]:
+                self._acrescentar(estado["arquivo"], alteradas)
+            versoes.update((log["token"], assinatura(log)) for log in alteradas)
+            # 🔹 Os totais são das versões que saem de fato; anotados antes da troca do arquivo
+            estado["delta"] = self._totais(list(removidas.values()))
+            self._gravar_json(self.checkpoint_path, estado)
+        compactar_lista(logs, tokens)
+        return logs
+
+    def _sessoes(self, tokens):
+        """Última versão de cada sessão expirada, lendo o arquivo em sequência."""
+        ultimas = {}
+        for _, log in self.store.iter_logs():
+            if log.get("token") in tokens:
+                ultimas[log["token"]] = log
+        return list(ultimas.values())
+
+    def _arquivar(self, path, sessoes):
+        # 🔹 Regravado por inteiro se a fase for repetida: nunca fica com sessões em dobro
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for log in sessoes:
+                f.write(json.dumps(log, ensure_ascii=False) + "\n")
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _acrescentar(self, path, sessoes):
+        """Acrescenta as sessões ao arquivo .gz como um novo membro gzip (lido em sequência com os anteriores)."""
+        linhas = "".join(json.dumps(log, ensure_ascii=False) + "\n" for log in sessoes)
+        with open(path, "ab") as f:
+            f.write(gzip.compress(linhas.encode("utf-8")))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _totais(self, sessoes):
+        delta = {"sessoes": len(sessoes), "tempo_total": 0, "por_etapa": {}, "por_card": {}}
+        for log in sessoes:
+            resumo = resumir_sessao(log.get("etapas", []))
+            delta["tempo_total"] += resumo["tempo_total"]
+            card = log.get("card_jira", "")
+            delta["por_card"][card] = delta["por_card"].get(card, 0) + resumo["tempo_total"]
+            for etapa, tempo in resumo["tempo_por_etapa"].items():
+                delta["por_etapa"][etapa] = delta["por_etapa"].get(etapa, 0) + tempo
+        return delta
+
+    def _somar_agregados(self, id_execucao, delta):
+        agregados = self.agregados()
+        if id_execucao in agregados["execucoes"]:
+            return  # 🔹 Já somado antes da interrupção
+        agregados["sessoes"] += delta["sessoes"]
+        agregados["tempo_total"] += delta["tempo_total"]
+        for chave in ("por_etapa", "por_card"):
+            for nome, tempo in delta[chave].items():
+                agregados[chave][nome] = agregados[chave].get(nome, 0) + tempo
+        agregados["execucoes"] = (agregados["execucoes"] + [id_execucao])[-EXECUCOES_GUARDADAS:]
+        self._gravar_json(self.agregados_path, agregados)
+
+
+def ler_arquivo(path):
+    """Lê as sessões de um arquivo de arquivamento (.jsonl.gz); vale a última versão de cada token."""
+    ultimas = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for linha in f:
+            if linha.strip():
+                log = json.loads(linha)
+                ultimas.pop(log.get("token"), None)
+                ultimas[log.get("token")] = log
+    return list(ultimas.values())
@@ -0,0 +1,171 @@
+"""Busca aproximada nos resumos das sessões, tolerante a erros de digitação."""
+import heapq
+import itertools
+import re
+import threading
+import unicodedata
+
+from AppEnsaios.cache import LRUCache
+
+CAMPOS_BUSCA = ("card_jira", "token", "data_finalizacao")
+RESULTADOS_PADRAO = 20
+SCORE_MINIMO = 0.35
+
+_NAO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e sem pontuação: "PROJ-1234" e "proj1234" ficam iguais."""
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return _NAO_ALFANUMERICO.sub("", texto.lower())
+
+
+def trigramas(texto):
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def distancia_edicao(a, b):
+    """Distância de Levenshtein com duas linhas de memória."""
+    if len(a) < len(b):
+        a, b = b, a
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i]
+        for j, cb in enumerate(b, 1):
+            atual.append(min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        anterior = atual
+    return anterior[-1]
+
+
+def similaridade(consulta, consulta_trigramas, texto):
+    """Score entre 0 e 1 de um campo já normalizado em relação à consulta."""
+    if not consulta or not texto:
+        return 0.0
+    if consulta == texto:
+        return 1.0
+    if consulta in texto:
+        return 0.9 + 0.1 * len(consulta) / len(texto)
+
+    texto_trigramas = trigramas(texto)
+    comuns = len(consulta_trigramas & texto_trigramas)
+    dice = 2 * comuns / (len(consulta_trigramas) + len(texto_trigramas))
+
+    # 🔹 Campos curtos (cards) também são comparados pela distância de edição
+    if len(texto) <= 3 * len(consulta):
+        edicao = 1 - distancia_edicao(consulta, texto) / max(len(consulta), len(texto))
+        return max(dice, edicao)
+    return dice
+
+
+def buscar_aproximado(resumos, consulta, k=RESULTADOS_PADRAO, minimo=SCORE_MINIMO):
+    """Retorna até k pares (score, resumo) em ordem decrescente de score.
+
+    Usa um heap de tamanho k: o custo é O(n log k) e a memória O(k), por maior
+    que seja o número de sessões parecidas.
+    """
+    consulta = normalizar(consulta)
+    if not consulta:
+        return []
+    consulta_trigramas = trigramas(consulta)
+
+    def candidatos():
+        for ordem, resumo in enumerate(resumos):
+            score = max(similaridade(consulta, consulta_trigramas, normalizar(resumo.get(campo, "")))
+                        for campo in CAMPOS_BUSCA)
+            if score >= minimo:
+                # 🔹 Em caso de empate, as sessões mais recentes (fim do arquivo) vêm primeiro
+                yield score, ordem, resumo
+
+    melhores = heapq.nlargest(k, candidatos(), key=lambda item: (item[0], item[1]))
+    return [(score, resumo) for score, _, resumo in melhores]
+
+
+def proximo_lote(iterador, n):
+    """Retira até n itens do iterador; usado para entregar resultados à interface aos poucos."""
+    return list(itertools.islice(iterador, n))
+
+
+def sob_demanda(produzir):
+    """Iterador que só chama `produzir()` no primeiro next (ou seja, na thread que consumir)."""
+    yield from produzir()
+
+
+class ResultadosEmCache:
+    """Resultados de uma busca guardados à medida que são consumidos.
+
+    Iterar de novo repete o que já foi produzido e só então continua a busca
+    original, então uma página não lida nunca chega a ser calculada.
+    """
+
+    def __init__(self, fonte):
+        self.itens = []
+        self.completo = False
+        self._fonte = iter(fonte)
+        self._lock = threading.Lock()  # 🔹 Uma busca substituída pode ainda estar consumindo na outra thread
+
+    def __iter__(self):
+        posicao = 0
+        while True:
+            with self._lock:
+                if posicao < len(self.itens):
+                    item = self.itens[posicao]
+                elif self.completo:
+                    return
+                else:
+                    try:
+                        item = next(self._fonte)
+                    except StopIteration:
+                        self.completo = True
+                        self._fonte = None
+                        return
+                    self.itens.append(item)
+            posicao += 1
+            yield item
+
+
+class SearchCache:
+    """Resultados por (modo, consulta normalizada), válidos para uma geração do arquivo de logs."""
+
+    def __init__(self, capacity=32):
+        self.entradas = LRUCache(capacity)
+        self.geracao = None
+        self.refinamentos = 0
+
+    def results(self, chave, geracao, buscar, refinar=None):
+        """Iterador de resultados da chave; usa o cache ou chama `buscar()`.
+
+        `refinar(chave_anterior)` retorna um filtro para reaproveitar os resultados de uma
+        busca mais ampla (ou None se a chave anterior não servir de ponto de partida).
+        """
+        if geracao != self.geracao:
+            # 🔹 O arquivo mudou: nenhum resultado antigo vale mais
+            self.entradas.clear()
+            self.geracao = geracao
+
+        entrada = self.entradas.get(chave)
+        if entrada is None:
+            entrada = ResultadosEmCache(self._refinada(refinar) or buscar())
+            self.entradas.put(chave, entrada)
+        return iter(entrada)
+
+    def _refinada(self, refinar):
+        if refinar is None:
+            return None
+        candidatas = []
+        for chave, entrada in self.entradas.items():
+            filtro = refinar(chave)
+            if filtro is not None:
+                candidatas.append((filtro, entrada))
+        if not candidatas:
+            return None
+        # 🔹 Parte da busca mais ampla já completa com menos candidatos
+        filtro, entrada = min(candidatas, key=lambda c: (not c[1].completo, len(c[1].itens)))
+        self.refinamentos += 1
+        return (item for item in entrada if filtro(item))
+
+    def clear(self):
+        self.entradas.clear()
+
+    def stats(self):
+        return {**self.entradas.stats(), "refinamentos": self.refinamentos}
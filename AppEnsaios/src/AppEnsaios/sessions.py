@@ -0,0 +1,205 @@
+"""Sessões de acompanhamento simultâneas e o agendador único que as atualiza."""
+import time
+
+from AppEnsaios.instrumentation import instrumentacao
+
+
+class TrackingSession:
+    """Estado de um acompanhamento em andamento (um card JIRA)."""
+
+    def __init__(self, nome, card_jira=""):
+        self.nome = nome
+        self.card_jira = card_jira
+        self.current_stage = None
+        self.start_time = None
+        self.hora_inicio = None
+        self.horarios = {}  # 🔹 etapa -> [{"inicio", "fim", "tempo"}]
+        self.stage_totals = {}  # 🔹 etapa -> tempo encerrado; o tick não precisa somar os intervalos
+        self.closed_total = 0.0
+
+    @property
+    def active(self):
+        return self.current_stage is not None
+
+    def _close_current(self, now, timestamp):
+        if self.current_stage is None:
+            return None
+        tempo = now - self.start_time
+        self.horarios.setdefault(self.current_stage, []).append({
+            "inicio": self.hora_inicio,
+            "fim": timestamp,
+            "tempo": tempo
+        })
+        self.stage_totals[self.current_stage] = self.stage_totals.get(self.current_stage, 0.0) + tempo
+        self.closed_total += tempo
+        return self.current_stage
+
+    def switch_stage(self, stage_name, now, timestamp):
+        """Encerra a etapa atual (se houver), inicia a nova e retorna a etapa encerrada."""
+        previous = self._close_current(now, timestamp)
+        self.current_stage = stage_name
+        self.start_time = now
+        self.hora_inicio = timestamp
+        return previous
+
+    def stop(self, now, timestamp):
+        """Encerra a etapa atual e retorna o nome dela."""
+        previous = self._close_current(now, timestamp)
+        self.current_stage = None
+        self.start_time = None
+        self.hora_inicio = None
+        return previous
+
+    def stage_elapsed(self, now):
+        return now - self.start_time if self.current_stage else 0.0
+
+    def stage_total(self, stage_name, now):
+        """Tempo acumulado da etapa na sessão, incluindo o intervalo em andamento."""
+        total = self.stage_totals.get(stage_name, 0.0)
+        return total + self.stage_elapsed(now) if stage_name == self.current_stage else total
+
+    def elapsed(self, now):
+        """Tempo total da sessão, incluindo a etapa em andamento."""
+        return self.closed_total + self.stage_elapsed(now)
+
+    def build_log(self, stages):
+        """Monta a lista de ocorrências na ordem das etapas configuradas."""
+        log_completo = []
+        for stage_name, data in stages.items():
+            for horario in self.horarios.get(stage_name, []):
+                log_completo.append({
+                    "etapa": data["nome"],
+                    "codigo": data["codigo"],
+                    "inicio": horario["inicio"],
+                    "fim": horario["fim"],
+                    "tempo": horario["tempo"]
+                })
+        return log_completo
+
+
+class SessionManager:
+    """Guarda as sessões abertas pelo nome e qual delas está em primeiro plano."""
+
+    def __init__(self):
+        self.sessions = {}
+        self.foreground_name = None
+        self._contador = 0
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __iter__(self):
+        return iter(self.sessions.values())
+
+    @property
+    def foreground(self):
+        return self.sessions.get(self.foreground_name)
+
+    @property
+    def any_active(self):
+        return any(session.active for session in self.sessions.values())
+
+    def names(self):
+        return list(self.sessions)
+
+    def create(self, card_jira=""):
+        """Cria uma nova sessão e a coloca em primeiro plano."""
+        self._contador += 1
+        nome = f"Sessão {self._contador}"
+        while nome in self.sessions:
+            self._contador += 1
+            nome = f"Sessão {self._contador}"
+
+        self.sessions[nome] = TrackingSession(nome, card_jira)
+        self.foreground_name = nome
+        return self.sessions[nome]
+
+    def switch(self, nome):
+        """Troca a sessão em primeiro plano (O(1))."""
+        if nome not in self.sessions:
+            raise KeyError(nome)
+        self.foreground_name = nome
+        return self.sessions[nome]
+
+    def finish(self, nome):
+        """Remove a sessão finalizada e escolhe outra para o primeiro plano."""
+        session = self.sessions.pop(nome)
+        if self.foreground_name == nome:
+            self.foreground_name = next(reversed(self.sessions), None)
+        if not self.sessions:
+            self.create()
+        return session
+
+
+class TickScheduler:
+    """Um único temporizador no event loop que chama todos os assinantes a cada intervalo.
+
+    Fica parado enquanto não houver assinantes, então sessões não criam timers próprios.
+    Enquanto `paused()` for verdadeiro (ex.: janela escondida) os assinantes não são
+    chamados e a checagem passa a acontecer a cada `idle_interval`.
+    """
+
+    def __init__(self, interval=1.0, clock=time.time, paused=None, idle_interval=5.0):
+        self.interval = interval
+        self.clock = clock
+        self.paused = paused
+        self.idle_interval = idle_interval
+        self.subscribers = {}
+        self.loop = None
+        self.ticks = 0
+        self.paused_ticks = 0
+        self.busy_seconds = 0.0  # 🔹 Tempo gasto nos assinantes: o custo do agendador na interface
+        self._handle = None
+
+    @property
+    def running(self):
+        return self._handle is not None
+
+    def subscribe(self, key, callback):
+        self.subscribers[key] = callback
+        self._schedule()
+
+    def unsubscribe(self, key):
+        self.subscribers.pop(key, None)
+        if not self.subscribers:
+            self.stop()
+
+    def start(self, loop):
+        self.loop = loop
+        self._schedule()
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self, delay=None):
+        if self._handle is None and self.loop is not None and self.subscribers:
+            self._handle = self.loop.call_later(self.interval if delay is None else delay, self._run)
+
+    def _run(self):
+        self._handle = None
+        if self.paused is not None and self.paused():
+            self.paused_ticks += 1
+            self._schedule(self.idle_interval)
+            return
+        self.tick()
+        self._schedule()
+
+    def tick(self, now=None):
+        """Executa uma rodada de atualização em todos os assinantes."""
+        inicio = time.perf_counter()
+        now = self.clock() if now is None else now
+        for callback in list(self.subscribers.values()):
+            callback(now)
+        duracao = time.perf_counter() - inicio
+        self.ticks += 1
+        self.busy_seconds += duracao
+        instrumentacao.registrar("tick", duracao * 1000)
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "pausados": self.paused_ticks,
+            "media_ms": round(self.busy_seconds / self.ticks * 1000, 3) if self.ticks else 0.0,
+        }
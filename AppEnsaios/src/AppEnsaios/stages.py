@@ -0,0 +1,100 @@
+"""Catálogo das etapas configuradas: busca por código, filtro, recentes e importação de CSV."""
+import csv
+import io
+from collections import OrderedDict
+
+from AppEnsaios.search import normalizar
+
+MAX_ETAPAS = 999
+MAX_RECENTES = 6
+
+
+class StageImportError(ValueError):
+    """CSV de etapas com linha inválida ou código repetido."""
+
+
+def chave_etapa(posicao):
+    """Chave interna da etapa na posição (0-based), a mesma usada no settings.json."""
+    return f"Etapa {posicao + 1}"
+
+
+def etapa_padrao(posicao):
+    return {"nome": chave_etapa(posicao), "codigo": f"{posicao + 1:04}", "tempos": []}
+
+
+class StageCatalog:
+    """Índices sobre o dicionário de etapas; refeito quando as etapas mudam."""
+
+    def __init__(self, stages, recentes=()):
+        self.stages = stages
+        self.por_codigo = {}
+        self._texto_busca = {}
+        for chave, etapa in stages.items():
+            self.por_codigo.setdefault(str(etapa.get("codigo", "")).strip(), chave)
+            self._texto_busca[chave] = normalizar(f"{etapa.get('nome', '')} {etapa.get('codigo', '')}")
+        self.recentes = [chave for chave in recentes if chave in stages][:MAX_RECENTES]
+
+    def __len__(self):
+        return len(self.stages)
+
+    def by_code(self, codigo):
+        """Chave da etapa com o código (O(1)); None se não existir."""
+        return self.por_codigo.get(str(codigo).strip())
+
+    def filter(self, texto):
+        """Chaves das etapas cujo nome ou código contém o texto, na ordem configurada."""
+        alvo = normalizar(texto)
+        if not alvo:
+            return list(self.stages)
+        exata = self.by_code(texto)
+        encontradas = [chave for chave, busca in self._texto_busca.items() if alvo in busca and chave != exata]
+        # 🔹 Código digitado por inteiro vem primeiro
+        return ([exata] if exata is not None else []) + encontradas
+
+    def mark_used(self, chave):
+        """Move a etapa para o início da lista de recentes; retorna se a lista mudou."""
+        if chave not in self.stages or self.recentes[:1] == [chave]:
+            return False
+        if chave in self.recentes:
+            self.recentes.remove(chave)
+        self.recentes.insert(0, chave)
+        del self.recentes[MAX_RECENTES:]
+        return True
+
+
+def pagina(itens, inicio, tamanho):
+    """Fatia visível da lista e o início ajustado para ficar dentro dos limites."""
+    if not itens:
+        return [], 0
+    inicio = max(0, min(inicio, (len(itens) - 1) // tamanho * tamanho))
+    return itens[inicio:inicio + tamanho], inicio
+
+
+def ler_csv(texto):
+    """Converte um CSV "nome,codigo" (cabeçalho opcional; vírgula ou ponto e vírgula) em etapas."""
+    try:
+        dialeto = csv.Sniffer().sniff(texto[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+
+    stages = OrderedDict()
+    codigos = {}
+    for numero, linha in enumerate(csv.reader(io.StringIO(texto), dialeto), 1):
+        linha = [campo.strip() for campo in linha]
+        if not any(linha):
+            continue
+        if len(linha) < 2 or not linha[0] or not linha[1]:
+            raise StageImportError(f"Linha {numero}: esperado nome e código")
+        nome, codigo = linha[0], linha[1]
+        if not stages and normalizar(nome) in ("nome", "etapa") and normalizar(codigo) in ("codigo", "code"):
+            continue  # 🔹 Cabeçalho
+        if codigo in codigos:
+            raise StageImportError(f"Linha {numero}: código {codigo} repetido (linha {codigos[codigo]})")
+        if len(stages) >= MAX_ETAPAS:
+            raise StageImportError(f"Mais de {MAX_ETAPAS} etapas")
+        codigos[codigo] = numero
+        stages[chave_etapa(len(stages))] = {"nome": nome, "codigo": codigo, "tempos": []}
+
+    if not stages:
+        raise StageImportError("Nenhuma etapa encontrada")
+    return dict(stages)
@@ -0,0 +1,294 @@
+"""Sincronização opcional das sessões com um servidor central.
+
+As sessões finalizadas e as edições entram em uma fila durável em disco
+(sync_outbox.jsonl) e uma thread em segundo plano as envia em lotes por uma
+conexão HTTP persistente, com novas tentativas em espera exponencial. O servidor
+deve tratar o `token` de cada sessão como chave de idempotência: reenviar a
+mesma sessão apenas a substitui.
+
+A interface só coloca a entrada em uma fila em memória (`SyncWorker.submit`);
+a gravação em disco, com fsync, é feita pela thread. A fila em disco só recebe
+acréscimos: as confirmações de envio são linhas {"ack": {token: seq}}, e ela é
+esvaziada quando tudo o que foi lido está confirmado e nada chegou depois.
+Vários processos podem usar a mesma fila: acréscimos e o esvaziamento seguram
+um lock exclusivo (fcntl) em "<fila>.lock", como o arquivo de logs; a leitura
+não pega o lock.
+"""
+import collections
+import contextlib
+import http.client
+import json
+import os
+import random
+import threading
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # 🔹 Windows: sem lock entre processos
+    fcntl = None
+
+TAMANHO_LOTE = 50
+ESPERA_INICIAL = 1.0
+ESPERA_MAXIMA = 300.0
+
+
+class SyncError(Exception):
+    """Falha ao enviar um lote ao servidor."""
+
+
+class Outbox:
+    """Fila durável (JSON Lines) de sessões aguardando envio."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._tamanho = None  # 🔹 Tamanho da fila após a última operação desta instância
+        self._lido = None  # 🔹 (tamanho, mtime) da fila na última leitura de `pending`
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Lock entre as threads desta instância e entre processos."""
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def _estado(self):
+        try:
+            info = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return info.st_size, info.st_mtime_ns
+
+    def _next_seq(self):
+        if self._size() != self._tamanho:
+            # 🔹 Outra instância mexeu na fila: continua depois do maior número gravado
+            linhas, _ = self._read()
+            for linha in linhas:
+                self._seq = max([self._seq, linha.get("seq", 0)] + list(linha.get("ack", {}).values()))
+        self._seq += 1
+        return self._seq
+
+    def enqueue(self, tipo, registro):
+        """Acrescenta uma entrada ao fim da fila (só um append, sem esperar a rede)."""
+        with self._locked():
+            entry = {"seq": self._next_seq(), "tipo": tipo, "token": registro["token"], "registro": registro}
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._tamanho = self._size()
+            return entry
+
+    def _read(self):
+        """Linhas da fila e o (tamanho, mtime) do que foi lido (None se a fila cresceu durante a leitura)."""
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return [], None
+        with f:
+            dados = f.read()
+            info = os.fstat(f.fileno())
+        linhas = []
+        for linha in dados.splitlines():
+            try:
+                linhas.append(json.loads(linha))
+            except ValueError:
+                continue  # 🔹 Linha cortada por queda do app: ignorada
+        return linhas, (info.st_size, info.st_mtime_ns) if info.st_size == len(dados) else None
+
+    def pending(self):
+        """Entradas a enviar, uma por token (a mais recente), na ordem em que foram enfileiradas."""
+        linhas, self._lido = self._read()
+        ultimas, enviados = {}, {}
+        for linha in linhas:
+            if "ack" in linha:
+                for token, seq in linha["ack"].items():
+                    enviados[token] = max(seq, enviados.get(token, 0))
+                continue
+            ultimas.pop(linha["token"], None)
+            ultimas[linha["token"]] = linha
+        return [entry for entry in ultimas.values() if entry["seq"] > enviados.get(entry["token"], 0)]
+
+    def __len__(self):
+        return len(self.pending())
+
+    def ack(self, entries, esvaziar=False):
+        """Confirma as entradas enviadas (e as versões anteriores do mesmo token) com uma linha na fila.
+
+        Com `esvaziar`, `entries` fecha o que a última chamada a `pending` leu:
+        se a fila não mudou desde então, ela é esvaziada em vez de crescer.
+        """
+        enviados = {}
+        for entry in entries:
+            enviados[entry["token"]] = max(entry["seq"], enviados.get(entry["token"], 0))
+
+        with self._locked():
+            inalterada = self._lido is not None and self._estado() == self._lido
+            if esvaziar and inalterada:
+                os.truncate(self.path, 0)
+            else:
+                # 🔹 Sem fsync: uma confirmação perdida só reenvia o lote, que o servidor substitui
+                with open(self.path, "a") as f:
+                    f.write(json.dumps({"ack": enviados}) + "\n")
+            self._tamanho = self._size()
+            # 🔹 Se só esta instância mexeu na fila desde a leitura, o retrato continua valendo
+            self._lido = self._estado() if inalterada else None
+
+
+class SyncClient:
+    """Envia lotes por POST reaproveitando a mesma conexão (keep-alive)."""
+
+    def __init__(self, url, timeout=10.0):
+        self.url = url
+        self.timeout = timeout
+        partes = urlsplit(url)
+        self._https = partes.scheme == "https"
+        self._host = partes.hostname
+        self._port = partes.port
+        self._path = partes.path or "/"
+        if partes.query:
+            self._path += "?" + partes.query
+        self._conn = None
+        self.connections_opened = 0
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            self._conn = cls(self._host, self._port, timeout=self.timeout)
+            self.connections_opened += 1
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def send_batch(self, entries):
+        """Envia um lote; qualquer resposta fora de 2xx vira SyncError."""
+        corpo = json.dumps({
+            "sessoes": [{"tipo": entry["tipo"], "token": entry["token"], "registro": entry["registro"]}
+                        for entry in entries]
+        }).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "Connection": "keep-alive",
+            "Idempotency-Key": ",".join(f"{entry['token']}:{entry['seq']}" for entry in entries),
+        }
+
+        try:
+            conn = self._connection()
+            conn.request("POST", self._path, body=corpo, headers=headers)
+            resposta = conn.getresponse()
+            resposta.read()  # 🔹 Esvazia a resposta para poder reaproveitar a conexão
+        except (OSError, http.client.HTTPException) as exc:
+            self.close()
+            raise SyncError(str(exc)) from exc
+
+        if resposta.will_close:
+            self.close()
+        if not 200 <= resposta.status < 300:
+            raise SyncError(f"HTTP {resposta.status}")
+
+
+class SyncWorker:
+    """Thread em segundo plano que esvazia a fila em lotes, com espera exponencial em caso de falha."""
+
+    def __init__(self, outbox, client, batch_size=TAMANHO_LOTE,
+                 initial_backoff=ESPERA_INICIAL, max_backoff=ESPERA_MAXIMA):
+        self.outbox = outbox
+        self.client = client
+        self.batch_size = batch_size
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.sent = 0
+        self.last_error = None
+        self._fila = collections.deque()  # 🔹 Entradas recebidas pela interface, ainda não gravadas
+        self._pendentes_lidos = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="AppEnsaios-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # 🔹 O que ainda estava só em memória vai para a fila em disco e é enviado na próxima abertura
+        with contextlib.suppress(OSError):
+            self._drain()
+        self.client.close()
+
+    def notify(self):
+        """Acorda a thread após um novo item na fila."""
+        self._wake.set()
+
+    def submit(self, tipo, registro):
+        """Entrega a entrada à thread, que a grava na fila em disco; não toca no disco nem espera lock."""
+        self._fila.append((tipo, registro))
+        self.notify()
+
+    @property
+    def pending_count(self):
+        """Entradas aguardando envio, sem ler a fila: as da última leitura mais as ainda em memória."""
+        return self._pendentes_lidos + len(self._fila)
+
+    def _drain(self):
+        while self._fila:
+            tipo, registro = self._fila[0]
+            self.outbox.enqueue(tipo, registro)
+            self._fila.popleft()  # 🔹 Só sai da memória depois de gravada
+            self._pendentes_lidos += 1
+
+    def backoff(self):
+        espera = min(self.max_backoff, self.initial_backoff * (2 ** (self.failures - 1)))
+        return espera * random.uniform(0.5, 1.0)
+
+    def flush(self):
+        """Envia tudo o que estiver na fila; retorna False na primeira falha, da rede ou do disco."""
+        try:
+            self._drain()
+            # 🔹 Uma leitura por chamada; os lotes são fatias dela
+            pendentes = self.outbox.pending()
+            self._pendentes_lidos = len(pendentes)
+            for inicio in range(0, len(pendentes), self.batch_size):
+                lote = pendentes[inicio:inicio + self.batch_size]
+                self.client.send_batch(lote)
+                self.outbox.ack(lote, esvaziar=inicio + self.batch_size >= len(pendentes))
+                self.sent += len(lote)
+                self._pendentes_lidos -= len(lote)
+                self.failures = 0
+                self.last_error = None
+        except (SyncError, OSError) as exc:
+            self.failures += 1
+            self.last_error = str(exc)
+            return False
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            if self.flush():
+                self._wake.wait()
+            else:
+                self._stop.wait(self.backoff())
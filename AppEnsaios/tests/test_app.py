@@ -1,3 +1,361 @@
+"""Fluxos da interface no backend dummy do Toga: tempo, widgets criados e bytes lidos/gravados.
+
+Cada fluxo roda com históricos de tamanhos diferentes; o que não deve crescer
+com o histórico (widgets da busca, bytes lidos ao abrir uma sessão, bytes
+gravados ao finalizar) é comparado entre os tamanhos.
+"""
+import collections
+import json
+import os
+import time
+
+import pytest
+
+pytest.importorskip("toga_dummy")
+os.environ["TOGA_BACKEND"] = "toga_dummy"
+
+import toga  # noqa: E402
+
+from AppEnsaios.app import SEARCH_PAGE_SIZE, TimeTrackerApp  # noqa: E402
+from AppEnsaios.instrumentation import instrumentacao  # noqa: E402
+from AppEnsaios.log_store import LogStore, resumir_sessao  # noqa: E402
+
+HISTORICOS = (50, 1000, 4000)
+
+
 def test_first():
     """An initial test for the app."""
     assert 1 + 1 == 2
+
+
+def make_log(i):
+    etapas = [
+        {"etapa": f"Etapa {n + 1}", "codigo": f"{n + 1:04}", "inicio": "10:00:00", "fim": "10:01:00", "tempo": 60}
+        for n in range(3)
+    ]
+    return {
+        "token": f"tok{i:05}",
+        "data_finalizacao": f"{i % 28 + 1:02}/03/2025 10:00:00",
+        "card_jira": f"ABC-{i}",
+        "etapas": etapas,
+        "resumo": resumir_sessao(etapas),
+    }
+
+
+@pytest.fixture
+def medidor(monkeypatch):
+    """Conta os widgets criados e liga a instrumentação, que soma os bytes de cada operação."""
+    criados = collections.Counter()
+    init = toga.Widget.__init__
+
+    def contar(self, *args, **kwargs):
+        criados[type(self).__name__] += 1
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(toga.Widget, "__init__", contar)
+    monkeypatch.setattr(instrumentacao, "enabled", True)
+    monkeypatch.setattr(instrumentacao, "operacoes", {})
+    return criados
+
+
+@pytest.fixture
+def abrir_app(tmp_path, monkeypatch):
+    """Cria o app numa pasta de dados própria, já com `historico` sessões salvas."""
+
+    def abrir(historico, settings={"num_buttons": 4, "stages": {}}):
+        pasta = tmp_path / str(historico)
+        os.makedirs(pasta / "logs")
+        if settings is not None:
+            (pasta / "logs" / "settings.json").write_text(json.dumps(settings))
+        if historico:
+            LogStore(str(pasta / "logs" / "tracking_logs.json")).write_all([make_log(i) for i in range(historico)])
+
+        monkeypatch.setattr(toga.paths.Paths, "data", property(lambda self: pasta))
+        app = TimeTrackerApp("Time Tracker", "com.viniciustorres.timetracker")
+        app.main_window._impl.dialog_responses = {"InfoDialog": [None] * 10}
+        app.loop.run_until_complete(app.integrity_task)
+        return app
+
+    return abrir
+
+
+def io(operacao):
+    estatistica = instrumentacao.operacoes.get(operacao)
+    return (estatistica.bytes_lidos, estatistica.bytes_escritos) if estatistica else (0, 0)
+
+
+def total(criados):
+    return sum(criados.values())
+
+
+def test_primeira_execucao(abrir_app):
+    app = abrir_app(0, settings=None)
+
+    with open(app.settings_file) as f:
+        settings = json.load(f)
+    assert settings["num_buttons"] == 8
+    assert list(app.buttons) == [f"Etapa {i}" for i in range(1, 9)]
+    assert LogStore(app.log_file).read_all() == []
+
+
+def test_abertura(abrir_app, medidor):
+    widgets = set()
+    for historico in HISTORICOS:
+        medidor.clear()
+        inicio = time.perf_counter()
+        app = abrir_app(historico)
+
+        assert time.perf_counter() - inicio < 2
+        widgets.add(total(medidor))
+        # 🔹 O arquivo foi gravado por write_all: a verificação da abertura não relê nada
+        assert app.last_integrity["verificados"] == 0
+        assert app.last_integrity["inicio"] == os.path.getsize(app.log_file)
+
+    assert len(widgets) == 1
+
+
+def test_etapas_e_finalizacao(abrir_app, medidor):
+    gravados = set()
+    for historico in HISTORICOS:
+        app = abrir_app(historico)
+        medidor.clear()
+
+        inicio = time.perf_counter()
+        for i in range(40):
+            app.buttons[f"Etapa {i % 4 + 1}"].on_press()
+        assert time.perf_counter() - inicio < 1
+        # 🔹 Trocar de etapa só muda estilos e textos: nenhum widget novo
+        assert total(medidor) == 0
+        assert io("handle_stage") == (0, 0)
+
+        app.jira_input.value = "ABC-NOVO"
+        inicio = time.perf_counter()
+        app.finish_button.on_press()
+        assert time.perf_counter() - inicio < 0.5
+
+        # 🔹 A sessão é acrescentada ao fim do arquivo, sem reler nem regravar o histórico
+        lidos, escritos = io("save_log")
+        assert lidos == 0
+        gravados.add(escritos)
+        assert LogStore(app.log_file).read_all()[-1]["card_jira"] == "ABC-NOVO"
+        instrumentacao.operacoes.clear()
+
+    assert max(gravados) - min(gravados) < 64
+    assert max(gravados) < 8 * 1024
+
+
+def test_seletor_de_etapas(abrir_app, medidor):
+    app = abrir_app(50, settings={"num_buttons": 100, "stages": {}})
+    app.buttons["Etapa 1"].on_press()
+    app.buttons["Etapa 2"].on_press()
+    assert list(app.recent_buttons) == ["Etapa 2", "Etapa 1"]
+
+    # 🔹 Repetir a etapa mais recente só troca o destaque: os botões de recentes não são remontados
+    medidor.clear()
+    app.recent_buttons["Etapa 2"].on_press()
+    assert total(medidor) == 0
+    assert app.recent_buttons["Etapa 2"].style.background_color is not None
+
+    app.recent_buttons["Etapa 1"].on_press()
+    assert list(app.recent_buttons) == ["Etapa 1", "Etapa 2"]
+    assert total(medidor) == 2
+
+
+def test_consulta_e_edicao(abrir_app, medidor):
+    widgets_tela, widgets_busca, widgets_detalhes, lidos_detalhes = set(), {}, set(), set()
+    for historico in HISTORICOS:
+        app = abrir_app(historico)
+        tamanho = os.path.getsize(app.log_file)
+        medidor.clear()
+
+        inicio = time.perf_counter()
+        app.view_logs(None)
+        assert time.perf_counter() - inicio < 1
+        widgets_tela.add(total(medidor))
+        assert io("view_logs")[0] <= tamanho
+
+        medidor.clear()
+        inicio = time.perf_counter()
+        app.search_input.value = "ABC"
+        app.search_logs(None)
+        app.loop.run_until_complete(app.search_task)
+        assert time.perf_counter() - inicio < 2
+        # 🔹 Só a primeira página vira widget, qualquer que seja o número de resultados
+        exibidos = min(historico, SEARCH_PAGE_SIZE)
+        assert len(app.results_box.children) == exibidos + (historico > SEARCH_PAGE_SIZE)
+        widgets_busca[historico] = total(medidor)
+
+        medidor.clear()
+        log_box = app.results_box.children[0]
+        inicio = time.perf_counter()
+        log_box.children[0].on_press()
+        assert time.perf_counter() - inicio < 0.5
+        widgets_detalhes.add(total(medidor))
+        # 🔹 Abrir uma sessão lê só os bytes dela
+        lidos_detalhes.add(io("display_log_details")[0])
+
+        editar = next(child for child in log_box.details.children if getattr(child, "text", None) == "Editar")
+        editar.on_press()
+        app.edit_inputs[0]["fim"].value = "10:02:00"
+        inicio = time.perf_counter()
+        app.save_edited_log(None)
+        assert time.perf_counter() - inicio < 2
+
+        # 🔹 A edição regrava o arquivo uma vez: leitura e escrita da ordem do tamanho do histórico
+        lidos, escritos = io("save_edited_log")
+        assert lidos <= tamanho * 1.1
+        assert escritos <= tamanho * 1.1
+        assert LogStore(app.log_file).read_all()[0]["etapas"][0]["tempo"] == 120
+        assert app.history.size() < 1024
+        instrumentacao.operacoes.clear()
+
+    assert len(widgets_tela) == 1
+    assert len(widgets_detalhes) == 1
+    assert len(lidos_detalhes) == 1
+    assert widgets_busca[1000] == widgets_busca[4000] <= 4 * (SEARCH_PAGE_SIZE + 1)
+    assert widgets_busca[50] < widgets_busca[1000]
+
+
+def test_historico_de_edicoes(abrir_app, monkeypatch):
+    app = abrir_app(10)
+    app.view_logs(None)
+    app.search_input.value = "ABC"
+    app.search_logs(None)
+    app.loop.run_until_complete(app.search_task)
+    log_box = app.results_box.children[0]
+    log_box.children[0].on_press()
+    details = log_box.details
+
+    editar = next(child for child in details.children if getattr(child, "text", None) == "Editar")
+    editar.on_press()
+    app.edit_inputs[0]["fim"].value = "10:02:00"
+    write_all = app.store.write_all
+
+    def falha(logs):
+        raise OSError("disco cheio")
+
+    # 🔹 Gravação que falha não deixa versão no histórico
+    monkeypatch.setattr(app.store, "write_all", falha)
+    with pytest.raises(OSError):
+        app.save_edited_log(None)
+    assert app.history.size() == 0
+
+    monkeypatch.setattr(app.store, "write_all", write_all)
+    token = app.current_token
+    app.save_edited_log(None)
+    assert len(app.history.entries(token)) == 1
+
+    historico = next(child for child in details.children if getattr(child, "text", None) == "Histórico")
+    historico.on_press()
+    versao_original = details.history_box.children[-1]
+    restaurar = next(child for child in versao_original.children[0].children if child.text == "Restaurar")
+    restaurar.on_press()
+
+    # 🔹 O painel aberto foi remontado a partir da sessão restaurada
+    linhas = [box.children[0].children[0].text for box in details.history_box.children]
+    assert [linha.split(" | ")[0] for linha in linhas] == ["Versão 2 (atual)", "Versão 1", "Versão 0"]
+    assert LogStore(app.log_file).read_all()[0]["etapas"][0]["tempo"] == 60
+
+
+def test_apagar_logs(abrir_app):
+    app = abrir_app(1000)
+    app.main_window._impl.dialog_responses = {"InfoDialog": [None] * 10, "ConfirmDialog": [True]}
+    app.view_logs(None)
+    app.search_input.value = "ABC"
+    app.search_logs(None)
+    app.loop.run_until_complete(app.search_task)
+    assert app.results_box.children
+
+    app.loop.run_until_complete(app.clear_logs(None))
+
+    assert app.results_box.children == []
+    assert LogStore(app.log_file).read_all() == []
+    assert app.history.size() == 0
+
+
+def test_tempo_ao_vivo(abrir_app):
+    app = abrir_app(10)
+    botao = app.buttons["Etapa 1"]
+    botao.on_press()
+    inicio = app.sessions.foreground.start_time
+    assert app.scheduler.running
+
+    # 🔹 Quatro ticks por segundo: só quando o segundo exibido muda há texto para regravar
+    atualizados = [app.scheduler.subscribers["session_status"](inicio + i / 4) for i in range(1, 41)]
+    assert sum(atualizados) == 2 * 10
+    assert botao.text == "Etapa 1 · 00:00:10"
+    assert app.buttons["Etapa 2"].text == "Etapa 2"
+
+    app.buttons["Etapa 2"].on_press()
+    assert botao.text.startswith("Etapa 1 · 00:00:")  # 🔹 A etapa encerrada mostra o total acumulado
+
+    inicio = time.perf_counter()
+    for _ in range(200):
+        app.scheduler.tick()
+    assert (time.perf_counter() - inicio) / 200 < 0.005
+
+    app.main_window.hide()
+    ticks = app.scheduler.ticks
+    app.scheduler.stop()
+    app.scheduler._run()
+    assert app.scheduler.ticks == ticks
+    assert app.scheduler.paused_ticks == 1
+
+
+def test_busca_repetida_e_refinada(abrir_app):
+    app = abrir_app(1000)
+    app.view_logs(None)
+
+    def buscar(texto):
+        app.search_input.value = texto
+        app.search_logs(None)
+        app.loop.run_until_complete(app.search_task)
+        return list(app.results_box.children)
+
+    linhas = buscar("ABC-1")
+    # 🔹 A mesma busca de novo não refaz a varredura nem os widgets
+    assert buscar("ABC-1") == linhas
+    assert app.search_cache.stats()["falhas"] == 1
+
+    # 🔹 "ABC-12" estende "ABC-1": filtra os resultados em cache
+    assert len(buscar("ABC-12")) == 11
+    assert app.search_cache.stats()["refinamentos"] == 1
+
+    # 🔹 Depois de uma edição o arquivo muda de geração e a busca é refeita
+    linhas = buscar("ABC-12")
+    linhas[0].children[0].on_press()
+    next(c for c in linhas[0].details.children if getattr(c, "text", None) == "Editar").on_press()
+    app.edit_inputs[0]["fim"].value = "10:05:00"
+    app.save_edited_log(None)
+    nova = buscar("ABC-12")
+    assert nova != linhas
+    assert "00:07:00" in nova[0].children[0].text
+
+
+def test_backup_e_restauracao(abrir_app):
+    app = abrir_app(4000)
+    app.main_window._impl.dialog_responses = {"InfoDialog": [None] * 10, "ConfirmDialog": [True]}
+    app.open_settings(None)
+    app.loop.run_until_complete(app.create_backup())
+    original = open(app.log_file, "rb").read()
+
+    app.jira_input.value = "ABC-NOVO"
+    app.buttons["Etapa 1"].on_press()
+    app.finish_button.on_press()
+    # 🔹 Depois de uma sessão nova, o backup grava só o fim do arquivo de logs
+    app.loop.run_until_complete(app.create_backup())
+    assert app.last_backup["bytes_gravados"] < 8 * 1024
+    assert app.last_backup["duracao_ms"] < 100
+
+    app.view_logs(None)
+    app.open_settings(None)
+    app.backup_select.value = app.backup_select.items[-1]
+    app.loop.run_until_complete(app.restore_backup())
+
+    assert open(app.log_file, "rb").read() == original
+    assert app.logs == []
+    app.view_logs(None)
+    assert len(app.logs) == 4000
+    # 🔹 O estado substituído virou o backup mais recente
+    snapshots = app.backup_manager().snapshots()
+    assert snapshots[0]["motivo"] == "antes de restaurar " + snapshots[-1]["id"]
@@ -0,0 +1,169 @@
+import json
+import os
+import time
+
+import pytest
+
+from AppEnsaios.backup import Backup, BackupError, dividir
+from AppEnsaios.history import EditHistory
+from AppEnsaios.log_store import LogStore, resumir_sessao
+
+
+def make_log(i):
+    etapas = [
+        {"etapa": f"Etapa {n + 1}", "codigo": f"{n + 1:04}", "inicio": "10:00:00", "fim": "10:01:00", "tempo": 60}
+        for n in range(3)
+    ]
+    return {
+        "token": f"tok{i:05}",
+        "data_finalizacao": f"{i % 28 + 1:02}/03/2025 10:00:00",
+        "card_jira": f"ABC-{i}",
+        "etapas": etapas,
+        "resumo": resumir_sessao(etapas),
+    }
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    """Pasta de logs com 4000 sessões e as configurações."""
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    LogStore(str(logs / "tracking_logs.json")).write_all([make_log(i) for i in range(4000)])
+    (logs / "settings.json").write_text(json.dumps({"num_buttons": 4, "stages": {}}))
+    return logs
+
+
+def abrir(pasta, **kwargs):
+    store = LogStore(str(pasta / "tracking_logs.json"))
+    return store, Backup(str(pasta), str(pasta.parent / "backups"), store=store, **kwargs)
+
+
+def test_dividir():
+    linhas = [f"linha {i}\n".encode() for i in range(3000)]
+    partes = dividir(b"".join(linhas))
+    assert b"".join(partes) == b"".join(linhas)
+    assert all(parte.endswith(b"\n") for parte in partes)
+
+    # 🔹 Uma linha inserida no meio só muda a parte em que caiu
+    alteradas = dividir(b"".join(linhas[:1500] + [b"nova\n"] + linhas[1500:]))
+    assert len(set(alteradas) - set(partes)) == 1
+    assert dividir(b"x" * 600_000) == [b"x" * 262144, b"x" * 262144, b"x" * 75712]
+
+
+def test_backup_incremental(pasta):
+    store, backup = abrir(pasta)
+    completo = backup.create()
+    assert completo["bytes_lidos"] > os.path.getsize(store.path)
+
+    store.append(make_log(99999))
+    EditHistory(store.path + ".history.jsonl").record("tok00001", [], make_log(1)["etapas"])
+    inicio = time.perf_counter()
+    incremental = backup.create()
+
+    # 🔹 Só o fim do arquivo de logs é lido; as configurações nem são abertas
+    assert time.perf_counter() - inicio < 0.1
+    assert incremental["bytes_lidos"] < 256 * 1024
+    assert incremental["bytes_gravados"] < 8 * 1024
+    assert incremental["arquivos"]["settings.json"] == completo["arquivos"]["settings.json"]
+    assert backup.create()["objetos_novos"] == 0
+
+    # 🔹 Regravar o arquivo para editar uma sessão muda só as partes vizinhas
+    store.update(lambda logs: logs[2000]["etapas"][0].update(tempo=5))
+    assert backup.create()["bytes_gravados"] < 8 * 1024
+    assert [snapshot["id"] for snapshot in backup.snapshots()] == backup.ids()
+    assert all(backup.verify(snapshot_id) == [] for snapshot_id in backup.ids())
+
+
+@pytest.mark.parametrize("compactar", [True, False])
+def test_restauracao(pasta, compactar):
+    store, backup = abrir(pasta, compactar=compactar)
+    originais = {nome: (pasta / nome).read_bytes() for nome in ("tracking_logs.json", "settings.json")}
+    snapshot = backup.create()["id"]
+
+    store.update(lambda logs: logs.pop())
+    (pasta / "settings.json").write_text("{}")
+    (pasta / "sync_outbox.jsonl").write_text("{}\n")
+    geracao = store.generation()
+
+    relatorio = backup.restore(snapshot)
+
+    assert {nome: (pasta / nome).read_bytes() for nome in originais} == originais
+    assert relatorio["removidos"] == ["sync_outbox.jsonl"]
+    assert store.generation() > geracao
+    assert store.verify()["verificados"] == 4000
+    # 🔹 O estado substituído ficou em um snapshot próprio
+    backup.restore(relatorio["anterior"])
+    assert (pasta / "settings.json").read_text() == "{}"
+
+
+def test_regravacao_no_mesmo_lugar(pasta, monkeypatch):
+    store, backup = abrir(pasta)
+    backup.create()
+
+    # 🔹 Mesmo inode e mesmo tamanho, conteúdo diferente no começo do arquivo
+    with open(store.path, "r+b") as f:
+        dados = f.read()
+        f.seek(dados.index(b'"ABC-10"') + 1)
+        f.write(b"XYZ")
+    editado = (pasta / "tracking_logs.json").read_bytes()
+    snapshot = backup.create()["id"]
+
+    # 🔹 Regravação pelo LogStore que reaproveita o inode, seguida de um acréscimo
+    replace_file = LogStore._replace_file
+
+    def no_mesmo_inode(self, path, conteudo):
+        if path != self.path:
+            return replace_file(self, path, conteudo)
+        with open(path, "r+b") as f:
+            f.write(conteudo)
+            f.truncate()
+
+    monkeypatch.setattr(LogStore, "_replace_file", no_mesmo_inode)
+    store.update(lambda logs: logs[5]["etapas"][0].update(tempo=61))
+    store.append(make_log(99999))
+    regravado = (pasta / "tracking_logs.json").read_bytes()
+    segundo = backup.create()["id"]
+    monkeypatch.undo()
+
+    backup.restore(snapshot)
+    assert (pasta / "tracking_logs.json").read_bytes() == editado
+    backup.restore(segundo)
+    assert (pasta / "tracking_logs.json").read_bytes() == regravado
+
+
+def test_restauracao_confere_as_partes(pasta):
+    store, backup = abrir(pasta)
+    snapshot = backup.create()
+    digest = backup._load_parts(snapshot["arquivos"]["tracking_logs.json"]["blocos"])[7][0]
+    objeto = backup._object_path(digest)
+    with open(objeto, "r+b") as f:
+        f.seek(40)
+        f.write(b"\x00\x00")
+
+    problemas = backup.verify(snapshot["id"])
+    assert len(problemas) == 1
+    assert problemas[0].startswith(f"tracking_logs.json: parte {digest[:12]}")
+
+    store.update(lambda logs: logs.pop())
+    atual = (pasta / "tracking_logs.json").read_bytes()
+    with pytest.raises(BackupError):
+        backup.restore(snapshot["id"])
+    # 🔹 Nada foi alterado nem guardado
+    assert (pasta / "tracking_logs.json").read_bytes() == atual
+    assert len(backup.ids()) == 1
+
+    with pytest.raises(BackupError):
+        backup.restore("inexistente")
+
+
+def test_prune(pasta):
+    store, backup = abrir(pasta)
+    backup.create()
+    store.update(lambda logs: logs.reverse())
+    backup.create()
+    objetos = sum(len(nomes) for _, _, nomes in os.walk(backup.objetos_dir))
+
+    assert backup.prune(1) == 1
+    assert len(backup.ids()) == 1
+    assert sum(len(nomes) for _, _, nomes in os.walk(backup.objetos_dir)) < objetos
+    assert backup.verify(backup.ids()[0]) == []
@@ -0,0 +1,121 @@
+import time
+
+import pytest
+
+from AppEnsaios.binary_format import (
+    BinaryLogReader, FormatoInvalido, benchmark, binario_para_json, escrever, json_para_binario, ler,
+)
+from AppEnsaios.log_store import LogStore
+
+
+def make_log(i):
+    return {
+        "token": f"{i:032x}",
+        "data_finalizacao": f"{i % 28 + 1:02}/03/2025 10:00:00",
+        "card_jira": f"ABC-{i % 100}",
+        "etapas": [
+            {"etapa": "Etapa 1", "codigo": "0001", "inicio": "10:00:00", "fim": "10:10:00", "tempo": 600.0},
+            {"etapa": "Revisão", "codigo": f"{i % 5:04}", "inicio": "10:10:00", "fim": "23:59:59", "tempo": 1.5 * i},
+        ],
+    }
+
+
+def test_ida_e_volta_sem_perdas(tmp_path):
+    logs = [make_log(i) for i in range(50)]
+    logs[1]["etapas"][0]["inicio"] = "9:5"  # 🔹 Horário fora do padrão
+    logs[2]["etapas"][1]["fim"] = None
+    logs[3]["etapas"] = []
+    logs[4]["resumo"] = {"tempo_total": 10}
+    logs[5]["etapas"][0]["obs"] = "ação"
+    # 🔹 Campos de texto ausentes ou de outro tipo voltam como eram
+    logs[6]["card_jira"] = None
+    del logs[7]["data_finalizacao"], logs[7]["card_jira"]
+    logs[8]["token"] = 8
+    logs[9]["etapas"][0]["codigo"] = 3
+    del logs[10]["etapas"][1]["codigo"], logs[10]["etapas"][1]["inicio"]
+    logs[11]["etapas"][0]["etapa"] = None
+    logs[12]["card_jira"] = ""
+
+    json_path = tmp_path / "logs.json"
+    LogStore(str(json_path)).write_all(logs)
+
+    assert json_para_binario(str(json_path), str(tmp_path / "logs.aeb")) == 50
+    assert ler(str(tmp_path / "logs.aeb")) == logs
+
+    assert binario_para_json(str(tmp_path / "logs.aeb"), str(tmp_path / "volta.json")) == 50
+    assert LogStore(str(tmp_path / "volta.json")).read_all() == logs
+
+    lidos = ler(str(tmp_path / "logs.aeb"))
+    assert lidos[6]["card_jira"] is None
+    assert "data_finalizacao" not in lidos[7] and "card_jira" not in lidos[7]
+    assert lidos[8]["token"] == 8 and lidos[9]["etapas"][0]["codigo"] == 3
+    assert "codigo" not in lidos[10]["etapas"][1] and "inicio" not in lidos[10]["etapas"][1]
+    with BinaryLogReader(str(tmp_path / "logs.aeb")) as leitor:
+        resumos = leitor.summaries()
+        assert resumos[6]["card_jira"] is None and resumos[7]["card_jira"] == "" and resumos[8]["token"] == 8
+        assert leitor.sessoes_com_codigo(3) == [9]
+        assert leitor.sessoes_com_codigo("3") == []
+        assert leitor.tempo_por_codigo()[3] == logs[9]["etapas"][0]["tempo"]
+
+
+def test_tempo_mantem_o_tipo(tmp_path):
+    logs = [make_log(i) for i in range(5)]
+    logs[0]["etapas"][0]["tempo"] = 600
+    logs[1]["etapas"][0]["tempo"] = 0
+    logs[2]["etapas"][0]["tempo"] = None
+    logs[3]["etapas"][0]["tempo"] = "60"
+    del logs[4]["etapas"][0]["tempo"]
+    escrever(logs, str(tmp_path / "logs.aeb"))
+
+    lidos = ler(str(tmp_path / "logs.aeb"))
+
+    assert lidos == logs
+    assert [type(log["etapas"][0].get("tempo")) for log in lidos] == [int, int, type(None), str, type(None)]
+    assert type(lidos[0]["etapas"][1]["tempo"]) is float
+
+
+def test_varreduras_por_coluna(tmp_path):
+    logs = [make_log(i) for i in range(40)]
+    logs[10]["etapas"] = []
+    escrever(logs, str(tmp_path / "logs.aeb"))
+
+    with BinaryLogReader(str(tmp_path / "logs.aeb")) as leitor:
+        assert len(leitor) == 40
+        assert leitor.summaries()[7]["card_jira"] == "ABC-7"
+        assert leitor.session(11) == logs[11]
+        assert leitor.sessoes_com_codigo("0003") == [i for i in range(40) if i % 5 == 3 and i != 10]
+        assert leitor.sessoes_com_codigo("9999") == []
+        esperado = {}
+        for log in logs:
+            for etapa in log["etapas"]:
+                esperado[etapa["codigo"]] = esperado.get(etapa["codigo"], 0.0) + etapa["tempo"]
+        assert leitor.tempo_por_codigo() == esperado
+        # 🔹 A coluna de tempos é uma view sobre o arquivo mapeado, sem cópia, criada uma única vez
+        assert isinstance(leitor.coluna("intervalo.tempo"), memoryview)
+        assert leitor.coluna("intervalo.tempo") is leitor.coluna("intervalo.tempo")
+        for posicao in range(40):
+            leitor.session(posicao)
+        assert len(leitor._colunas) <= 15
+
+
+def test_arquivo_invalido(tmp_path):
+    (tmp_path / "vazio.aeb").write_bytes(b"")
+    (tmp_path / "json.aeb").write_text("[]")
+    for nome in ("vazio.aeb", "json.aeb"):
+        with pytest.raises(FormatoInvalido):
+            BinaryLogReader(str(tmp_path / nome))
+
+
+def test_benchmark_binario_contra_json(tmp_path):
+    """A varredura por código lê só duas colunas do binário; o JSON decodifica tudo."""
+    json_path, binario_path = str(tmp_path / "logs.json"), str(tmp_path / "logs.aeb")
+    LogStore(json_path).write_all([make_log(i) for i in range(5000)])
+    json_para_binario(json_path, binario_path)
+
+    inicio = time.perf_counter()
+    resultado = benchmark(json_path, binario_path, codigo="0003")
+    assert time.perf_counter() - inicio < 30
+
+    assert resultado["mesmo_resultado"]
+    assert resultado["bytes_binario"] * 2 < resultado["bytes_json"]
+    assert resultado["segundos_binario"] < resultado["segundos_json"]
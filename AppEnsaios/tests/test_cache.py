@@ -0,0 +1,22 @@
+from AppEnsaios.cache import LRUCache
+
+
+def test_lru_descarta_o_menos_usado():
+    removidos = []
+    cache = LRUCache(2, on_evict=lambda key, value: removidos.append(key))
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert removidos == ["b"]
+    assert cache.get("b") is None
+    assert cache.stats()["acertos"] == 1
+    assert cache.stats()["falhas"] == 1
+
+    cache.resize(1)
+    assert len(cache) == 1 and "c" in cache
+    cache.invalidate("c")
+    assert len(cache) == 0
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from AppEnsaios.history import EditHistory, aplicar, diff_etapas
+
+
+def etapa(i, tempo=60):
+    return {"etapa": f"Etapa {i}", "codigo": f"{i:04}", "inicio": "10:00:00", "fim": "10:01:00", "tempo": tempo}
+
+
+def test_diff_guarda_so_o_que_mudou():
+    antes = [etapa(i) for i in range(100)]
+    depois = list(antes)
+    depois[10] = etapa(10, tempo=90)
+    del depois[50]
+    depois.append(etapa(200))
+
+    trechos = diff_etapas(antes, depois)
+
+    assert [len(t["antes"]) + len(t["depois"]) for t in trechos] == [2, 1, 1]
+    assert aplicar(antes, trechos) == depois
+    assert aplicar(depois, trechos, desfazer=True) == antes
+    assert diff_etapas(antes, antes) == []
+
+
+def test_versoes_e_restauracao(tmp_path):
+    historico = EditHistory(str(tmp_path / "tracking_logs.json.history.jsonl"))
+    v0 = [etapa(i) for i in range(5)]
+    v1 = v0[:2] + v0[3:]
+    v2 = [etapa(0, tempo=30)] + v1[1:]
+
+    assert historico.record("a", v0, v1)["versao"] == 1
+    assert historico.record("b", v0, v2)["versao"] == 1
+    assert historico.record("a", v1, v2)["versao"] == 2
+    assert historico.record("a", v2, v2) is None
+
+    assert [(versao, etapas) for versao, _, _, etapas in historico.versions("a", v2)] == [(2, v2), (1, v1), (0, v0)]
+    assert historico.version("a", v2, 0) == v0
+    with pytest.raises(KeyError):
+        historico.version("a", v2, 7)
+
+    # 🔹 Restaurar é uma nova edição: o histórico só cresce
+    historico.record("a", v2, v0, motivo="restauração da versão 0")
+    assert [versao for versao, _, _, _ in historico.versions("a", v0)] == [3, 2, 1, 0]
+    assert historico.version("a", v0, 2) == v2
+
+
+def test_crescimento_proporcional_as_edicoes(tmp_path):
+    historico = EditHistory(str(tmp_path / "historico.jsonl"))
+    etapas = [etapa(i) for i in range(2000)]
+    tamanho_sessao = len(json.dumps(etapas))
+
+    for n in range(10):
+        novas = list(etapas)
+        novas[n * 100] = etapa(n * 100, tempo=n)
+        historico.record("a", etapas, novas)
+        etapas = novas
+
+    # 🔹 Dez edições de um intervalo custam bem menos que uma cópia da sessão
+    assert historico.size() < tamanho_sessao / 10
@@ -0,0 +1,85 @@
+import csv
+import json
+import threading
+
+from AppEnsaios.instrumentation import Instrumentacao, percentil
+
+
+def test_percentil():
+    assert percentil([], 50) == 0.0
+    assert percentil([5, 1, 3, 2, 4], 50) == 3
+    assert percentil(list(range(1, 101)), 95) == 95
+
+
+def test_desativada_nao_registra():
+    inst = Instrumentacao(enabled=False)
+
+    @inst.medir("op")
+    def op():
+        inst.contar(bytes_lidos=10)
+        return 42
+
+    assert op() == 42
+    inst.registrar("assincrona", 3.0, registros=2)
+    assert inst.resumo() == {}
+
+
+def test_registra_latencia_bytes_e_exporta(tmp_path):
+    inst = Instrumentacao(enabled=True)
+
+    @inst.medir("interna")
+    def interna():
+        inst.contar(bytes_escritos=7)
+
+    @inst.medir("externa")
+    def externa():
+        inst.contar(bytes_lidos=100, registros=3)
+        interna()
+
+    externa()
+    externa()
+
+    resumo = inst.resumo()
+    assert resumo["externa"]["chamadas"] == 2
+    assert resumo["externa"]["bytes_lidos"] == 200
+    assert resumo["externa"]["registros"] == 6
+    assert resumo["externa"]["bytes_escritos"] == 0
+    assert resumo["interna"]["bytes_escritos"] == 14
+    assert sum(resumo["externa"]["histograma"].values()) == 2
+
+    inst.exportar_json(tmp_path / "d.json")
+    inst.exportar_csv(tmp_path / "d.csv")
+    assert json.loads((tmp_path / "d.json").read_text())["interna"]["chamadas"] == 2
+    with open(tmp_path / "d.csv") as f:
+        linhas = list(csv.DictReader(f))
+    assert [linha["operacao"] for linha in linhas] == ["externa", "interna"]
+
+
+def test_registrar_medicao_externa():
+    inst = Instrumentacao(enabled=True)
+    inst.registrar("search_logs", 12.0, registros=5)
+    inst.registrar("search_logs", 4.0)
+
+    resumo = inst.resumo()["search_logs"]
+    assert resumo["chamadas"] == 2
+    assert resumo["max_ms"] == 12.0
+    assert resumo["registros"] == 5
+
+
+def test_bytes_de_outras_threads_nao_vao_para_a_operacao_aberta():
+    inst = Instrumentacao(enabled=True)
+
+    @inst.medir("trabalho")
+    def trabalho():
+        inst.contar(bytes_lidos=5)
+
+    @inst.medir("interface")
+    def interface():
+        thread = threading.Thread(target=lambda: (inst.contar(bytes_lidos=1000), trabalho()))
+        thread.start()
+        thread.join()
+
+    interface()
+
+    assert inst.resumo()["interface"]["bytes_lidos"] == 0
+    assert inst.resumo()["trabalho"]["bytes_lidos"] == 5
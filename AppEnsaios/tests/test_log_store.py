@@ -0,0 +1,254 @@
+import json
+
+import pytest
+
+from AppEnsaios import log_store
+from AppEnsaios.log_store import LogStore, resumir_sessao
+
+
+def make_logs(n):
+    return [
+        {
+            "token": f"tok{i}",
+            "data_finalizacao": f"{i % 28 + 1:02}/03/2025 10:00:00",
+            "card_jira": f"ABC-{i}",
+            "etapas": [
+                {"etapa": "Calibração", "codigo": "0001", "inicio": "10:00:00", "fim": "10:01:00", "tempo": 60}
+            ],
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.mark.parametrize("escrita", ["json.dump", "write_all"])
+def test_indice_e_leitura_por_posicao(tmp_path, monkeypatch, escrita):
+    monkeypatch.setattr(log_store, "TAMANHO_BLOCO", 64)
+    path = tmp_path / "tracking_logs.json"
+    logs = make_logs(20)
+    logs[3]["card_jira"] = "AÇÃO-3"
+    store = LogStore(str(path))
+
+    if escrita == "json.dump":
+        path.write_text(json.dumps(logs, indent=4, ensure_ascii=False), encoding="utf-8")
+    else:
+        store.write_all(logs)
+
+    index = store.load_index()
+
+    assert [s["token"] for s in index] == [log["token"] for log in logs]
+    assert index[3]["card_jira"] == "AÇÃO-3"
+    assert "etapas" not in index[0]
+    assert [store.read_record(s) for s in index] == logs
+
+
+def test_write_all_retorna_indice_valido(tmp_path):
+    store = LogStore(str(tmp_path / "tracking_logs.json"))
+    logs = make_logs(5)
+
+    index = store.write_all(logs)
+
+    assert index == store.load_index()
+    assert store.read_all() == logs
+    assert store.write_all([]) == []
+    assert store.read_all() == []
+
+
+def test_resumo_no_indice(tmp_path):
+    store = LogStore(str(tmp_path / "tracking_logs.json"))
+    logs = make_logs(2)
+    logs[0]["etapas"].append(
+        {"etapa": "Ensaio", "codigo": "0002", "inicio": "10:01:00", "fim": "10:03:01", "tempo": 121}
+    )
+    logs[0]["resumo"] = resumir_sessao(logs[0]["etapas"])
+
+    assert logs[0]["resumo"]["etapa_dominante"] == "Ensaio"
+    assert logs[0]["resumo"]["minutos"] == [1, 3]
+    assert resumir_sessao([])["etapa_dominante"] is None
+
+    # 🔹 A sessão sem resumo (gravada por versões antigas) tem os totais calculados na leitura
+    index = store.write_all(logs)
+    assert [(s["tempo_total"], s["num_etapas"]) for s in index] == [(181, 2), (60, 1)]
+    assert index == store.load_index()
+
+
+def test_arquivo_antigo_corrompido(tmp_path):
+    path = tmp_path / "tracking_logs.json"
+    path.write_text(json.dumps(make_logs(3), indent=4)[:-40])
+
+    store = LogStore(str(path))
+    assert [s["token"] for s in store.load_index()] == ["tok0", "tok1"]
+    assert [(dano["token"], dano["card_jira"]) for dano in store.last_damage] == [("tok2", "ABC-2")]
+
+    relatorio = store.salvage()
+
+    assert relatorio["recuperados"] == 2
+    assert not store.is_legacy()
+    assert [log["token"] for log in store.read_all()] == ["tok0", "tok1"]
+    assert b'"tok2"' in open(relatorio["quarentena"], "rb").read()
+
+
+def test_recupera_registros_integros(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_store, "TAMANHO_BLOCO", 64)
+    path = tmp_path / "tracking_logs.json"
+    store = LogStore(str(path))
+    logs = make_logs(10)
+    index = store.write_all(logs)
+
+    dados = bytearray(path.read_bytes())
+    dados[index[2]["offset"] + index[2]["length"] - 10] ^= 0x01  # 🔹 Bit trocado: checksum divergente
+    del dados[index[5]["offset"] + index[5]["length"]]  # 🔹 Quebra de linha perdida: o tamanho ainda delimita
+    dados[index[7]["offset"] - 3:index[7]["offset"]] = b"zz "  # 🔹 Cabeçalho ilegível
+    path.write_bytes(bytes(dados) + b'40 00000000 {"token": "cort')  # 🔹 Gravação cortada no meio
+
+    esperados = [log["token"] for i, log in enumerate(logs) if i not in (2, 7)]
+    assert [s["token"] for s in store.load_index()] == esperados
+    assert [(dano["token"], dano["motivo"]) for dano in store.last_damage] == [
+        ("tok2", "checksum divergente"), ("tok7", "cabeçalho inválido"), ("cort", "registro incompleto"),
+    ]
+
+    relatorio = store.salvage()
+
+    assert relatorio["recuperados"] == 8
+    assert [dano["token"] for dano in relatorio["perdidos"]] == ["tok2", "tok7", "cort"]
+    assert json.loads(open(relatorio["quarentena"][:-4] + ".json").read())["recuperados"] == 8
+    assert [log["token"] for log in store.read_all()] == esperados
+    assert store.last_damage == []
+
+    # 🔹 Depois de uma gravação cortada, o próximo acréscimo começa em linha nova
+    with open(path, "ab") as f:
+        f.write(b"12 00000000 {")
+    store.append(make_logs(11)[10])
+    assert [s["token"] for s in store.load_index()][-1] == "tok10"
+    assert [dano["motivo"] for dano in store.last_damage] == ["registro incompleto"]
+
+    path.write_text('{"token": "a"}')
+    assert store.load_index() == []
+    assert store.last_damage[0]["token"] == "a"
+
+
+def test_verificacao_incremental(tmp_path):
+    store = LogStore(str(tmp_path / "tracking_logs.json"))
+    store.write_all(make_logs(5))
+
+    # 🔹 O que acabou de ser gravado por write_all já conta como verificado
+    assert store.verify()["verificados"] == 0
+
+    for log in make_logs(8)[5:]:
+        store.append(log)
+    relatorio = store.verify()
+    assert relatorio["verificados"] == 3
+    assert relatorio["danos"] == []
+    assert store.verify()["verificados"] == 0
+    assert store.verify(incremental=False)["verificados"] == 8
+
+    with open(store.path, "ab") as f:
+        f.write(b"8 00000000 {\"a\": 1}\n")
+    assert [dano["motivo"] for dano in store.verify()["danos"]] == ["checksum divergente"]
+    # 🔹 Com dano, o ponto verificado não avança
+    assert store.verify()["inicio"] == relatorio["fim"]
+
+
+def test_danos_nao_dependem_de_outras_leituras(tmp_path, monkeypatch):
+    store = LogStore(str(tmp_path / "tracking_logs.json"))
+    store.write_all(make_logs(3))
+    with open(store.path, "ab") as f:
+        f.write(b"8 00000000 {\"a\": 1}\n")
+    iter_records = store._iter_records
+
+    def com_leitura_concorrente(*args, **kwargs):
+        yield from iter_records(*args, **kwargs)
+        store.last_damage = []  # 🔹 Outra thread terminou uma leitura sem danos nesse meio-tempo
+
+    monkeypatch.setattr(store, "_iter_records", com_leitura_concorrente)
+    relatorio = store.verify()
+    assert len(relatorio["danos"]) == 1
+    assert store.verify()["inicio"] == relatorio["inicio"]  # 🔹 O ponto verificado não avançou sobre o dano
+    assert [dano["motivo"] for dano in store.salvage()["perdidos"]] == ["checksum divergente"]
+    assert [log["token"] for log in store.read_all()] == ["tok0", "tok1", "tok2"]
+
+
+def test_rewrite_mantem_acrescimos_e_refaz_se_regravado(tmp_path):
+    store = LogStore(str(tmp_path / "tracking_logs.json"))
+    store.write_all(make_logs(4))
+    extra, chamadas = make_logs(6)[4:], []
+
+    def filtrar(logs):
+        chamadas.append([log["token"] for log in logs])
+        if len(chamadas) == 1:
+            store.write_all(logs[::-1] + extra[:1])  # 🔹 Regravação concorrente: o ciclo recomeça
+        elif len(chamadas) == 2:
+            store.append(extra[1])  # 🔹 Gravação da interface durante a filtragem: vai para o arquivo novo
+        return [log for log in logs if log["token"] != "tok0"]
+
+    store.rewrite(filtrar)
+
+    assert chamadas == [["tok0", "tok1", "tok2", "tok3"], ["tok3", "tok2", "tok1", "tok0", "tok4"]]
+    assert [log["token"] for log in store.read_all()] == ["tok3", "tok2", "tok1", "tok4", "tok5"]
+    assert store.verify()["danos"] == []
+
+
+def _stress_writer(path, worker, count):
+    store = LogStore(path)
+    for i in range(count):
+        store.append({"token": f"w{worker}-{i}", "data_finalizacao": "", "card_jira": f"W{worker}", "etapas": []})
+    return store.lock_acquisitions, store.lock_wait_seconds
+
+
+def _stress_reader(path, stop):
+    store = LogStore(path)
+    leituras = 0
+    while not stop.is_set():
+        index = store.load_index()
+        for summary in index[-3:]:
+            store.read_record(summary)
+        leituras += 1
+    return leituras
+
+
+def test_indice_desatualizado_e_detectado(tmp_path):
+    path = str(tmp_path / "tracking_logs.json")
+    viewer = LogStore(path)
+    writer = LogStore(path)
+    writer.write_all(make_logs(3))
+
+    index = viewer.load_index()
+    assert not viewer.is_stale()
+
+    writer.update(lambda logs: logs.insert(0, make_logs(1)[0] | {"token": "novo"}))
+
+    assert viewer.is_stale()
+    with pytest.raises(log_store.StaleIndexError):
+        viewer.read_record(index[2])
+
+
+@pytest.mark.skipif(log_store.fcntl is None, reason="lock entre processos depende de fcntl")
+def test_estresse_multiprocesso(tmp_path):
+    """Vários processos gravando e lendo o mesmo arquivo ao mesmo tempo."""
+    import multiprocessing
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+
+    path = str(tmp_path / "tracking_logs.json")
+    LogStore(path).write_all([])
+    processos, gravacoes = 4, 25
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager, ProcessPoolExecutor(processos + 1, mp_context=ctx) as executor:
+        stop = manager.Event()
+        leitor = executor.submit(_stress_reader, path, stop)
+        inicio = time.perf_counter()
+        escritores = [executor.submit(_stress_writer, path, w, gravacoes) for w in range(processos)]
+        resultados = [f.result() for f in escritores]
+        duracao = time.perf_counter() - inicio
+        stop.set()
+        leituras = leitor.result()
+
+    store = LogStore(path)
+    tokens = [summary["token"] for summary in store.load_index()]
+    assert sorted(tokens) == sorted(f"w{w}-{i}" for w in range(processos) for i in range(gravacoes))
+    assert store.generation() == processos * gravacoes + 1
+    assert leituras > 0
+
+    espera = sum(wait for _, wait in resultados)
+    print(f"\n{processos * gravacoes} gravações em {duracao:.2f}s, espera total pelo lock {espera:.2f}s, "
+          f"{leituras} leituras concorrentes")
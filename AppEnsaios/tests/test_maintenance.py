@@ -0,0 +1,125 @@
+import json
+import os
+
+from AppEnsaios.history import EditHistory
+from AppEnsaios.log_store import LogStore
+from AppEnsaios.maintenance import (
+    ACIMA_DE_UM_DIA,
+    FORMATO_INVALIDO,
+    INCONSISTENTE,
+    NEGATIVO,
+    VIRADA_DE_DIA,
+    executar,
+    parse_horario,
+    verificar_logs,
+)
+
+
+def make_log(token, etapas):
+    return {"token": token, "data_finalizacao": "01/03/2025 10:00:00", "card_jira": "ABC-1", "etapas": etapas}
+
+
+def make_etapa(inicio, fim, tempo):
+    return {"etapa": "Etapa 1", "codigo": "0001", "inicio": inicio, "fim": fim, "tempo": tempo}
+
+
+def test_parse_horario():
+    assert parse_horario("00:00:00") == 0
+    assert parse_horario("23:59:59") == 86399
+    assert parse_horario("7:05:00") == 7 * 3600 + 300
+    assert parse_horario("xx") is None
+    assert parse_horario(None) is None
+
+
+def test_verificar_logs_classifica_intervalos():
+    logs = [
+        make_log("a", [
+            make_etapa("10:00:00", "10:01:00", 60.4),  # ok
+            make_etapa("10:00:00", "10:01:00", 5),  # inconsistente
+            make_etapa("10:00:00", "10:01:00", -3),  # negativo
+        ]),
+        make_log("b", [
+            make_etapa("23:59:00", "00:01:00", 120),  # virada de dia correta
+            make_etapa("23:59:00", "00:01:00", 0),  # inconsistente: virada de dia zerada pela edição
+            make_etapa("abc", "00:01:00", 0),
+        ]),
+    ]
+
+    relatorio = verificar_logs(logs, tamanho_lote=2)
+
+    assert relatorio["total_sessoes"] == 2
+    assert relatorio["total_intervalos"] == 6
+    assert relatorio["contagem"] == {
+        NEGATIVO: 1, VIRADA_DE_DIA: 1, INCONSISTENTE: 2, FORMATO_INVALIDO: 1, ACIMA_DE_UM_DIA: 0,
+    }
+    # 🔹 A virada de dia com o tempo certo é só uma nota
+    assert [(nota["token"], nota["indice"]) for nota in relatorio["notas"]] == [("b", 0)]
+    assert len(relatorio["problemas"]) == 4
+    assert relatorio["corrigidos"] == 0
+    assert logs[0]["etapas"][1]["tempo"] == 5
+
+
+def test_verificar_logs_corrige():
+    logs = [make_log("a", [
+        make_etapa("10:00:00", "10:01:00", 5),
+        make_etapa("10:00:00", "10:01:00", -3),
+        make_etapa("23:59:00", "00:01:00", 0),
+    ])]
+
+    relatorio = verificar_logs(logs, corrigir=True)
+
+    assert relatorio["corrigidos"] == 3
+    assert [e["tempo"] for e in logs[0]["etapas"]] == [60, 60, 120]
+
+
+def test_corrigir_preserva_viradas_corretas_e_intervalos_longos():
+    logs = [make_log("a", [
+        make_etapa("23:59:00", "00:01:00", 121.5),  # virada de dia dentro da tolerância
+        make_etapa("10:00:00", "10:30:00", 26 * 3600 + 1800.4),  # 26h30 medidas pelo relógio
+        make_etapa("10:00:00", "10:00:00", 86400),  # exatamente um dia
+    ])]
+
+    relatorio = verificar_logs(logs, corrigir=True)
+
+    assert [e["tempo"] for e in logs[0]["etapas"]] == [121.5, 26 * 3600 + 1800.4, 86400]
+    assert relatorio["corrigidos"] == 0
+    assert [nota["tipo"] for nota in relatorio["notas"]] == [VIRADA_DE_DIA]
+    assert [(problema["indice"], problema["tipo"]) for problema in relatorio["problemas"]] == [
+        (1, ACIMA_DE_UM_DIA), (2, ACIMA_DE_UM_DIA),
+    ]
+
+
+def test_executar_com_processos(tmp_path):
+    log_file = tmp_path / "tracking_logs.json"
+    relatorio_file = tmp_path / "relatorio.json"
+    logs = [make_log(str(i), [make_etapa("10:00:00", "10:00:30", 10)]) for i in range(50)]
+    log_file.write_text(json.dumps(logs))
+
+    relatorio = executar(str(log_file), corrigir=True, relatorio_file=str(relatorio_file), processos=2)
+
+    assert relatorio["contagem"][INCONSISTENTE] == 50
+    assert json.loads(relatorio_file.read_text())["corrigidos"] == 50
+    logs = LogStore(str(log_file)).read_all()
+    assert all(log["etapas"][0]["tempo"] == 30 for log in logs)
+    assert all(log["resumo"]["tempo_total"] == 30 for log in logs)
+
+    # 🔹 Cada correção virou uma versão no histórico, com a medição original recuperável
+    historico = EditHistory(str(log_file) + ".history.jsonl")
+    assert [entrada["motivo"] for entrada in historico.entries("7")] == ["correção de duração"]
+    assert historico.version("7", logs[7]["etapas"], 0)[0]["tempo"] == 10
+
+
+def test_executar_preenche_resumos(tmp_path):
+    log_file = tmp_path / "tracking_logs.json"
+    logs = [make_log("a", [make_etapa("10:00:00", "10:01:00", 60), make_etapa("10:01:00", "10:01:30", 30)])]
+    log_file.write_text(json.dumps(logs))
+
+    assert executar(str(log_file), resumos=True)["resumos_atualizados"] == 1
+    resumo = LogStore(str(log_file)).read_all()[0]["resumo"]
+    assert resumo["tempo_total"] == 90
+    assert resumo["num_etapas"] == 2
+    assert resumo["minutos"] == [1, 1]
+
+    # 🔹 Segunda execução não encontra nada para atualizar e não regrava o arquivo
+    assert executar(str(log_file), resumos=True)["resumos_atualizados"] == 0
+    assert not os.path.exists(str(log_file) + ".history.jsonl")  # 🔹 Resumos não mudam as etapas
@@ -0,0 +1,145 @@
+import time
+from datetime import date
+
+import pytest
+
+from AppEnsaios.log_store import LogStore
+from AppEnsaios.query import QueryError, QueryIndexes, Termo, compile_query, parece_estruturada, parse
+
+
+def make_log(i):
+    return {
+        "token": f"{i:032x}",
+        "data_finalizacao": f"{i % 28 + 1:02}/{i % 12 + 1:02}/2025 10:00:00",
+        "card_jira": f"ABC-{i % 100}",
+        "etapas": [
+            {"etapa": "Etapa 1", "codigo": "0001", "inicio": "10:00:00", "fim": "10:10:00", "tempo": 600},
+            {
+                "etapa": "Etapa 2", "codigo": f"{i % 5:04}", "inicio": "10:10:00", "fim": "10:10:00",
+                "tempo": 60 * (i % 50),
+            },
+        ],
+    }
+
+
+def test_parse():
+    termos = parse('card:ABC-12 code:0003 date:2025-03-01..2025-03-31 dur>30m stage:"Etapa 2" solto')
+
+    assert termos == [
+        Termo("card", ":", "abc-12"),
+        Termo("code", ":", "0003"),
+        Termo("date", ":", (date(2025, 3, 1).toordinal(), date(2025, 3, 31).toordinal())),
+        Termo("dur", ">", 1800.0),
+        Termo("stage", ":", "etapa 2"),
+        Termo("texto", ":", "solto"),
+    ]
+    assert parse("date:..01/03/2025")[0].valor == (None, date(2025, 3, 1).toordinal())
+    assert parse("dur<=1.5h")[0] == Termo("dur", "<=", 5400.0)
+
+
+@pytest.mark.parametrize("texto", ['stage:"Etapa', "date:2025-13-01", "dur>abc", "card>1", "code:"])
+def test_parse_invalido(texto):
+    with pytest.raises(QueryError):
+        parse(texto)
+
+
+def test_parece_estruturada():
+    assert parece_estruturada("card:ABC")
+    assert parece_estruturada("x dur>3m")
+    assert not parece_estruturada("ABC-12")
+    assert not parece_estruturada("18/10/2026 10:00:00")
+
+
+def test_plano_usa_indices():
+    assert compile_query("card:ABC-1 date:2025-03-01").describe() == ["indice:card", "indice:date"]
+    assert compile_query("card:ABC* code:0001").describe() == ["varredura", "filtro:card", "etapas:code"]
+    assert compile_query("dur>1h").describe() == ["varredura", "resumo:dur"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LogStore(str(tmp_path / "tracking_logs.json"))
+    store.write_all([make_log(i) for i in range(300)])
+    return store
+
+
+@pytest.mark.parametrize("consulta,esperado", [
+    ("card:abc-7", lambda log: log["card_jira"] == "ABC-7"),
+    ("card:ABC-1* date:2025-03-01..2025-03-31",
+     lambda log: log["card_jira"].startswith("ABC-1") and log["data_finalizacao"][3:5] == "03"),
+    ("code:0003", lambda log: log["etapas"][1]["codigo"] == "0003"),
+    ("code:0001 dur>=40m",
+     lambda log: sum(e["tempo"] for e in log["etapas"] if e["codigo"] == "0001") >= 2400),
+    ('stage:"Etapa 2" dur<5m', lambda log: log["etapas"][1]["tempo"] < 300),
+    ("dur>45m ABC-3", lambda log: 600 + log["etapas"][1]["tempo"] > 2700 and "ABC-3" in log["card_jira"]),
+])
+def test_execucao_equivale_a_forca_bruta(store, consulta, esperado):
+    logs = store.read_all()
+    index = store.load_index()
+    indexes = QueryIndexes(index)
+    por_token = {log["token"]: log for log in logs}
+
+    # 🔹 Tanto lendo sessão por sessão quanto varrendo o arquivo em sequência
+    for carregar in (lambda resumo: por_token[resumo["token"]], None):
+        plan = compile_query(consulta)
+        resultado = [r["token"] for r in plan.execute(indexes, carregar=carregar, varrer=store.iter_logs)]
+        assert resultado == [log["token"] for log in logs if esperado(log)]
+        if plan.dur_pelo_resumo:
+            assert plan.registros_lidos == 0
+
+
+def test_arquivo_regravado_remonta_os_indices(store):
+    indexes = QueryIndexes(store.load_index(), store.index_generation)
+    logs = store.read_all()
+    # 🔹 Regravado depois dos índices: uma sessão nova no começo desloca todos os offsets
+    store.write_all([make_log(1000)] + logs)
+    esperado = [log["token"] for log in logs if log["etapas"][1]["codigo"] == "0003"]
+
+    def reindexar():
+        return QueryIndexes(store.load_index(), store.index_generation)
+
+    def executar(indexes, varrer, **kwargs):
+        return [r["token"] for r in compile_query("code:0003").execute(indexes, varrer=varrer, **kwargs)]
+
+    assert executar(indexes, store.iter_logs) == []  # 🔹 Sem conferir a geração, as sessões somem
+    assert executar(indexes, store.iter_logs, geracao=store.generation, reindexar=reindexar) == esperado
+
+    # 🔹 Regravado no meio da varredura: recomeça sem repetir nem perder sessões
+    indexes = reindexar()
+
+    def varrer_regravando():
+        for numero, item in enumerate(store.iter_logs()):
+            if numero == 100:
+                store.write_all([make_log(1001)] + store.read_all())
+            yield item
+
+    resultado = executar(indexes, varrer_regravando, geracao=store.generation, reindexar=reindexar)
+    assert resultado == esperado
+
+
+def test_benchmark_indice_contra_varredura():
+    """Consulta por card com índice examina só as sessões do card; a varredura examina todas."""
+    resumos = [
+        {"token": f"{i:032x}", "data_finalizacao": f"{i % 28 + 1:02}/03/2025 10:00:00", "card_jira": f"ABC-{i}",
+         "offset": i, "length": 1}
+        for i in range(50000)
+    ]
+
+    inicio = time.perf_counter()
+    indexes = QueryIndexes(resumos)
+    construcao = time.perf_counter() - inicio
+
+    indexado = compile_query("card:ABC-4242")
+    inicio = time.perf_counter()
+    assert [r["card_jira"] for r in indexado.execute(indexes)] == ["ABC-4242"]
+    tempo_indexado = time.perf_counter() - inicio
+
+    varredura = compile_query("card:ABC-4242*")
+    inicio = time.perf_counter()
+    assert len(list(varredura.execute(indexes))) == 11  # 🔹 ABC-4242 e ABC-42420..ABC-42429
+    tempo_varredura = time.perf_counter() - inicio
+
+    assert indexado.examinados == 1
+    assert varredura.examinados == len(resumos)
+    print(f"\níndices: {construcao * 1000:.1f} ms | card indexado: {tempo_indexado * 1000:.3f} ms "
+          f"| varredura: {tempo_varredura * 1000:.1f} ms")
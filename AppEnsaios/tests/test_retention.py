@@ -0,0 +1,128 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from AppEnsaios.history import EditHistory
+from AppEnsaios.log_store import LogStore
+from AppEnsaios.retention import (
+    DESCARTAR, Compactador, RetentionPolicy, compactar_lista, ler_arquivo, selecionar_expirados,
+)
+
+AGORA = datetime(2025, 3, 31, 12, 0, 0)
+
+
+def make_log(i, dia=None, card="ABC-1"):
+    return {
+        "token": f"tok{i}",
+        "data_finalizacao": f"{dia or i % 28 + 1:02}/03/2025 10:00:00",
+        "card_jira": card,
+        "etapas": [{"etapa": "Ensaio", "codigo": "0001", "inicio": "10:00:00", "fim": "10:01:00", "tempo": 60}],
+    }
+
+
+def resumo(i, dia, length=100):
+    return {"token": f"tok{i}", "data_finalizacao": f"{dia:02}/03/2025 10:00:00", "length": length}
+
+
+def test_politica_das_configuracoes():
+    assert not RetentionPolicy.from_settings({}).ativa
+    politica = RetentionPolicy.from_settings({"retencao_dias": 30, "retencao_mb": 2, "retencao_modo": "descartar"})
+    assert (politica.dias, politica.max_bytes, politica.modo) == (30, 2 * 1024 * 1024, DESCARTAR)
+    with pytest.raises(ValueError):
+        RetentionPolicy(modo="apagar")
+
+
+def test_selecionar_por_idade_quantidade_e_tamanho():
+    index = [resumo(i, i + 1) for i in range(10)]
+
+    assert selecionar_expirados(index, RetentionPolicy(dias=25), AGORA) == [f"tok{i}" for i in range(6)]
+    assert selecionar_expirados(index, RetentionPolicy(max_sessoes=7), AGORA) == ["tok0", "tok1", "tok2"]
+    assert selecionar_expirados(index, RetentionPolicy(max_bytes=250), AGORA) == [f"tok{i}" for i in range(8)]
+    # 🔹 Duplicata: vale a última ocorrência, que é a mais recente
+    assert selecionar_expirados(index + [resumo(0, 30)], RetentionPolicy(dias=25), AGORA) == [
+        f"tok{i}" for i in range(1, 6)
+    ]
+
+
+def test_compactar_lista():
+    logs = [make_log(1), make_log(2), "lixo", {"token": "tok3", "removido": True}, make_log(1, dia=20)]
+    compactar_lista(logs, remover={"tok2"})
+    assert logs == [make_log(1, dia=20)]
+
+
+def test_arquiva_e_agrega(tmp_path):
+    store = LogStore(str(tmp_path / "tracking_logs.json"))
+    store.write_all([make_log(i, dia=i + 1, card=f"ABC-{i % 2}") for i in range(20)] + [make_log(19, dia=20)])
+    compactador = Compactador(store, str(tmp_path))
+
+    relatorio = compactador.executar(RetentionPolicy(max_sessoes=5), AGORA)
+
+    assert relatorio["expirados"] == 15
+    assert relatorio["duplicadas"] == 1
+    assert relatorio["bytes_depois"] < relatorio["bytes_antes"]
+    assert [log["token"] for log in store.read_all()] == [f"tok{i}" for i in range(15, 20)]
+    assert [log["token"] for log in ler_arquivo(relatorio["arquivo"])] == [f"tok{i}" for i in range(15)]
+
+    agregados = compactador.agregados()
+    assert agregados["sessoes"] == 15
+    assert agregados["por_etapa"] == {"Ensaio": 900}
+    assert agregados["por_card"] == {"ABC-0": 480, "ABC-1": 420}
+    assert compactador.checkpoint() is None
+
+    # 🔹 Dentro dos limites: nada é regravado
+    geracao = store.generation()
+    assert compactador.executar(RetentionPolicy(max_sessoes=5), AGORA)["expirados"] == 0
+    assert store.generation() == geracao
+
+
+def test_retoma_execucao_interrompida(tmp_path, monkeypatch):
+    store = LogStore(str(tmp_path / "tracking_logs.json"))
+    store.write_all([make_log(i, dia=i + 1) for i in range(10)])
+    compactador = Compactador(store, str(tmp_path))
+
+    rewrite = store.rewrite
+
+    def falha(filtrar):
+        raise OSError("queda no meio da compactação")
+
+    monkeypatch.setattr(store, "rewrite", falha)
+    with pytest.raises(OSError):
+        compactador.executar(RetentionPolicy(max_sessoes=4, modo=DESCARTAR), AGORA)
+    assert compactador.checkpoint()["fase"] == "removendo"
+    assert len(store.read_all()) == 10
+
+    monkeypatch.setattr(store, "rewrite", rewrite)
+    relatorio = compactador.executar(RetentionPolicy(), AGORA)
+
+    assert relatorio["retomada"]
+    assert [log["token"] for log in store.read_all()] == [f"tok{i}" for i in range(6, 10)]
+    assert compactador.agregados()["sessoes"] == 6  # 🔹 Somado uma única vez
+    assert compactador.checkpoint() is None
+    assert not os.path.exists(compactador.pasta_arquivo)
+
+
+def test_sessao_editada_depois_de_arquivada(tmp_path, monkeypatch):
+    store = LogStore(str(tmp_path / "tracking_logs.json"))
+    store.write_all([make_log(i, dia=i + 1) for i in range(6)])
+    historico = EditHistory(store.path + ".history.jsonl")
+    historico.record("tok0", [], make_log(0)["etapas"])
+    historico.record("tok5", [], make_log(5)["etapas"])
+    compactador = Compactador(store, str(tmp_path))
+
+    arquivar = compactador._arquivar
+
+    def editar_depois(path, sessoes):
+        arquivar(path, sessoes)
+        store.update(lambda logs: logs[0]["etapas"][0].update(tempo=300))
+
+    monkeypatch.setattr(compactador, "_arquivar", editar_depois)
+    relatorio = compactador.executar(RetentionPolicy(max_sessoes=4), AGORA)
+
+    arquivadas = {log["token"]: log for log in ler_arquivo(relatorio["arquivo"])}
+    assert list(arquivadas) == ["tok1", "tok0"]
+    assert arquivadas["tok0"]["etapas"][0]["tempo"] == 300
+    # 🔹 Os agregados contam a versão que saiu do arquivo ativo
+    assert compactador.agregados()["tempo_total"] == 360
+    assert historico.entries("tok0") == []
+    assert len(historico.entries("tok5")) == 1
@@ -0,0 +1,106 @@
+import threading
+
+from AppEnsaios.search import (
+    SearchCache, buscar_aproximado, distancia_edicao, normalizar, proximo_lote, sob_demanda,
+)
+
+
+def resumo(card, token="t", data="01/03/2025 10:00:00"):
+    return {"token": token, "data_finalizacao": data, "card_jira": card}
+
+
+def test_normalizar():
+    assert normalizar("PROJ-1234") == normalizar("proj1234") == "proj1234"
+    assert normalizar("Ação 1") == "acao1"
+
+
+def test_distancia_edicao():
+    assert distancia_edicao("proj1234", "proj1234") == 0
+    assert distancia_edicao("proj1234", "prj1234") == 1
+    assert distancia_edicao("kitten", "sitting") == 3
+
+
+def test_busca_tolera_digitacao_e_ordena():
+    resumos = [
+        resumo("OTHER-99", "a"),
+        resumo("PROJ-1243", "b"),
+        resumo("PROJ-1234", "c"),
+        resumo("XYZ-1", "d"),
+    ]
+
+    resultados = buscar_aproximado(resumos, "proj1234", k=5)
+
+    tokens = [r["token"] for _, r in resultados]
+    assert tokens[0] == "c"
+    assert tokens[1] == "b"
+    assert "d" not in tokens
+    scores = [score for score, _ in resultados]
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] == 1.0
+
+
+def test_busca_limita_a_k():
+    resumos = [resumo(f"PROJ-{i}", str(i)) for i in range(1000)]
+
+    resultados = buscar_aproximado(resumos, "PROJ-12", k=3)
+
+    assert len(resultados) == 3
+    assert resultados[0][1]["card_jira"] == "PROJ-12"
+    assert buscar_aproximado(resumos, "---") == []
+
+
+def test_lotes_consumidos_em_outra_thread():
+    chamadas = []
+    resumos = [resumo(f"PROJ-{i}", str(i)) for i in range(120)]
+
+    def produzir():
+        chamadas.append(threading.current_thread().name)
+        return buscar_aproximado(resumos, "proj1", k=60)
+
+    iterador = sob_demanda(produzir)
+    assert chamadas == []  # 🔹 Nada é calculado ao montar o iterador
+
+    lotes = []
+    thread = threading.Thread(target=lambda: lotes.extend([proximo_lote(iterador, 50), proximo_lote(iterador, 50)]),
+                              name="busca")
+    thread.start()
+    thread.join()
+
+    assert chamadas == ["busca"]
+    assert [len(lote) for lote in lotes] == [50, 10]
+    assert proximo_lote(iterador, 50) == []
+
+
+def test_cache_de_buscas():
+    resumos = [resumo(f"ABC-{i}", f"t{i}") for i in range(30)]
+    varreduras = []
+
+    def buscar(texto):
+        def varrer():
+            for log in resumos:
+                varreduras.append(log["token"])
+                if texto in log["card_jira"]:
+                    yield None, log
+        return varrer
+
+    def refinar_para(texto):
+        return lambda anterior: (lambda item: texto in item[1]["card_jira"]) if anterior[1] in texto else None
+
+    cache = SearchCache(capacity=2)
+
+    # 🔹 Só o que foi consumido é calculado; a repetição reaproveita e continua de onde parou
+    assert proximo_lote(cache.results(("texto", "ABC"), 1, buscar("ABC")), 5) == [(None, r) for r in resumos[:5]]
+    assert len(varreduras) == 5
+    assert len(list(cache.results(("texto", "ABC"), 1, buscar("ABC")))) == 30
+    assert len(varreduras) == 30
+
+    # 🔹 Consulta que estende a anterior filtra os resultados dela em vez do histórico
+    refinada = list(cache.results(("texto", "ABC-2"), 1, buscar("ABC-2"), refinar_para("ABC-2")))
+    assert [log["token"] for _, log in refinada] == [f"t{i}" for i in [2, *range(20, 30)]]
+    assert len(varreduras) == 30
+    assert cache.stats()["refinamentos"] == 1
+
+    # 🔹 Nova geração do arquivo: tudo é descartado
+    list(cache.results(("texto", "ABC"), 2, buscar("ABC")))
+    assert len(varreduras) == 60
+    assert len(cache.entradas) == 1
@@ -0,0 +1,96 @@
+import asyncio
+
+from AppEnsaios.sessions import SessionManager, TickScheduler, TrackingSession
+
+STAGES = {
+    "Etapa 1": {"nome": "Preparação", "codigo": "0001"},
+    "Etapa 2": {"nome": "Voo", "codigo": "0002"},
+}
+
+
+def test_sessao_registra_trocas_de_etapa():
+    session = TrackingSession("Sessão 1", "ABC-1")
+
+    assert session.switch_stage("Etapa 2", 100.0, "10:00:00") is None
+    assert session.switch_stage("Etapa 1", 160.0, "10:01:00") == "Etapa 2"
+    assert session.elapsed(190.0) == 90.0
+    assert session.stop(200.0, "10:01:40") == "Etapa 1"
+    assert not session.active
+
+    # 🔹 A ordem segue a configuração das etapas, como no log original
+    assert session.build_log(STAGES) == [
+        {"etapa": "Preparação", "codigo": "0001", "inicio": "10:01:00", "fim": "10:01:40", "tempo": 40.0},
+        {"etapa": "Voo", "codigo": "0002", "inicio": "10:00:00", "fim": "10:01:00", "tempo": 60.0},
+    ]
+
+
+def test_gerenciador_troca_e_finaliza_sessoes():
+    manager = SessionManager()
+    primeira = manager.create("ABC-1")
+    segunda = manager.create("ABC-2")
+
+    assert manager.foreground is segunda
+    assert manager.switch(primeira.nome) is primeira
+
+    primeira.switch_stage("Etapa 1", 0.0, "10:00:00")
+    assert manager.any_active
+
+    manager.finish(primeira.nome)
+    assert manager.foreground is segunda
+    assert not manager.any_active
+
+    manager.finish(segunda.nome)
+    assert len(manager) == 1
+    assert manager.foreground.nome not in (primeira.nome, segunda.nome)
+
+
+def test_agendador_unico():
+    chamadas = []
+    scheduler = TickScheduler(interval=0.01)
+
+    async def run():
+        scheduler.start(asyncio.get_running_loop())
+        scheduler.subscribe("a", lambda now: chamadas.append("a"))
+        scheduler.subscribe("b", lambda now: chamadas.append("b"))
+        await asyncio.sleep(0.035)
+        scheduler.unsubscribe("a")
+        scheduler.unsubscribe("b")
+        assert not scheduler.running
+
+    asyncio.run(run())
+
+    assert chamadas.count("a") >= 2
+    assert chamadas.count("a") == chamadas.count("b")
+
+
+def test_tempo_por_etapa():
+    session = TrackingSession("Sessão 1")
+    session.switch_stage("Etapa 1", 0.0, "10:00:00")
+    session.switch_stage("Etapa 2", 30.0, "10:00:30")
+    session.switch_stage("Etapa 1", 50.0, "10:00:50")
+
+    assert session.stage_total("Etapa 1", 65.0) == 45.0
+    assert session.stage_total("Etapa 2", 65.0) == 20.0
+    assert session.stage_total("Etapa 3", 65.0) == 0.0
+    assert session.elapsed(65.0) == 65.0
+
+
+def test_agendador_pausado():
+    chamadas = []
+    escondida = [True]
+    scheduler = TickScheduler(interval=0.01, paused=lambda: escondida[0], idle_interval=0.02)
+
+    async def run():
+        scheduler.start(asyncio.get_running_loop())
+        scheduler.subscribe("a", chamadas.append)
+        await asyncio.sleep(0.05)
+        assert chamadas == []
+        assert scheduler.running  # 🔹 Continua checando, só que no intervalo mais longo
+        escondida[0] = False
+        await asyncio.sleep(0.05)
+        scheduler.unsubscribe("a")
+
+    asyncio.run(run())
+
+    assert 1 <= scheduler.paused_ticks <= 3
+    assert len(chamadas) == scheduler.stats()["ticks"] >= 1
@@ -0,0 +1,58 @@
+import pytest
+
+from AppEnsaios.stages import MAX_RECENTES, StageCatalog, StageImportError, etapa_padrao, ler_csv, pagina
+
+
+def make_stages(n):
+    return {f"Etapa {i + 1}": {"nome": f"Ensaio {i + 1}", "codigo": f"{i + 1:04}"} for i in range(n)}
+
+
+def test_busca_por_codigo_e_filtro():
+    catalogo = StageCatalog(make_stages(300))
+
+    assert catalogo.by_code("0150") == "Etapa 150"
+    assert catalogo.by_code(" 0150 ") == "Etapa 150"
+    assert catalogo.by_code("9999") is None
+    assert len(catalogo.filter("")) == 300
+    assert catalogo.filter("ENSAIO 29")[:2] == ["Etapa 29", "Etapa 290"]
+    # 🔹 Código exato vem antes das etapas que só contêm o trecho
+    assert catalogo.filter("0010")[0] == "Etapa 10"
+
+
+def test_recentes():
+    catalogo = StageCatalog(make_stages(20), recentes=["Etapa 3", "Removida"])
+    assert catalogo.recentes == ["Etapa 3"]
+
+    for i in range(1, 10):
+        catalogo.mark_used(f"Etapa {i}")
+    assert catalogo.mark_used("Etapa 5")
+    assert not catalogo.mark_used("Etapa 5")  # 🔹 Já é a primeira: nada muda
+
+    assert catalogo.recentes[0] == "Etapa 5"
+    assert len(catalogo.recentes) == MAX_RECENTES
+    assert catalogo.recentes.count("Etapa 5") == 1
+
+
+def test_pagina():
+    itens = list(range(50))
+    assert pagina(itens, 0, 24) == (itens[:24], 0)
+    assert pagina(itens, 48, 24) == ([48, 49], 48)
+    assert pagina(itens, 500, 24) == ([48, 49], 48)
+    assert pagina([], 24, 24) == ([], 0)
+
+
+def test_ler_csv():
+    stages = ler_csv("nome;codigo\nCalibração;0001\n\nEnsaio de tração;0002\n")
+
+    assert stages == {
+        "Etapa 1": {"nome": "Calibração", "codigo": "0001", "tempos": []},
+        "Etapa 2": {"nome": "Ensaio de tração", "codigo": "0002", "tempos": []},
+    }
+    assert list(ler_csv("A,1\nB,2\nC,3\n")) == ["Etapa 1", "Etapa 2", "Etapa 3"]
+    assert etapa_padrao(0) == {"nome": "Etapa 1", "codigo": "0001", "tempos": []}
+
+
+@pytest.mark.parametrize("texto", ["A,1\nB,1\n", "A,1\nsó nome\n", "", "nome,codigo\n"])
+def test_ler_csv_invalido(texto):
+    with pytest.raises(StageImportError):
+        ler_csv(texto)
@@ -0,0 +1,196 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from AppEnsaios.sync import Outbox, SyncClient, SyncError, SyncWorker
+
+
+class StandInServer:
+    """Servidor HTTP local que guarda as sessões recebidas pelo token."""
+
+    def __init__(self, falhas=0):
+        self.falhas = falhas
+        self.sessoes = {}
+        self.requisicoes = 0
+        self.conexoes = set()
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                corpo = self.rfile.read(int(self.headers["Content-Length"]))
+                servidor.requisicoes += 1
+                servidor.conexoes.add(self.client_address)
+                if servidor.falhas:
+                    servidor.falhas -= 1
+                    status = 503
+                else:
+                    for sessao in json.loads(corpo)["sessoes"]:
+                        servidor.sessoes[sessao["token"]] = sessao
+                    status = 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/sessoes"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    servidor = StandInServer()
+    yield servidor
+    servidor.close()
+
+
+def sessao(token, card="ABC-1"):
+    return {"token": token, "data_finalizacao": "", "card_jira": card, "etapas": []}
+
+
+def test_outbox_mantem_ultima_versao_por_token(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.jsonl"))
+    outbox.enqueue("sessao", sessao("a"))
+    outbox.enqueue("sessao", sessao("b"))
+    enviados = outbox.pending()
+    outbox.enqueue("edicao", sessao("a", "ABC-2"))
+
+    assert [(e["token"], e["tipo"]) for e in outbox.pending()] == [("b", "sessao"), ("a", "edicao")]
+
+    # 🔹 Confirmar a versão antiga de "a" não apaga a edição que chegou depois
+    outbox.ack(enviados)
+    assert [(e["token"], e["tipo"]) for e in Outbox(outbox.path).pending()] == [("a", "edicao")]
+
+
+def test_outbox_compartilhada_entre_instancias(tmp_path):
+    a = Outbox(str(tmp_path / "outbox.jsonl"))
+    b = Outbox(a.path)
+    a.enqueue("sessao", sessao("a"))
+    enviados = a.pending()
+
+    # 🔹 B grava depois da leitura de A: a fila não é esvaziada e a entrada de B continua pendente
+    b.enqueue("sessao", sessao("b"))
+    a.ack(enviados, esvaziar=True)
+    assert [e["token"] for e in b.pending()] == ["b"]
+
+    # 🔹 Sem nada novo desde a leitura, a confirmação do último lote esvazia a fila
+    b.ack(b.pending(), esvaziar=True)
+    assert (tmp_path / "outbox.jsonl").read_bytes() == b""
+    c = Outbox(a.path)
+    a.enqueue("sessao", sessao("c"))
+    assert c.enqueue("sessao", sessao("d"))["seq"] > a.pending()[0]["seq"]
+
+
+def test_envio_em_lotes_com_conexao_persistente(tmp_path, server):
+    outbox = Outbox(str(tmp_path / "outbox.jsonl"))
+    client = SyncClient(server.url)
+    worker = SyncWorker(outbox, client, batch_size=2)
+    for i in range(5):
+        outbox.enqueue("sessao", sessao(f"t{i}"))
+
+    assert worker.flush()
+
+    assert sorted(server.sessoes) == [f"t{i}" for i in range(5)]
+    assert server.requisicoes == 3
+    assert worker.pending_count == 0
+    assert client.connections_opened == 1
+    assert len(server.conexoes) == 1
+    assert outbox.pending() == []
+    client.close()
+
+
+def test_thread_reenvia_com_espera_exponencial(tmp_path):
+    server = StandInServer(falhas=2)
+    try:
+        outbox = Outbox(str(tmp_path / "outbox.jsonl"))
+        worker = SyncWorker(outbox, SyncClient(server.url), initial_backoff=0.01, max_backoff=0.05)
+        worker.start()
+
+        inicio = time.perf_counter()
+        worker.submit("sessao", sessao("x"))
+        assert time.perf_counter() - inicio < 0.05  # 🔹 Enfileirar não espera pela rede
+
+        limite = time.time() + 5
+        while "x" not in server.sessoes and time.time() < limite:
+            time.sleep(0.01)
+        worker.stop(timeout=1)
+
+        assert "x" in server.sessoes
+        assert server.requisicoes == 3
+        assert worker.failures == 0
+        assert outbox.pending() == []
+    finally:
+        server.close()
+
+
+def test_flush_le_a_fila_uma_vez(tmp_path, server, monkeypatch):
+    outbox = Outbox(str(tmp_path / "outbox.jsonl"))
+    worker = SyncWorker(outbox, SyncClient(server.url), batch_size=2)
+    for i in range(7):
+        worker.submit("sessao", sessao(f"t{i}"))
+    assert worker.pending_count == 7
+    assert not (tmp_path / "outbox.jsonl").exists()  # 🔹 Sem a thread, nada foi gravado ainda
+
+    leituras = []
+    pending = outbox.pending
+    monkeypatch.setattr(outbox, "pending", lambda: leituras.append(1) or pending())
+    assert worker.flush()
+
+    assert len(leituras) == 1
+    assert server.requisicoes == 4
+    assert (tmp_path / "outbox.jsonl").read_bytes() == b""
+    worker.client.close()
+
+
+def test_submit_nao_espera_o_lock_da_fila(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.jsonl"))
+    worker = SyncWorker(outbox, SyncClient("http://127.0.0.1:9/sessoes", timeout=0.5))
+    with outbox._locked():
+        inicio = time.perf_counter()
+        worker.submit("sessao", sessao("x"))
+        assert time.perf_counter() - inicio < 0.05
+    worker.stop()
+    assert [e["token"] for e in outbox.pending()] == ["x"]  # 🔹 Gravada ao parar a thread
+
+
+def test_erro_de_disco_nao_para_a_thread(tmp_path, server, monkeypatch):
+    outbox = Outbox(str(tmp_path / "outbox.jsonl"))
+    worker = SyncWorker(outbox, SyncClient(server.url), initial_backoff=0.01, max_backoff=0.05)
+    enqueue = outbox.enqueue
+    falhas = []
+
+    def disco_cheio(tipo, registro):
+        if not falhas:
+            falhas.append(True)
+            raise OSError(28, "No space left on device")
+        return enqueue(tipo, registro)
+
+    monkeypatch.setattr(outbox, "enqueue", disco_cheio)
+    worker.start()
+    worker.submit("sessao", sessao("x"))
+
+    limite = time.time() + 5
+    while "x" not in server.sessoes and time.time() < limite:
+        time.sleep(0.01)
+    worker.stop(timeout=1)
+
+    assert falhas
+    assert "x" in server.sessoes  # 🔹 A entrada ficou em memória e foi gravada na nova tentativa
+    assert worker.last_error is None
+
+
+def test_erro_de_conexao(tmp_path):
+    client = SyncClient("http://127.0.0.1:9/sessoes", timeout=0.5)
+    with pytest.raises(SyncError):
+        client.send_batch([{"seq": 1, "tipo": "sessao", "token": "a", "registro": sessao("a")}])